@@ -2,6 +2,12 @@
 ASGI config for castor project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Schedule views are served by their async versions (planner/async_views.py),
+so a worker keeps handling requests while others wait on the DB. Run with:
+
+    gunicorn castor.asgi:application -k uvicorn.workers.UvicornWorker --workers 2
+
+or, for a single process, 'uvicorn castor.asgi:application'.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
@@ -12,5 +18,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "castor.settings")
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
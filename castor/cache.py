@@ -0,0 +1,261 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.db import router, transaction
+
+# Prefix of the shared-tier keys holding each cached key's stamp
+STAMP_PREFIX = 'tiered:stamp:'
+# Local copies are dropped after this many seconds, whatever their shared timeout
+DEFAULT_LOCAL_TIMEOUT = 30
+# Seconds between checks of local entries' stamps
+DEFAULT_SYNC_INTERVAL = 1
+
+_MISSING = object()
+
+
+class _LocalTier:
+    """One process's copies of shared entries, used by all its threads.
+
+    Holds pickled values (so callers never share mutable objects) in LRU
+    order, as key: (pickled value, monotonic expiry time, stamp key, stamp,
+    cache key version).
+    """
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.synced_at = float('-inf')
+
+
+# Local tiers of this process, by shared cache alias
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """Cache backend keeping a per-process LRU in front of a shared cache.
+
+    LOCATION names the shared cache's alias in settings.CACHES (e.g. a
+    DatabaseCache). Reads are served from this process's local tier when
+    possible, and fill it from the shared tier otherwise; writes go to the
+    shared tier. Options:
+
+        MAX_ENTRIES: local entries kept, least recently used evicted first
+        LOCAL_TIMEOUT: seconds a local copy is kept (default 30)
+        SYNC_INTERVAL: seconds between checks for other processes' writes (default 1)
+
+    Each key kept locally has a stamp in the shared tier (a random token
+    under STAMP_PREFIX + key), read along with its value and remembered
+    with the local copy. Writes to a key delete its stamp, and drop this
+    process's copy. Other processes check their copies' stamps (in one
+    get_many()) at most once per SYNC_INTERVAL, and drop those whose stamp
+    has changed or gone, so they see writes within SYNC_INTERVAL seconds;
+    copies of other keys are kept. Local copies do not know their shared
+    timeout, so may outlive it by up to LOCAL_TIMEOUT seconds.
+
+    Values read or written inside a transaction on a DatabaseCache's DB may
+    yet be rolled back, so the local tier is bypassed within one.
+    """
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = location
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', DEFAULT_LOCAL_TIMEOUT))
+        self._sync_interval = float(options.get('SYNC_INTERVAL', DEFAULT_SYNC_INTERVAL))
+        with _local_tiers_lock:
+            self._tier = _local_tiers.setdefault(location, _LocalTier())
+
+    @property
+    def _shared(self) -> BaseCache:
+        return caches[self._shared_alias]
+
+    def _local_usable(self, shared: BaseCache) -> bool:
+        """Whether the local tier may be used (see class docstring).
+        """
+        if not isinstance(shared, BaseDatabaseCache):
+            return True
+        db = router.db_for_write(shared.cache_model_class)
+        return not transaction.get_connection(db).in_atomic_block
+
+    @staticmethod
+    def _stamp_key(local_key: str) -> str:
+        # Local keys already carry this cache's prefix and version
+        return STAMP_PREFIX + local_key
+
+    def _sync(self, shared: BaseCache) -> None:
+        """Drops local entries whose stamps changed since they were read.
+        """
+        tier = self._tier
+        now = time.monotonic()
+        if now - tier.synced_at < self._sync_interval:
+            return
+        with tier.lock:
+            tier.synced_at = now
+            # Stamps are kept under their key's version, so are read by version
+            by_version = {}
+            for key, entry in tier.entries.items():
+                by_version.setdefault(entry[4], {})[key] = entry[2:4]
+        for version, stamped in by_version.items():
+            stamps = shared.get_many([stamp_key for stamp_key, _ in stamped.values()],
+                                     version=version)
+            with tier.lock:
+                for key, (stamp_key, stamp) in stamped.items():
+                    entry = tier.entries.get(key)
+                    if entry is not None and entry[3] == stamp and stamps.get(stamp_key) != stamp:
+                        del tier.entries[key]
+
+    def _invalidate(self, shared: BaseCache, local_keys: list[str], version) -> None:
+        """Drops every process's local copies of keys (this one's right away), after a write.
+        """
+        shared.delete_many([self._stamp_key(local_key) for local_key in local_keys],
+                           version=version)
+        with self._tier.lock:
+            for local_key in local_keys:
+                self._tier.entries.pop(local_key, None)
+
+    def _get_local(self, key: str):
+        tier = self._tier
+        with tier.lock:
+            entry = tier.entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[1] <= time.monotonic():
+                del tier.entries[key]
+                return _MISSING
+            tier.entries.move_to_end(key)
+        return pickle.loads(entry[0])
+
+    def _set_local(self, key: str, value, stamp, version) -> None:
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        tier = self._tier
+        with tier.lock:
+            tier.entries[key] = (pickled, time.monotonic() + self._local_timeout,
+                                 self._stamp_key(key), stamp, version)
+            tier.entries.move_to_end(key)
+            while len(tier.entries) > self._max_entries:
+                tier.entries.popitem(last=False)
+
+    def _fill(self, shared: BaseCache, keys: list, version) -> dict:
+        """Reads keys from the shared tier along with their stamps, keeping
+        local copies of those found.
+
+        A key found without a stamp is given one, then read again: values
+        are only kept with a stamp read in the same get_many(), so a write
+        racing the read always changes or deletes the stamp kept.
+
+        Returns:
+            dict of the values found, by key
+        """
+        local_keys = {key: self.make_and_validate_key(key, version=version) for key in keys}
+        stamp_keys = {key: self._stamp_key(local_key) for key, local_key in local_keys.items()}
+        found = shared.get_many([*keys, *stamp_keys.values()], version=version)
+        unstamped = [key for key in keys if key in found and stamp_keys[key] not in found]
+        if unstamped:
+            token = uuid.uuid4().hex
+            for key in unstamped:
+                shared.add(stamp_keys[key], token, self.default_timeout, version=version)
+            reread = shared.get_many([*unstamped, *(stamp_keys[key] for key in unstamped)],
+                                     version=version)
+            # The re-read replaces the first: keys deleted in between are gone
+            for key in unstamped:
+                for shared_key in (key, stamp_keys[key]):
+                    if shared_key in reread:
+                        found[shared_key] = reread[shared_key]
+                    else:
+                        found.pop(shared_key, None)
+        values = {}
+        for key in keys:
+            if key not in found:
+                continue
+            values[key] = found[key]
+            if found.get(stamp_keys[key]) is not None:
+                self._set_local(local_keys[key], found[key], found[stamp_keys[key]], version)
+        return values
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        shared = self._shared
+        if not self._local_usable(shared):
+            return shared.get_many(keys, version=version)
+
+        self._sync(shared)
+        found = {}
+        for key in keys:
+            value = self._get_local(self.make_and_validate_key(key, version=version))
+            if value is not _MISSING:
+                found[key] = value
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(self._fill(shared, missing, version))
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        shared = self._shared
+        shared.set(key, value, self._shared_timeout(timeout), version=version)
+        self._invalidate(shared, [self.make_and_validate_key(key, version=version)], version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        shared = self._shared
+        failed = shared.set_many(data, self._shared_timeout(timeout), version=version)
+        self._invalidate(shared, [self.make_and_validate_key(key, version=version)
+                                  for key in data], version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        shared = self._shared
+        added = shared.add(key, value, self._shared_timeout(timeout), version=version)
+        if added:
+            self._invalidate(shared, [self.make_and_validate_key(key, version=version)], version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # Only the shared timeout changes; local copies expire on their own
+        return self._shared.touch(key, self._shared_timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        shared = self._shared
+        value = shared.incr(key, delta, version=version)
+        self._invalidate(shared, [self.make_and_validate_key(key, version=version)], version)
+        return value
+
+    def delete(self, key, version=None):
+        shared = self._shared
+        deleted = shared.delete(key, version=version)
+        self._invalidate(shared, [self.make_and_validate_key(key, version=version)], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        shared = self._shared
+        local_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        # The keys and their stamps go in one statement
+        shared.delete_many([*keys, *(self._stamp_key(local_key) for local_key in local_keys)],
+                           version=version)
+        with self._tier.lock:
+            for local_key in local_keys:
+                self._tier.entries.pop(local_key, None)
+
+    def discard_local(self, keys, version=None) -> None:
+        """Drops this process's local copies of keys, leaving the shared tier
+        as is, so the next reads go to it (as reads from another process do).
+        """
+        with self._tier.lock:
+            for key in keys:
+                self._tier.entries.pop(self.make_and_validate_key(key, version=version), None)
+
+    def clear(self):
+        # Clearing also deletes every stamp, which other processes see as changes
+        self._shared.clear()
+        with self._tier.lock:
+            self._tier.entries.clear()
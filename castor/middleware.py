@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates, Template, TemplateDoesNotExist, reraise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Requests kept per view for the rolling statistics
+PROFILE_WINDOW = 1000
+# Wall-time histogram bucket upper bounds, in ms (last bucket is unbounded)
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+# Repeats of one query within a request that get logged as a likely N+1
+DUPLICATE_WARNING_THRESHOLD = 5
+
+# Profile of the request being handled in this thread/task, if sampled
+_active = ContextVar('castor_profile', default=None)
+
+
+class _RequestProfile:
+    """Timings gathered while handling one sampled request."""
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # DB execute wrapper: the same SQL with different params counts as a repeat
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Number of queries that repeated an earlier query's SQL."""
+        return sum(count - 1 for count in self.queries.values())
+
+
+class _ProfiledTemplate(Template):
+    """Template timing its renders in sampled requests.
+
+    Templates included or extended by this one are rendered by the engine
+    directly, so their time counts towards this render only.
+    """
+    def render(self, context=None, request=None):
+        profile = _active.get()
+        if profile is None:
+            return super().render(context, request)
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            profile.template_time += time.perf_counter() - start
+
+
+class ProfiledDjangoTemplates(DjangoTemplates):
+    """Django template backend reporting render times to ProfilingMiddleware.
+
+    Used as the BACKEND in settings.TEMPLATES; outside sampled requests it
+    behaves (and costs) the same as DjangoTemplates.
+    """
+    def from_string(self, template_code):
+        return _ProfiledTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return _ProfiledTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+class ViewStats:
+    """Rolling per-view request timings for this worker process.
+
+    Holds the last PROFILE_WINDOW sampled requests for each view, as
+    (wall ms, db ms, template ms, queries, duplicate queries) tuples.
+    """
+    def __init__(self):
+        self._samples = {}
+        self._worst_duplicates = {}
+        self._lock = threading.Lock()
+
+    def record(self, view: str, sample: tuple, profile: _RequestProfile) -> None:
+        with self._lock:
+            self._samples.setdefault(view, deque(maxlen=PROFILE_WINDOW)).append(sample)
+            if profile.duplicates:
+                sql, count = profile.queries.most_common(1)[0]
+                if count > self._worst_duplicates.get(view, (None, 0))[1]:
+                    self._worst_duplicates[view] = (sql, count)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._worst_duplicates.clear()
+
+    def report(self) -> dict:
+        """Summarizes each view's samples.
+
+        Returns:
+            dict mapping view names to:
+                {'requests': int,
+                 'wall_ms': {'p50', 'p95', 'p99', 'max'},
+                 'db_ms': {...}, 'template_ms': {...},
+                 'queries': {...}, 'duplicate_queries': {...},
+                 'histogram': [[bucket upper bound in ms or None, count], ...],
+                 'worst_duplicate': {'sql': str, 'count': int} or None}
+        """
+        with self._lock:
+            samples = {view: list(rows) for view, rows in self._samples.items()}
+            worst = dict(self._worst_duplicates)
+
+        report = {}
+        for view, rows in sorted(samples.items()):
+            columns = dict(zip(('wall_ms', 'db_ms', 'template_ms', 'queries',
+                                'duplicate_queries'), zip(*rows)))
+            summary = {'requests': len(rows)}
+            for name, values in columns.items():
+                summary[name] = _percentiles(values)
+
+            counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+            for wall_ms in columns['wall_ms']:
+                counts[next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS)
+                             if wall_ms <= bound), len(HISTOGRAM_BUCKETS_MS))] += 1
+            summary['histogram'] = [[bound, count] for bound, count
+                                    in zip(HISTOGRAM_BUCKETS_MS + (None,), counts)]
+
+            sql, count = worst.get(view, (None, 0))
+            summary['worst_duplicate'] = {'sql': sql, 'count': count} if sql else None
+            report[view] = summary
+        return report
+
+
+def _percentiles(values: tuple) -> dict:
+    """Returns p50/p95/p99/max of a column of samples, rounded for display.
+    """
+    if len(values) < 2:
+        cuts = values * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'p50': round(cuts[49], 2), 'p95': round(cuts[94], 2),
+            'p99': round(cuts[98], 2), 'max': round(max(values), 2)}
+
+
+# Statistics shared by all requests in this worker process
+view_stats = ViewStats()
+
+
+class ProfilingMiddleware:
+    """Profiles a sample of requests, reporting where their time went.
+
+    A PROFILING_SAMPLE_RATE fraction of requests (0 disables profiling) get
+    their wall time, DB query count and time, template render time and
+    repeated queries (the same SQL run more than once, usually an N+1
+    pattern) recorded. These are kept per view in view_stats (see
+    castor/views.py/profiling()), and returned to staff users in a
+    Server-Timing header. Template times come from ProfiledDjangoTemplates.
+    Unsampled requests only pay for one random() call.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI, mark this instance as a coroutine function, as MiddlewareMixin does
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.async_mode:
+            return self.__acall__(request)
+        if random.random() >= getattr(settings, 'PROFILING_SAMPLE_RATE', 0):
+            return self.get_response(request)
+        return self._profile(request, self.get_response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        if random.random() >= getattr(settings, 'PROFILING_SAMPLE_RATE', 0):
+            return await self.get_response(request)
+        # DB execute wrappers are per thread, so a sampled request is handled from one
+        # thread; the async ORM's queries run back in that same thread
+        return await sync_to_async(self._profile)(request, async_to_sync(self.get_response))
+
+    def _profile(self, request: HttpRequest, get_response) -> HttpResponse:
+        """Handles a sampled request, recording its profile.
+        """
+        profile = _RequestProfile()
+        token = _active.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = get_response(request)
+        finally:
+            _active.reset(token)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        db_ms = profile.db_time * 1000
+        template_ms = profile.template_time * 1000
+        query_ct = sum(profile.queries.values())
+        duplicates = profile.duplicates
+        # Timings reveal how much work a request took, so are only shown to staff
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            response['Server-Timing'] = ', '.join((
+                f'total;dur={wall_ms:.1f}',
+                f'db;dur={db_ms:.1f};desc="{query_ct} queries"',
+                f'tpl;dur={template_ms:.1f}',
+                f'dup;desc="{duplicates} repeated queries"',
+            ))
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        view_stats.record(view, (wall_ms, db_ms, template_ms, query_ct, duplicates), profile)
+        if duplicates >= DUPLICATE_WARNING_THRESHOLD:
+            sql, count = profile.queries.most_common(1)[0]
+            logger.warning(view + " ran one query " + str(count) + " times: " + sql)
+
+        return response
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise, able to run in an async middleware chain.
+
+    WhiteNoise is sync-only, so under ASGI Django would run every request's
+    middleware (and async views) from a thread on its account. Static files
+    are looked up in memory and only read while the response is sent, so
+    the lookup is safe to run on the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        # As WhiteNoiseMiddleware.__call__()
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class ConcurrencyLimitMiddleware:
+    """Limits how many requests an async worker handles at once.
+
+    Each async request runs its queries in a thread, with a DB connection,
+    of its own, so an unbounded number in flight would exhaust the DB's
+    connections. Requests over ASYNC_MAX_CONCURRENT_REQUESTS wait on the
+    event loop. Sync workers handle one request at a time, so pass through.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self._slots = asyncio.Semaphore(settings.ASYNC_MAX_CONCURRENT_REQUESTS)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        async with self._slots:
+            return await self.get_response(request)
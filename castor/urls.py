@@ -1,9 +1,12 @@
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic.base import RedirectView
+from castor import views
 
 urlpatterns = [
     path('', include('planner.urls')),
+    # Listed ahead of the admin site, whose catch-all view would shadow it
+    path("sG8muBDox7No4g/profiling", views.profiling, name='profiling'),
     path("sG8muBDox7No4g/", admin.site.urls),
     path("accounts/", include('allauth.urls')),
     path("accounts/", RedirectView.as_view(pattern_name='account_login'), name='accounts-redirect'),
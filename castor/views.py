@@ -0,0 +1,17 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpRequest, JsonResponse
+from django.views.decorators.http import require_http_methods
+from castor.middleware import view_stats
+
+
+@staff_member_required
+@require_http_methods(["GET", "DELETE"])
+def profiling(request: HttpRequest) -> JsonResponse:
+    """Shows this worker's rolling per-view request profiles (admin only).
+
+    GET returns the report from castor/middleware.py/ViewStats.report();
+    DELETE clears it. Each worker process keeps its own statistics.
+    """
+    if request.method == 'DELETE':
+        view_stats.clear()
+    return JsonResponse(view_stats.report())
@@ -1,9 +1,43 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, Course, Schedule, Course_Schedule, Prereq 
+from .models import User, Course, Schedule, Course_Schedule, Prereq, CatalogRevision, Offering
+from .utils import ScheduleUtils
+
+
+class CourseScheduleAdmin(admin.ModelAdmin):
+    """Rebuilds the placements documents of schedules whose placements are edited."""
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sched_ids = {obj.schedule_id}
+        if change and 'schedule' in form.changed_data:
+            sched_ids.add(form.initial['schedule'])
+        ScheduleUtils.rebuild_placements(list(sched_ids))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        ScheduleUtils.rebuild_placements([obj.schedule_id])
+
+    def delete_queryset(self, request, queryset):
+        sched_ids = list(queryset.values_list('schedule_id', flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        ScheduleUtils.rebuild_placements(sched_ids)
+
+
+class CourseAdmin(admin.ModelAdmin):
+    """Rebuilds the placements documents of schedules placing a course whose
+    credits or required flag are edited, as their aggregates count them."""
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and {'credits', 'required'} & set(form.changed_data):
+            ScheduleUtils.rebuild_placements(list(
+                Course_Schedule.objects.filter(course=obj)
+                .values_list('schedule_id', flat=True).distinct()))
+
 
 admin.site.register(User, UserAdmin)
-admin.site.register(Course)
+admin.site.register(Course, CourseAdmin)
 admin.site.register(Schedule)
-admin.site.register(Course_Schedule) 
-admin.site.register(Prereq)
\ No newline at end of file
+admin.site.register(Course_Schedule, CourseScheduleAdmin)
+admin.site.register(Prereq)
+admin.site.register(CatalogRevision)
+admin.site.register(Offering)
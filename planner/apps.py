@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PlannerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "planner"
+
+    def ready(self):
+        from planner import signals
+        post_migrate.connect(signals.catalog_migrated, sender=self)
@@ -0,0 +1,100 @@
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import HttpResponse, redirect
+from django.http import HttpRequest, JsonResponse, HttpResponseBadRequest, HttpResponseNotAllowed
+from planner import views
+from planner.models import Schedule
+
+# Async versions of the schedule views, served under ASGI (see castor/asgi.py).
+# Queries await Django's async ORM, so a worker keeps serving other requests
+# while one waits on the DB; work that needs a transaction or a template
+# render is handed to a thread with sync_to_async(). Request parsing and
+# response building are shared with the sync views.
+
+
+async def _is_authenticated(request: HttpRequest) -> bool:
+    """Loads the session's user (a DB query) off the event loop.
+    """
+    return await sync_to_async(lambda: request.user.is_authenticated)()
+
+
+def alogin_required(view):
+    """Async counterpart of django.contrib.auth.decorators.login_required.
+    """
+    @wraps(view)
+    async def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        if not await _is_authenticated(request):
+            return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def index(request: HttpRequest) -> HttpResponse:
+    """Async version of planner/views.py/index().
+
+    Logged-out visitors get the cached demo page from the sync view, which
+    also handles its conditional GETs.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    if not await _is_authenticated(request):
+        return await sync_to_async(views.index)(request)
+    return await sync_to_async(views._redirect_to_latest)(request)
+
+
+@alogin_required
+async def create(request: HttpRequest) -> JsonResponse:
+    """Async version of planner/views.py/create().
+    """
+    if request.method == 'GET':
+        return redirect('/')
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    return await sync_to_async(views._create_schedule)(request)
+
+
+@alogin_required
+async def sched_router(request: HttpRequest, sched_id: int) -> HttpResponse:
+    """Async version of planner/views.py/sched_router().
+
+    Deletes and title updates are rare, so still run the sync views.
+    """
+    if request.method == 'GET':
+        return await display(request, sched_id)
+    elif request.method == 'PATCH':
+        return await update_schedule(request, sched_id)
+    elif request.method == 'DELETE':
+        return await sync_to_async(views.delete)(request, sched_id)
+    elif request.method == 'POST':
+        return await sync_to_async(views.update_title)(request, sched_id)
+    else:
+        return HttpResponseNotAllowed(['GET', 'POST', 'DELETE', 'PATCH'])
+
+
+async def display(request: HttpRequest, sched_id: int) -> HttpResponse:
+    """Async version of planner/views.py/display().
+
+    Building the context and rendering take one trip to a thread.
+    """
+    try:
+        schedule = await Schedule.objects.filter(user=request.user).aget(id=sched_id)
+    except Schedule.DoesNotExist:
+        return HttpResponseBadRequest('Schedule not found')
+    return await sync_to_async(views._render_schedule)(request, schedule)
+
+
+async def update_schedule(request: HttpRequest, sched_id: int) -> JsonResponse:
+    """Async version of planner/views.py/update_schedule().
+
+    The update itself runs in a transaction, so is applied in a thread.
+    """
+    update = views._parse_update(request, sched_id)
+    if isinstance(update, JsonResponse):
+        return update
+    try:
+        schedule = await Schedule.objects.filter(user=request.user).aget(id=sched_id)
+    except Schedule.DoesNotExist:
+        return views._schedule_not_found(sched_id)
+    return await sync_to_async(views._apply_update)(schedule, *update)
@@ -0,0 +1,273 @@
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+from django.test.utils import setup_databases, teardown_databases
+from planner.management.commands.scrape import Command as ScrapeCommand, CourseInfo, offerings_digest
+from planner.models import CatalogRevision, Course, Course_Schedule, Offering, Prereq, Schedule, User
+from planner.utils import CatalogUtils, ScheduleUtils, ValidationUtils
+
+FIXTURE_DIR = Path(__file__).resolve().parents[2] / 'fixtures' / 'bench'
+# Catalog JSON as scraped from eCampus (recorded, so runs are repeatable)
+SCRAPE_FIXTURE = FIXTURE_DIR / 'catalog_scrape.json'
+# Recorded results that runs are compared against
+BASELINE_FILE = FIXTURE_DIR / 'baseline.json'
+# Postbac core courses, marked required when loading the fixture
+REQUIRED_COURSES = (161, 162, 225, 261, 271, 290, 325, 340, 344, 361, 362, 372, 467)
+# Target duration of each timed round, in seconds
+ROUND_TIME = 0.05
+# Differences below this many ms are treated as noise, never as regressions
+NOISE_FLOOR_MS = 0.02
+
+
+class _QueryCounter:
+    """DB execute wrapper counting queries, without DEBUG-level logging."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _Rollback(Exception):
+    """Raised to discard all fixture rows once measurements are done."""
+    pass
+
+
+@contextmanager
+def throwaway_database(verbosity: int = 0):
+    """Points the default DB alias at a freshly migrated test database
+    (named as the test runner names it) for the duration of a block, then
+    destroys it, so benchmarks never touch the configured database.
+    """
+    old_config = setup_databases(verbosity, interactive=False, aliases={DEFAULT_DB_ALIAS},
+                                 serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity)
+
+
+class Command(BaseCommand):
+    """Micro-benchmarks the code paths behind each page and the scraper.
+
+    Run via 'python manage.py bench'. Creates a throwaway test database
+    (see throwaway_database()), loads the recorded catalog fixture
+    (planner/fixtures/bench/catalog_scrape.json) into it along with a sample
+    user and schedule, then times each benchmark and counts its queries.
+    With --use-default-db, the configured database is used instead, its
+    catalog replaced inside a transaction that is rolled back afterwards.
+
+    Results are compared against planner/fixtures/bench/baseline.json, and
+    the command fails if any benchmark's median round is slower than its
+    baseline by more than --threshold, or it runs more queries. Timings depend on the machine,
+    so re-record the baseline (--record) when moving to a new one.
+    """
+    help = "Benchmark ScheduleUtils and scraper hot paths against a recorded baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=9,
+                            help="Timed rounds per benchmark (median is compared)")
+        # DB-bound timings vary run to run; query counts catch most real regressions
+        parser.add_argument('--threshold', type=float, default=0.5,
+                            help="Allowed slowdown vs baseline, as a fraction")
+        parser.add_argument('--record', action='store_true',
+                            help="Save results as the new baseline")
+        parser.add_argument('--baseline', default=str(BASELINE_FILE),
+                            help="Baseline file to compare against / record to")
+        parser.add_argument('--only', nargs='*', default=None,
+                            help="Names of benchmarks to run (default: all)")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+        parser.add_argument('--use-default-db', action='store_true',
+                            help="Run against the configured database (rolled back) "
+                                 "instead of a throwaway test database")
+
+    def handle(self, *args, **options) -> None:
+        with open(SCRAPE_FIXTURE) as f:
+            scraped_data = json.load(f)
+
+        if options['use_default_db']:
+            results = self._run(scraped_data, options)
+        else:
+            with throwaway_database(options['verbosity']):
+                results = self._run(scraped_data, options)
+
+        if options['record']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+            self.stderr.write("Baseline recorded to " + options['baseline'])
+
+        baseline = {}
+        if Path(options['baseline']).exists():
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        regressions = self._compare(results, baseline, options['threshold'])
+
+        if options['json']:
+            self.stdout.write(json.dumps({'results': results, 'regressions': regressions},
+                                         indent=2))
+        else:
+            for name, stats in results.items():
+                base = baseline.get(name)
+                change = f"{stats['median_ms'] / base['median_ms'] - 1:+7.1%}" \
+                    if base and base['median_ms'] else '    n/a'
+                self.stdout.write(f"{name:<24}{stats['median_ms']:10.3f} ms  {change}   "
+                                  f"(min {stats['min_ms']:.3f} ms)   queries {stats['queries']}")
+        if regressions:
+            raise CommandError("Performance regressions: " + '; '.join(regressions))
+
+    def _run(self, scraped_data: list[dict], options: dict) -> dict:
+        """Sets up and measures the benchmarks, rolling back all their rows.
+
+        Returns:
+            dict mapping benchmark names to their measurements
+        """
+        results = {}
+        try:
+            with transaction.atomic():
+                benchmarks = self._setup(scraped_data)
+                for name, func in benchmarks.items():
+                    if options['only'] and name not in options['only']:
+                        continue
+                    results[name] = self._measure(func, options['rounds'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        # The catalog was swapped for the fixture; make sure no snapshot of it survives
+        CatalogUtils.bump_catalog_version()
+        return results
+
+    def _setup(self, scraped_data: list[dict]) -> dict:
+        """Replaces the catalog with the fixture and builds the benchmarks.
+
+        Returns:
+            dict mapping benchmark names to zero-argument callables
+        """
+        scraped_courses = ScrapeCommand._build_scraped_courses(scraped_data)
+        offerings = [course['Offerings']['CourseOffering'] for course in scraped_data
+                     if CourseInfo.is_valid_postbac_course(course['CourseNumber'],
+                                                           course['SubjectCode'])]
+        offerings = [sessions if isinstance(sessions, list) else [sessions]
+                     for sessions in offerings]
+
+        # Load the fixture catalog and its offerings, with stubs of prereqs in other
+        # subjects (e.g. MTH 111), so the DB matches the scrape as after a sync
+        Course.objects.all().delete()
+        scraped_keys = {course.key for course in scraped_courses}
+        stub_keys = sorted({prq_key for course in scraped_courses for prq_key in course.prereqs
+                            if prq_key not in scraped_keys})
+        created = Course.objects.bulk_create(
+            [Course(subject=course.subject, course_number=course.course_number,
+                    title=course.title, credits=course.credits, qtrs=course.qtrs,
+                    required=course.course_number in REQUIRED_COURSES)
+             for course in scraped_courses] +
+            [Course(subject=subject, course_number=crs_num, title=subject + ' ' + str(crs_num))
+             for subject, crs_num in stub_keys])
+        ids = {(course.subject, course.course_number): course.id for course in created}
+        Prereq.objects.bulk_create(
+            [Prereq(course_id=ids[course.key], prereq_id=ids[prq_key])
+             for course in scraped_courses for prq_key in course.prereqs])
+        revision, _ = CatalogRevision.objects.get_or_create(
+            digest=offerings_digest(scraped_courses),
+            defaults={'terms': sorted({year * 4 + qtr for course in scraped_courses
+                                       for year, qtr in course.terms})})
+        Offering.objects.bulk_create(
+            [Offering(course_id=ids[course.key], year=year, qtr=qtr, revision=revision)
+             for course in scraped_courses for year, qtr in course.terms])
+        CatalogUtils.bump_catalog_version()
+        catalog = CatalogUtils.get_catalog()
+
+        # A schedule holding the required courses, one per term from Fall 2024
+        first_term = 2024 * 4 + 3
+        placements = {}
+        for crs_num in ValidationUtils.get_rules(catalog).order:
+            if crs_num in REQUIRED_COURSES:
+                placements[crs_num] = divmod(first_term + len(placements), 4)
+        user = User.objects.create(username='bench_' + str(time.time_ns()))
+        end_year, end_qtr = max(placements.values())
+        document = ScheduleUtils.pack_placements(placements, catalog)
+        schedule = Schedule.objects.create(user=user, start_qtr=3, start_year=2024,
+                                           end_qtr=end_qtr, end_year=end_year,
+                                           **document._asdict())
+        Course_Schedule.objects.bulk_create(
+            [Course_Schedule(schedule=schedule, course_id=catalog.by_number[crs_num].id,
+                             year=year, qtr=qtr)
+             for crs_num, (year, qtr) in placements.items()])
+        changes = {str(crs_num): {'year': year, 'qtr': qtr}
+                   for crs_num, (year, qtr) in list(placements.items())[-5:]}
+        sched_list = [schedule]
+        # As in a scrape, only courses in the scraped subjects are compared
+        subjects = {course.subject for course in scraped_courses}
+        db_courses = [course for course in ScrapeCommand._load_db_courses()
+                      if course['subject'] in subjects]
+        scrape_command = ScrapeCommand()
+        # Discrepancies would be logged on every call, swamping the log and the timings
+        if scrape_command._compare_course_lists(scraped_courses, db_courses):
+            raise CommandError("Fixture catalog does not match its own scrape")
+
+        return {
+            'catalog_build': lambda: CatalogUtils.CatalogSnapshot.build(0),
+            'get_context_demo': ScheduleUtils.get_context_demo,
+            'get_context_existing':
+                lambda: ScheduleUtils.get_context_existing(schedule, user, sched_list),
+            'update_schedule':
+                lambda: ScheduleUtils.update_schedule(schedule, changes, {'start': {}, 'end': {}}),
+            'from_scraped':
+                lambda: [CourseInfo.from_scraped(sessions) for sessions in offerings],
+            'build_scraped_courses':
+                lambda: ScrapeCommand._build_scraped_courses(scraped_data),
+            'compare_course_lists':
+                lambda: scrape_command._compare_course_lists(scraped_courses, db_courses),
+        }
+
+    @staticmethod
+    def _measure(func, rounds: int) -> dict:
+        """Times a benchmark and counts the queries it runs.
+
+        Calls per round are calibrated so each round takes about ROUND_TIME.
+
+        Returns:
+            dict of median/min ms per call, and queries per call
+        """
+        counter = _QueryCounter()
+        with connection.execute_wrapper(counter):
+            func()
+
+        # Calibrate, then time each round
+        start = time.perf_counter()
+        func()
+        calls = max(1, int(ROUND_TIME / max(time.perf_counter() - start, 1e-6)))
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(calls):
+                func()
+            times.append((time.perf_counter() - start) / calls * 1000)
+
+        return {'median_ms': round(statistics.median(times), 4),
+                'min_ms': round(min(times), 4),
+                'queries': counter.count}
+
+    @staticmethod
+    def _compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+        """Lists benchmarks that are slower, or run more queries, than their baseline.
+        """
+        regressions = []
+        for name, stats in results.items():
+            base = baseline.get(name)
+            if base is None:
+                continue
+            if stats['queries'] > base['queries']:
+                regressions.append(f"{name} ran {stats['queries']} queries "
+                                   f"(baseline {base['queries']})")
+            limit = base['median_ms'] * (1 + threshold)
+            if stats['median_ms'] > limit and stats['median_ms'] - base['median_ms'] > NOISE_FLOOR_MS:
+                regressions.append(f"{name} took {stats['median_ms']:.3f} ms "
+                                   f"(baseline {base['median_ms']:.3f} ms)")
+        return regressions
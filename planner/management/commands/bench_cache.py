@@ -0,0 +1,87 @@
+import json
+import statistics
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from planner.management.commands.bench import _QueryCounter
+
+# Keys written by the benchmark (deleted afterwards)
+KEY_PREFIX = 'bench_cache:'
+# A few KB, like a cached page fragment or session
+LARGE_VALUE = {'courses': [{'course_number': 100 + i, 'title': 'Course ' + str(i),
+                            'qtrs': [0, 1, 2, 3]} for i in range(60)]}
+
+
+class Command(BaseCommand):
+    """Compares the tiered cache (castor/cache.py) with the DatabaseCache behind it.
+
+    Run via 'python manage.py bench_cache'. Runs each workload against the
+    'default' cache and its shared tier directly (the DatabaseCache used
+    before the tiered cache) for --duration seconds, and reports per-call
+    latency percentiles and DB queries per 1000 calls. 'get_small' is the
+    catalog version check every request makes.
+    """
+    help = "Benchmark the tiered cache against the shared DatabaseCache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=1.0,
+                            help="Seconds to run each workload for, per cache")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+
+    def handle(self, *args, **options) -> None:
+        tiered = settings.CACHES['default']
+        if tiered['BACKEND'] != 'castor.cache.TieredCache':
+            raise CommandError("The default cache is not a castor.cache.TieredCache")
+        backends = {'database': caches[tiered['LOCATION']], 'tiered': caches['default']}
+
+        results = {}
+        try:
+            for name, cache in backends.items():
+                cache.set(KEY_PREFIX + 'small', time.time_ns(), None)
+                cache.set(KEY_PREFIX + 'large', LARGE_VALUE, None)
+                workloads = {
+                    'get_small': lambda: cache.get(KEY_PREFIX + 'small'),
+                    'get_large': lambda: cache.get(KEY_PREFIX + 'large'),
+                    'get_miss': lambda: cache.get(KEY_PREFIX + 'missing'),
+                    'set_small': lambda: cache.set(KEY_PREFIX + 'written', 1),
+                }
+                for workload, func in workloads.items():
+                    results.setdefault(workload, {})[name] = \
+                        self._measure(func, options['duration'])
+        finally:
+            backends['tiered'].delete_many([KEY_PREFIX + key for key in
+                                            ('small', 'large', 'written')])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for workload, by_backend in results.items():
+            for name, stats in by_backend.items():
+                self.stdout.write(f"{workload:<12}{name:<10}{stats['p50_us']:10.1f} us p50"
+                                  f"{stats['p99_us']:10.1f} us p99"
+                                  f"{stats['queries_per_1k']:10.1f} queries/1k calls")
+
+    @staticmethod
+    def _measure(func, duration: float) -> dict:
+        """Calls func repeatedly for duration seconds, timing each call.
+
+        Returns:
+            dict of p50/p99 µs per call, calls made, and DB queries per 1000 calls
+        """
+        func()
+        counter = _QueryCounter()
+        times = []
+        with connections['default'].execute_wrapper(counter):
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                func()
+                times.append((time.perf_counter() - start) * 1e6)
+
+        cuts = statistics.quantiles(times, n=100, method='inclusive')
+        return {'p50_us': round(cuts[49], 1), 'p99_us': round(cuts[98], 1),
+                'calls': len(times),
+                'queries_per_1k': round(counter.count / len(times) * 1000, 1)}
@@ -0,0 +1,265 @@
+import json
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from planner.management.commands.bench import throwaway_database
+from planner.models import CatalogRevision, Course, Course_Schedule, Offering, Prereq, Schedule, User
+from planner.utils import CatalogUtils, ScheduleUtils, ValidationUtils
+
+# Number of courses moved by each timed save
+CHANGES_PER_SAVE = 20
+# Rows per INSERT while seeding
+SEED_BATCH_SIZE = 10000
+# Catalog tables copied into the throwaway database, parents first
+CATALOG_MODELS = (Course, Prereq, CatalogRevision, Offering)
+
+
+class _QueryCounter:
+    """DB execute wrapper counting queries, without DEBUG-level logging."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class _Rollback(Exception):
+    """Raised to discard all seeded rows once measurements are done."""
+    pass
+
+
+class Command(BaseCommand):
+    """Benchmarks schedule loading/saving against a large Course_Schedule table.
+
+    Run via 'python manage.py bench_placements'. Copies the configured
+    database's course catalog into a throwaway test database (see
+    bench.throwaway_database()), seeds ~1M placements inside a transaction,
+    times schedule loads and saves with the current schema ("after"), then
+    drops the (schedule, year, qtr) index and the (schedule, course) unique
+    constraint and times the legacy code paths ("before"). Requires a
+    loaded course catalog.
+
+    With --use-default-db, the configured database is used instead;
+    everything is rolled back at the end, so it is left unchanged.
+    """
+    help = "Benchmark schedule load/save latency with a large placements table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--placements', type=int, default=1000000,
+                            help="Number of Course_Schedule rows to seed")
+        parser.add_argument('--samples', type=int, default=200,
+                            help="Number of timed loads/saves per scenario")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+        parser.add_argument('--use-default-db', action='store_true',
+                            help="Run against the configured database (rolled back) "
+                                 "instead of a throwaway test database")
+
+    def handle(self, *args, **options) -> None:
+        if options['use_default_db']:
+            results = self._run(options)
+        else:
+            # The throwaway database starts empty, so takes a copy of the catalog
+            catalog_rows = [list(model.objects.all()) for model in CATALOG_MODELS]
+            with throwaway_database(options['verbosity']):
+                for model, rows in zip(CATALOG_MODELS, catalog_rows):
+                    model.objects.bulk_create(rows)
+                CatalogUtils.bump_catalog_version()
+                results = self._run(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for scenario in ('before', 'after'):
+            for op, stats in results[scenario].items():
+                self.stdout.write(f"{scenario:<7}{op:<6}p50 {stats['p50_ms']:8.2f} ms   "
+                                  f"p95 {stats['p95_ms']:8.2f} ms   "
+                                  f"queries {stats['queries']:.1f}")
+
+    def _run(self, options: dict) -> dict:
+        """Seeds placements and measures both scenarios, rolling everything back.
+
+        Returns:
+            dict mapping 'before'/'after' to measurements (see _measure())
+        """
+        catalog = CatalogUtils.get_catalog()
+        layout = self._valid_layout(catalog)
+        if len(layout) < CHANGES_PER_SAVE:
+            raise CommandError("Catalog needs at least " + str(CHANGES_PER_SAVE) +
+                               " placeable courses; load it before benchmarking")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                schedules = self._seed(layout, options['placements'])
+                sample = random.sample(schedules, min(options['samples'], len(schedules)))
+
+                results['after'] = self._measure(sample, layout, legacy=False)
+                self._drop_indexes()
+                results['before'] = self._measure(sample, layout, legacy=True)
+
+                # Discard seeded rows and restore dropped indexes
+                raise _Rollback
+        except _Rollback:
+            pass
+        return results
+
+    def _seed(self, layout: dict[int, tuple[int, int]], placements: int) -> list[Schedule]:
+        """Bulk-creates schedules, each with the same valid layout of courses.
+
+        Returns:
+            list of the seeded Schedule objects
+        """
+        user = User.objects.create(username='bench_placements_' + str(time.time_ns()))
+        per_schedule = len(layout)
+        sched_ct = max(1, placements // per_schedule)
+        end_year, end_qtr = max(layout.values())
+
+        catalog = CatalogUtils.get_catalog()
+        document = ScheduleUtils.pack_placements(layout, catalog)
+        schedules = Schedule.objects.bulk_create(
+            [Schedule(user=user, start_qtr=0, end_qtr=end_qtr, start_year=2024,
+                      end_year=end_year, **document._asdict())
+             for _ in range(sched_ct)],
+            batch_size=SEED_BATCH_SIZE)
+
+        # Insert placements in batches, to keep memory flat
+        batch = []
+        for schedule in schedules:
+            for crs_num, (year, qtr) in layout.items():
+                batch.append(Course_Schedule(schedule=schedule,
+                                             course_id=catalog.by_number[crs_num].id,
+                                             year=year, qtr=qtr))
+            if len(batch) >= SEED_BATCH_SIZE:
+                Course_Schedule.objects.bulk_create(batch)
+                batch = []
+        Course_Schedule.objects.bulk_create(batch)
+
+        # Make sure the planner sees realistic table statistics
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE ' + Course_Schedule._meta.db_table)
+
+        self.stderr.write("Seeded " + str(sched_ct * per_schedule) + " placements")
+        return schedules
+
+    @staticmethod
+    def _valid_layout(catalog: CatalogUtils.CatalogSnapshot) -> dict[int, tuple[int, int]]:
+        """Places catalog courses term by term (four per term, from Winter 2024)
+        so that every placement passes ValidationUtils checks.
+
+        Returns:
+            dict mapping course numbers to (year, qtr) tuples
+        """
+        rules = ValidationUtils.get_rules(catalog)
+        remaining = list(rules.numbers)
+        layout = {}
+        done_mask = 0
+        term = 2024 * 4
+        # Stop once no course has been placeable for a full year
+        idle_terms = 0
+        while remaining and idle_terms < 4:
+            year, qtr = divmod(term, 4)
+            term_mask = 0
+            for crs_num in [crs_num for crs_num in remaining
+                            if not rules.prereq_masks[crs_num] & ~done_mask
+                            and rules.qtr_masks[crs_num] >> qtr & 1][:4]:
+                layout[crs_num] = (year, qtr)
+                term_mask |= rules.bits[crs_num]
+                remaining.remove(crs_num)
+            done_mask |= term_mask
+            idle_terms = 0 if term_mask else idle_terms + 1
+            term += 1
+
+        return layout
+
+    @staticmethod
+    def _drop_indexes() -> None:
+        """Drops the indexes added in migration 0005 (rolled back afterwards).
+
+        On SQLite, only the term index is dropped: the unique constraint is
+        part of the table definition, which cannot be rebuilt mid-transaction.
+        """
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                for index in Course_Schedule._meta.indexes:
+                    cursor.execute('DROP INDEX ' + connection.ops.quote_name(index.name))
+            return
+        # Postgres refuses ALTER TABLE while deferred FK checks are pending
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        with connection.schema_editor() as editor:
+            for index in Course_Schedule._meta.indexes:
+                editor.remove_index(Course_Schedule, index)
+            for constraint in Course_Schedule._meta.constraints:
+                editor.remove_constraint(Course_Schedule, constraint)
+
+    def _measure(self, sample: list[Schedule], layout: dict[int, tuple[int, int]],
+                 legacy: bool) -> dict:
+        """Times loading and saving each sampled schedule.
+
+        Args:
+            sample: schedules to load/save
+            layout: course placements seeded into each schedule
+            legacy: if True, use the pre-0005 per-term loads and get-then-save writes
+
+        Returns:
+            dict mapping 'load'/'save' to latency percentiles and query counts
+        """
+        timings = {'load': [], 'save': []}
+        counters = {'load': _QueryCounter(), 'save': _QueryCounter()}
+        user = sample[0].user
+
+        for schedule in sample:
+            with connection.execute_wrapper(counters['load']):
+                start = time.perf_counter()
+                if legacy:
+                    self._legacy_load(schedule)
+                else:
+                    ScheduleUtils.get_context_existing(schedule, user, [schedule])
+                timings['load'].append(time.perf_counter() - start)
+
+            # Re-save a random subset of placements (keeps the schedule valid)
+            changes = {str(crs_num): {'year': layout[crs_num][0], 'qtr': layout[crs_num][1]}
+                       for crs_num in random.sample(list(layout), CHANGES_PER_SAVE)}
+            with connection.execute_wrapper(counters['save']):
+                start = time.perf_counter()
+                if legacy:
+                    self._legacy_save(schedule, changes)
+                else:
+                    ScheduleUtils.update_schedule(schedule, changes, {'start': {}, 'end': {}})
+                timings['save'].append(time.perf_counter() - start)
+
+        return {op: {'p50_ms': statistics.median(times) * 1000,
+                     'p95_ms': statistics.quantiles(times, n=20)[-1] * 1000,
+                     'queries': counters[op].count / len(sample)}
+                for op, times in timings.items()}
+
+    @staticmethod
+    def _legacy_load(schedule: Schedule) -> None:
+        """Loads placements one term at a time, as before migration 0005.
+        """
+        placements = Course_Schedule.objects.filter(schedule=schedule)
+        for year in range(schedule.start_year, schedule.end_year + 1):
+            for qtr in range(4):
+                for crs_sch in placements.filter(year=year, qtr=qtr):
+                    crs_sch.course.credits
+
+    @staticmethod
+    def _legacy_save(schedule: Schedule, changes: dict) -> None:
+        """Saves changes with one get-then-save per course, as before 0005.
+        """
+        for crs_num, term in changes.items():
+            course = Course.objects.get(subject=CatalogUtils.PLANNED_SUBJECT,
+                                        course_number=int(crs_num))
+            try:
+                crs_sch = Course_Schedule.objects.get(schedule=schedule, course=course)
+            except Course_Schedule.DoesNotExist:
+                crs_sch = Course_Schedule(schedule=schedule, course=course)
+            crs_sch.year = term['year']
+            crs_sch.qtr = term['qtr']
+            crs_sch.save()
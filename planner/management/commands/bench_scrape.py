@@ -0,0 +1,131 @@
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from bs4 import BeautifulSoup, Comment
+from django.core.management.base import BaseCommand
+from planner.management.commands.bench import SCRAPE_FIXTURE
+from planner.management.commands.scrape import (START, Command as ScrapeCommand,
+                                                _read_chunks, iter_catalog_json,
+                                                iter_course_records)
+
+# Subjects synthetic catalogs cycle through once CS course numbers run out
+SUBJECTS = ('CS', 'MTH', 'PH', 'ECE', 'ST', 'BI', 'CH', 'WR')
+
+
+def _legacy_extract(path: Path) -> list:
+    """The previous extraction path: a full BeautifulSoup parse and json.loads().
+    """
+    soup = BeautifulSoup(path.read_text(), 'html.parser')
+    for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+        if START in comment:
+            return ScrapeCommand._build_scraped_courses(json.loads(comment))
+    return []
+
+
+def _streaming_extract(path: Path) -> list:
+    """The current extraction path (see scrape.iter_catalog_json()).
+    """
+    return ScrapeCommand._build_scraped_courses(
+        iter_course_records(iter_catalog_json(_read_chunks(path))))
+
+
+class Command(BaseCommand):
+    """Compares catalog extraction paths on large synthetic catalog pages.
+
+    Run via 'python manage.py bench_scrape'. Builds pages holding N course
+    records (copies of the recorded fixture's, renumbered across several
+    subjects) in an HTML comment, after an HTML listing of the same courses
+    as eCampus pages have, then reports the time and peak traced memory of
+    extracting CourseInfo instances with the previous BeautifulSoup/json.loads()
+    path and with the streaming one.
+    """
+    help = "Benchmark streaming catalog extraction against a full HTML parse"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, nargs='+', default=[1000, 5000, 20000],
+                            help="Course records per synthetic page")
+        parser.add_argument('--rounds', type=int, default=3,
+                            help="Timed rounds per path (fastest is reported)")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+
+    def handle(self, *args, **options) -> None:
+        with open(SCRAPE_FIXTURE) as f:
+            records = json.load(f)
+
+        results = []
+        for course_ct in options['courses']:
+            fd, name = tempfile.mkstemp(suffix='.html')
+            path = Path(name)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    self._write_page(f, records, course_ct)
+                result = {'courses': course_ct, 'page_mb': round(path.stat().st_size / 2 ** 20, 2)}
+                for label, extract in (('legacy', _legacy_extract),
+                                       ('streaming', _streaming_extract)):
+                    result[label] = self._measure(extract, path, options['rounds'])
+                results.append(result)
+            finally:
+                path.unlink()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for result in results:
+            self.stdout.write(f"{result['courses']:>7} courses ({result['page_mb']} MB)")
+            for label in ('legacy', 'streaming'):
+                stats = result[label]
+                self.stdout.write(f"    {label:<10}{stats['ms']:10.1f} ms"
+                                  f"{stats['peak_mb']:10.2f} MB peak"
+                                  f"   ({stats['parsed']} postbac courses)")
+
+    @staticmethod
+    def _write_page(f, records: list[dict], course_ct: int) -> None:
+        """Writes a synthetic catalog page holding course_ct course records.
+        """
+        page = []
+        for i in range(course_ct):
+            record = dict(records[i % len(records)])
+            number, subject = str(100 + i % 400), SUBJECTS[i // 400 % len(SUBJECTS)]
+            record['SubjectCode'], record['CourseNumber'] = subject, number
+            # Offerings repeat the subject and number, which are what get stored
+            sessions = record['Offerings']['CourseOffering']
+            sessions = [sessions] if isinstance(sessions, dict) else sessions
+            record['Offerings'] = {'CourseOffering': [
+                dict(session, SubjectCode=subject, CourseNumber=number) for session in sessions]}
+            page.append(record)
+
+        f.write('<html><head><title>Course List</title></head><body><table>\n')
+        for record in page:
+            f.write(f'<tr><td><a href="#">{record["SubjectCode"]} {record["CourseNumber"]}</a>'
+                    f'</td><td>{record["Title"]}</td></tr>\n')
+        f.write('</table>\n<!--')
+        json.dump(page, f, separators=(',', ':'))
+        f.write('-->\n</body></html>\n')
+
+    @staticmethod
+    def _measure(extract, path: Path, rounds: int) -> dict:
+        """Times an extraction path, then measures its peak traced memory.
+
+        Memory is measured in a separate run, since tracing slows allocation.
+
+        Returns:
+            dict of fastest round in ms, peak MB allocated, and postbac courses extracted
+        """
+        times = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            courses = extract(path)
+            times.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        try:
+            extract(path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {'ms': round(min(times), 1), 'peak_mb': round(peak / 2 ** 20, 2),
+                'parsed': len(courses)}
@@ -0,0 +1,183 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+# Gunicorn apps and worker classes compared; the ASGI app serves async views
+SERVERS = {
+    'wsgi': ['castor.wsgi'],
+    'asgi': ['castor.asgi:application', '-k', 'uvicorn.workers.UvicornWorker'],
+}
+# Seconds to wait for a server to start accepting requests
+STARTUP_TIMEOUT = 30
+
+
+class _LatencyProxy(threading.Thread):
+    """Relays TCP connections to the Postgres server, delaying each message sent to it.
+
+    Stands in for a DB on another host, where each query is a network round trip.
+    """
+    def __init__(self, db: dict, latency_ms: float):
+        super().__init__(daemon=True)
+        self.db = db
+        self.delay = latency_ms / 1000
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+
+    def run(self) -> None:
+        while True:
+            try:
+                client, _ = self.listener.accept()
+            except OSError:
+                return
+            upstream = self._connect()
+            threading.Thread(target=self._pump, args=(client, upstream, self.delay),
+                             daemon=True).start()
+            threading.Thread(target=self._pump, args=(upstream, client, 0), daemon=True).start()
+
+    def close(self) -> None:
+        self.listener.close()
+
+    def _connect(self) -> socket.socket:
+        host, port = self.db['HOST'] or '/tmp', self.db['PORT'] or 5432
+        if host.startswith('/'):
+            upstream = socket.socket(socket.AF_UNIX)
+            upstream.connect(f'{host}/.s.PGSQL.{port}')
+            return upstream
+        return socket.create_connection((host, int(port)))
+
+    @staticmethod
+    def _pump(src: socket.socket, dst: socket.socket, delay: float) -> None:
+        try:
+            while data := src.recv(65536):
+                if delay:
+                    time.sleep(delay)
+                dst.sendall(data)
+        except OSError:
+            pass
+        finally:
+            src.close()
+            dst.close()
+
+
+class Command(BaseCommand):
+    """Compares sync (WSGI) and async (ASGI) serving under high concurrency.
+
+    Run via 'python manage.py bench_serving' after 'manage.py seed_load'.
+    Starts gunicorn with --workers sync workers (castor.wsgi), runs
+    'manage.py loadtest' against it over HTTP, then does the same with as
+    many uvicorn workers (castor.asgi, whose schedule views are async), and
+    reports each server's throughput and per-endpoint latencies.
+
+    With --db-latency, servers reach Postgres through a local proxy that
+    delays every message sent to it, as a DB on another host would.
+    """
+    help = "Benchmark sync vs async serving throughput with the same worker count"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2,
+                            help="Gunicorn workers for each server")
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help="Number of simultaneous simulated users")
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Requests per simulated user")
+        parser.add_argument('--duration', type=float, default=60,
+                            help="Maximum seconds to run each load test for")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Random seed, so both servers get the same request mix")
+        parser.add_argument('--db-latency', type=float, default=0,
+                            help="Delay added to each message sent to the DB, in ms (Postgres only)")
+        parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=list(SERVERS),
+                            help="Servers to run")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+
+    def handle(self, *args, **options) -> None:
+        db = settings.DATABASES['default']
+        proxy = None
+        if options['db_latency']:
+            if db['ENGINE'] != 'django.db.backends.postgresql':
+                raise CommandError("--db-latency needs a Postgres database")
+            proxy = _LatencyProxy(db, options['db_latency'])
+            proxy.start()
+
+        results = {}
+        try:
+            for name in options['servers']:
+                results[name] = self._run(name, options, proxy)
+        finally:
+            if proxy:
+                proxy.close()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for name, report in results.items():
+            self.stdout.write(f"{name}: {report['throughput_rps']:.1f} req/s over "
+                              f"{report['requests']} requests ({options['workers']} workers, "
+                              f"{options['concurrency']} users, "
+                              f"+{options['db_latency']:g} ms DB latency)")
+            for endpoint, stats in report['endpoints'].items():
+                self.stdout.write(f"    {endpoint:<10}p50 {stats['p50_ms']:8.1f} ms"
+                                  f"   p95 {stats['p95_ms']:8.1f} ms   p99 {stats['p99_ms']:8.1f} ms"
+                                  f"   errors {stats['errors']}")
+
+    def _run(self, name: str, options: dict, proxy: _LatencyProxy | None) -> dict:
+        """Starts one server, load tests it, and stops it.
+
+        Returns:
+            loadtest's JSON report
+        """
+        port = self._free_port()
+        url = f'http://127.0.0.1:{port}'
+        env = dict(os.environ, ASYNC_VIEWS=str(name == 'asgi'))
+        if proxy:
+            db = settings.DATABASES['default']
+            env['DATABASE_URL'] = (f"postgres://{db['USER']}:{db['PASSWORD']}"
+                                   f"@127.0.0.1:{proxy.port}/{db['NAME']}")
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *SERVERS[name], '--workers', str(options['workers']),
+             '--bind', f'127.0.0.1:{port}'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        fd, output = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+        try:
+            self._wait_for(server, port)
+            self.stderr.write(f"Load testing {name} server at {url}")
+            call_command('loadtest', url=url, concurrency=options['concurrency'],
+                         requests=options['requests'], duration=options['duration'],
+                         seed=options['seed'], output=output, stderr=self.stderr)
+            with open(output) as f:
+                return json.load(f)
+        finally:
+            server.terminate()
+            server.wait()
+            os.unlink(output)
+
+    @staticmethod
+    def _free_port() -> int:
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            return sock.getsockname()[1]
+
+    @staticmethod
+    def _wait_for(server: subprocess.Popen, port: int) -> None:
+        """Waits until the server accepts connections.
+        """
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Server exited with status " + str(server.returncode))
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError("Server did not start within " + str(STARTUP_TIMEOUT) + " seconds")
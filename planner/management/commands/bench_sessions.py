@@ -0,0 +1,131 @@
+import json
+import statistics
+import time
+from importlib import import_module
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from planner.models import User
+from planner.utils import ScheduleUtils
+
+# Session engines compared (see SESSION_STORAGE in castor/settings.py)
+ENGINES = ('db', 'cached_db', 'signed_cookies')
+# Tables session reads and writes can touch
+SESSION_TABLES = ('django_session', settings.CACHES['shared']['LOCATION'])
+
+
+class _SessionQueryCounter:
+    """DB execute wrapper counting all queries, and those on session/cache tables."""
+    def __init__(self):
+        self.count = 0
+        self.session_count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if any(table in sql for table in SESSION_TABLES):
+            self.session_count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    """Measures what each session engine costs the schedule views.
+
+    Run via 'python manage.py bench_sessions'. Creates a throwaway user and
+    schedule, then for each session engine logs in with a test client and
+    requests the schedule page (GET) and saves it (an empty PATCH) --requests
+    times each, reporting median latency, queries per request, and how many
+    of those touched the session or cache tables. The user is deleted
+    afterwards.
+
+    Back-to-back requests in one process find the session in the tiered
+    cache's local tier (see castor/cache.py), which is all that cached_db
+    saves over db. The '_cold' views drop that local copy before each
+    request, as a request reaching another worker (or arriving after
+    CACHE_LOCAL_TIMEOUT) finds it, so the session is read from the shared
+    cache table instead.
+    """
+    help = "Compare session engines' queries and latency on the schedule views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per view and engine")
+        parser.add_argument('--json', action='store_true',
+                            help="Print results as JSON")
+
+    def handle(self, *args, **options) -> None:
+        user = User.objects.create(username='bench_sessions_' + str(time.time_ns()))
+        schedule = ScheduleUtils.new_schedule(user)
+        schedule.save()
+        path = '/schedules/' + str(schedule.id)
+        patch = json.dumps({'courses': {}, 'dates': {'start': {}, 'end': {}}})
+        views = {
+            'display': lambda client: client.get(path),
+            'update_schedule':
+                lambda client: client.patch(path, patch, content_type='application/json'),
+        }
+
+        results = {}
+        try:
+            for engine in ENGINES:
+                with override_settings(SESSION_ENGINE='django.contrib.sessions.backends.' + engine):
+                    client = Client()
+                    client.force_login(user)
+                    evict = self._evict_session(client)
+                    for view, request in views.items():
+                        results.setdefault(view, {})[engine] = \
+                            self._measure(client, request, options['requests'])
+                        results.setdefault(view + '_cold', {})[engine] = \
+                            self._measure(client, request, options['requests'], evict)
+                    client.logout()
+        finally:
+            user.delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for view, by_engine in results.items():
+            for engine, stats in by_engine.items():
+                self.stdout.write(f"{view:<21}{engine:<16}{stats['median_ms']:8.2f} ms"
+                                  f"{stats['queries']:8.2f} queries"
+                                  f"{stats['session_queries']:8.2f} on session/cache tables")
+
+    @staticmethod
+    def _evict_session(client: Client):
+        """Builds a callable dropping this process's local copy of the
+        client's session, or one doing nothing if the engine caches none.
+        """
+        store = import_module(settings.SESSION_ENGINE).SessionStore(
+            client.cookies[settings.SESSION_COOKIE_NAME].value)
+        session_cache = caches[settings.SESSION_CACHE_ALIAS]
+        if not hasattr(store, 'cache_key') or not hasattr(session_cache, 'discard_local'):
+            return lambda: None
+        return lambda: session_cache.discard_local([store.cache_key])
+
+    @staticmethod
+    def _measure(client: Client, request, count: int, before=None) -> dict:
+        """Sends a request count times (after one warm-up), timing each.
+
+        Args:
+            before: callable run (untimed) ahead of each request, if any
+
+        Returns:
+            dict of median ms, and queries (all, and on SESSION_TABLES) per request
+        """
+        request(client)
+        counter = _SessionQueryCounter()
+        times = []
+        with connection.execute_wrapper(counter):
+            for _ in range(count):
+                if before:
+                    before()
+                start = time.perf_counter()
+                response = request(client)
+                times.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError("Request failed with status " + str(response.status_code))
+
+        return {'median_ms': round(statistics.median(times), 3),
+                'queries': round(counter.count / count, 2),
+                'session_queries': round(counter.session_count / count, 2)}
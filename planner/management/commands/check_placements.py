@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from planner.models import Schedule
+from planner.utils import ScheduleUtils
+
+# Schedules compared per batch
+CHECK_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Verifies schedules' placements documents, and the aggregates kept
+    with them, against their Course_Schedule rows.
+
+    Run via 'python manage.py check_placements'. Schedules are checked in
+    batches of --batch-size (a few queries per batch): their documents are
+    loaded, rebuilt from their rows (see ScheduleUtils.load_placement_documents())
+    and compared. With --fix, mismatched documents are rewritten with one
+    bulk update per batch, in that batch's transaction; without it, the
+    command fails if any mismatch is found.
+
+    Run with --fix after changing which courses are required (or their
+    credits) outside the admin, to recompute every schedule's progress.
+    """
+    help = "Verify (and with --fix, recompute) schedules' placements and progress"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help="Rewrite mismatched documents from their rows")
+        parser.add_argument('--batch-size', type=int, default=CHECK_BATCH_SIZE,
+                            help="Schedules checked per batch")
+
+    def handle(self, *args, **options) -> None:
+        checked = 0
+        mismatched = []
+        last_id = 0
+        while True:
+            with transaction.atomic():
+                # Lock each batch, so saves in progress cannot race the comparison
+                stored = {sched_id: ScheduleUtils.PlacementDocument(*document)
+                          for sched_id, *document in
+                          Schedule.objects.select_for_update().filter(id__gt=last_id)
+                          .order_by('id').values_list(
+                              'id', *ScheduleUtils.PlacementDocument._fields)
+                          [:options['batch_size']]}
+                if not stored:
+                    break
+                documents = ScheduleUtils.load_placement_documents(list(stored))
+                stale = {sched_id: document for sched_id, document in documents.items()
+                         if stored[sched_id] != document}
+                if stale and options['fix']:
+                    ScheduleUtils.save_placement_documents(stale)
+
+            checked += len(stored)
+            mismatched += stale
+            last_id = max(stored)
+
+        self.stdout.write("Checked " + str(checked) + " schedules, " +
+                          str(len(mismatched)) + " mismatched" +
+                          (" (rebuilt)" if options['fix'] and mismatched else ""))
+        if mismatched and not options['fix']:
+            shown = ', '.join(str(sched_id) for sched_id in mismatched[:20])
+            raise CommandError("Placements documents out of date for schedules " + shown +
+                               (" ..." if len(mismatched) > 20 else "") +
+                               "; run with --fix to rebuild them")
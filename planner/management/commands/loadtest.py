@@ -0,0 +1,296 @@
+import json
+import random
+import secrets
+import statistics
+import subprocess
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from importlib import import_module
+from planner.models import Course_Schedule, Schedule, User
+
+# Share of requests sent to each endpoint (each 'create' is followed by a 'delete')
+ENDPOINT_WEIGHTS = {'index': 25, 'display': 40, 'patch': 20, 'title': 10, 'create': 5}
+# Seconds before a raw HTTP request is abandoned
+HTTP_TIMEOUT = 30
+# Default share of an endpoint's requests that may fail before the run does
+MAX_ERROR_RATE = 0.01
+
+
+def _allowed_host() -> str:
+    """Picks a host name settings.ALLOWED_HOSTS accepts, for the test client.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host == '*':
+            break
+        if host:
+            # '.example.com' also matches 'example.com'
+            return host.lstrip('.')
+    return 'testserver'
+
+
+class _InProcessClient:
+    """Sends requests through Django's test client, in this process."""
+    def __init__(self, base_url: str, user: User):
+        # The test client's default host ('testserver') is rejected unless allowed
+        self.client = Client(HTTP_HOST=_allowed_host())
+        self.client.force_login(user)
+
+    def request(self, method: str, path: str, data=None, content_type=None) -> tuple[int, bytes]:
+        kwargs = {'content_type': content_type} if content_type else {}
+        response = getattr(self.client, method.lower())(path, data, **kwargs)
+        return response.status_code, response.content
+
+    def close(self) -> None:
+        # Each worker thread opened its own DB connection
+        connections.close_all()
+
+
+class _HTTPClient:
+    """Sends requests over HTTP to a running server (e.g. gunicorn)."""
+    def __init__(self, base_url: str, user: User):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+        # Log in by creating the session directly (login forms are rate limited)
+        store = import_module(settings.SESSION_ENGINE).SessionStore()
+        store[SESSION_KEY] = str(user.pk)
+        store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        store.create()
+        self.store = store
+        # Don't hold this thread's DB connection while the server is under load
+        connections.close_all()
+        self.session.cookies.set(settings.SESSION_COOKIE_NAME, store.session_key)
+
+        # Any CSRF secret works, as long as cookie and header agree
+        csrf_token = secrets.token_hex(16)
+        self.session.cookies.set(settings.CSRF_COOKIE_NAME, csrf_token)
+        self.session.headers['X-CSRFToken'] = csrf_token
+        self.session.headers['Referer'] = self.base_url + '/'
+
+    def request(self, method: str, path: str, data=None, content_type=None) -> tuple[int, bytes]:
+        if content_type == 'application/json':
+            body = {'data': json.dumps(data), 'headers': {'Content-Type': content_type}}
+        else:
+            body = {'data': data}
+        response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                        timeout=HTTP_TIMEOUT, **body)
+        return response.status_code, response.content
+
+    def close(self) -> None:
+        self.session.close()
+        self.store.delete()
+        connections.close_all()
+
+
+class _Worker(threading.Thread):
+    """Simulates one logged-in user, sending a random mix of requests."""
+    def __init__(self, user: User, schedules: dict, options: dict, seed: float):
+        super().__init__(daemon=True)
+        self.user = user
+        self.schedules = schedules
+        self.options = options
+        self.rnd = random.Random(seed)
+        self.samples = []
+        self.error = None
+
+    def run(self) -> None:
+        try:
+            client_cls = _HTTPClient if self.options['url'] else _InProcessClient
+            client = client_cls(self.options['url'], self.user)
+            try:
+                self._run(client)
+            finally:
+                client.close()
+        except Exception as e:
+            self.error = e
+
+    def _run(self, client) -> None:
+        endpoints = list(ENDPOINT_WEIGHTS)
+        weights = list(ENDPOINT_WEIGHTS.values())
+        deadline = time.perf_counter() + self.options['duration']
+        for _ in range(self.options['requests']):
+            if time.perf_counter() >= deadline:
+                break
+            endpoint = self.rnd.choices(endpoints, weights)[0]
+            status, content = self._send(client, endpoint, *self._build(endpoint))
+
+            # Delete created schedules straight away, so users stay under the limit
+            if endpoint == 'create' and status == 200:
+                sched_id = json.loads(content)['schedule']
+                self._send(client, 'delete', 'DELETE', '/schedules/' + str(sched_id),
+                           None, None, (204,))
+
+    def _send(self, client, endpoint: str, method: str, path: str, data, content_type: str,
+              expected: tuple) -> tuple[int, bytes]:
+        """Sends one request, recording its latency and whether it succeeded.
+        """
+        start = time.perf_counter()
+        status, content = client.request(method, path, data, content_type)
+        self.samples.append((endpoint, time.perf_counter() - start, status in expected))
+        return status, content
+
+    def _build(self, endpoint: str) -> tuple:
+        """Builds a request for an endpoint.
+
+        Returns:
+            (method, path, data, content type, expected statuses)
+        """
+        sched_id = self.rnd.choice(list(self.schedules))
+        path = '/schedules/' + str(sched_id)
+        if endpoint == 'index':
+            return 'GET', '/', None, None, (200, 302)
+        if endpoint == 'display':
+            return 'GET', path, None, None, (200,)
+        if endpoint == 'title':
+            return 'POST', path, {'title': 'Load test ' + str(self.rnd.randrange(1000))}, \
+                None, (200, 302)
+        if endpoint == 'patch':
+            # Re-save some placements where they are (always valid), as the page's Save does
+            placements = self.schedules[sched_id]
+            saved = self.rnd.sample(list(placements), min(len(placements), 5))
+            body = {'courses': {str(crs_num): {'year': placements[crs_num][0],
+                                               'qtr': placements[crs_num][1]}
+                                for crs_num in saved},
+                    'dates': {'start': {}, 'end': {}}}
+            return 'PATCH', path, body, 'application/json', (200,)
+        return 'POST', '/schedules', None, None, (200, 403)
+
+
+class Command(BaseCommand):
+    """Drives concurrent simulated users against the app, and reports latencies.
+
+    Run via 'python manage.py loadtest' after 'manage.py seed_load'. Each of
+    --concurrency threads logs in as a different seeded user and sends a
+    weighted mix of requests (see ENDPOINT_WEIGHTS): the index page,
+    schedule pages, PATCH saves, title updates and schedule creation.
+    Requests go through Django's test client in this process, or with --url
+    over HTTP to a running server (e.g. 'gunicorn castor.wsgi').
+
+    Prints (or writes to --output) a JSON report of throughput and
+    p50/p95/p99 latencies per endpoint, tagged with the current git commit
+    so reports can be compared between commits. Fails if more than
+    --max-error-rate of any endpoint's requests got an unexpected status.
+    """
+    help = "Load test the app with concurrent simulated users"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=None,
+                            help="Base URL of a running server (default: in-process test client)")
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help="Number of simultaneous simulated users")
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per simulated user")
+        parser.add_argument('--duration', type=float, default=60,
+                            help="Maximum seconds to run for")
+        parser.add_argument('--prefix', default='load_',
+                            help="Username prefix of seeded users (see seed_load)")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Random seed, for a reproducible request mix")
+        parser.add_argument('--output', default=None,
+                            help="File to write the JSON report to (default: stdout)")
+        parser.add_argument('--max-error-rate', type=float, default=MAX_ERROR_RATE,
+                            help="Share of an endpoint's requests allowed to fail")
+
+    def handle(self, *args, **options) -> None:
+        rnd = random.Random(options['seed'])
+        users = list(User.objects.filter(username__startswith=options['prefix'],
+                                         schedule__isnull=False).distinct()
+                     .order_by('id')[:options['concurrency']])
+        if len(users) < options['concurrency']:
+            raise CommandError("Need " + str(options['concurrency']) + " seeded users with "
+                               "schedules; run 'manage.py seed_load' first")
+
+        # Load each user's schedules and placements up front, so PATCHes stay valid
+        placements = {}
+        for sched_id, crs_num, year, qtr in Course_Schedule.objects.filter(
+                schedule__user__in=users).values_list('schedule_id', 'course__course_number',
+                                                      'year', 'qtr'):
+            placements.setdefault(sched_id, {})[crs_num] = (year, qtr)
+        schedules = {user.id: {} for user in users}
+        for sched_id, user_id in Schedule.objects.filter(user__in=users).values_list('id', 'user_id'):
+            schedules[user_id][sched_id] = placements.get(sched_id, {})
+
+        workers = [_Worker(user, schedules[user.id], options, rnd.random()) for user in users]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        errors = [worker.error for worker in workers if worker.error]
+        if errors:
+            raise CommandError("Load test failed: " + repr(errors[0]))
+        self._cleanup(users, schedules)
+
+        report = self._report(workers, elapsed, options)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+            self.stderr.write("Report written to " + options['output'])
+        else:
+            self.stdout.write(output)
+
+        # Latencies of failed requests (e.g. 400s for a disallowed host) mean nothing
+        failing = [name for name, endpoint in report['endpoints'].items()
+                   if endpoint['errors'] > endpoint['requests'] * options['max_error_rate']]
+        if failing:
+            raise CommandError("Too many unexpected responses from: " + ', '.join(
+                name + " (" + str(report['endpoints'][name]['errors']) + "/"
+                + str(report['endpoints'][name]['requests']) + ")" for name in failing))
+
+    @staticmethod
+    def _cleanup(users: list[User], schedules: dict) -> None:
+        """Deletes schedules created during the run, restoring seeded users' limits.
+        """
+        seeded = [sched_id for user_schedules in schedules.values() for sched_id in user_schedules]
+        Schedule.objects.filter(user__in=users).exclude(id__in=seeded).delete()
+
+    @staticmethod
+    def _report(workers: list[_Worker], elapsed: float, options: dict) -> dict:
+        """Summarizes all workers' samples per endpoint.
+        """
+        by_endpoint = {}
+        for worker in workers:
+            for name, seconds, ok in worker.samples:
+                by_endpoint.setdefault(name, []).append((seconds, ok))
+
+        endpoints = {}
+        for name, samples in sorted(by_endpoint.items()):
+            times = sorted(seconds * 1000 for seconds, _ in samples)
+            cuts = statistics.quantiles(times, n=100, method='inclusive') \
+                if len(times) > 1 else times * 99
+            endpoints[name] = {
+                'requests': len(samples),
+                'errors': sum(1 for _, ok in samples if not ok),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(cuts[49], 2),
+                'p95_ms': round(cuts[94], 2),
+                'p99_ms': round(cuts[98], 2),
+                'max_ms': round(times[-1], 2),
+            }
+
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                    text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+
+        total = sum(endpoint['requests'] for endpoint in endpoints.values())
+        return {
+            'commit': commit,
+            'target': options['url'] or 'in-process',
+            'concurrency': options['concurrency'],
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2),
+            'endpoints': endpoints,
+        }
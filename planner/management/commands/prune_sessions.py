@@ -0,0 +1,54 @@
+import time
+from importlib import import_module
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+# Expired sessions deleted per transaction
+PRUNE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Deletes expired sessions from the DB in batches.
+
+    Run via 'python manage.py prune_sessions' (e.g. daily), in place of
+    Django's 'clearsessions', which deletes every expired row in one
+    statement. Each batch of --batch-size rows is deleted in its own short
+    transaction, with an optional --pause between batches, so logins and
+    session writes are not held up behind a large delete. Cached copies of
+    pruned sessions (with SESSION_STORAGE=cached_db) expire from the cache
+    at the same time as their rows. With signed cookie sessions there is
+    nothing stored server-side to prune.
+    """
+    help = "Delete expired sessions from the DB in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE,
+                            help="Sessions deleted per transaction")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to wait between batches")
+
+    def handle(self, *args, **options) -> None:
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        if not issubclass(store, DBStore):
+            self.stdout.write("Sessions are not stored in the DB; nothing to prune")
+            return
+
+        # Sessions expiring while the command runs are left for the next run
+        now = timezone.now()
+        session_model = store.get_model_class()
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                keys = list(session_model.objects.filter(expire_date__lt=now)
+                            .values_list('session_key', flat=True)[:options['batch_size']])
+                if keys:
+                    session_model.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if len(keys) < options['batch_size']:
+                break
+            time.sleep(options['pause'])
+
+        self.stdout.write("Deleted " + str(deleted) + " expired sessions")
@@ -1,21 +1,254 @@
 import json
+import hashlib
+import os
 import requests
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from string import capwords
-from attrs import define, field, asdict
-from bs4 import BeautifulSoup, Comment
-from django.core.management.base import BaseCommand
-from planner.models import Course, Prereq
+from typing import Iterable, Iterator
+from attrs import define, field
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Model
+from planner.models import CatalogRevision, Course, Course_Schedule, Offering, Prereq
+from planner.utils import CatalogUtils, ScheduleUtils
 
 logger = logging.getLogger(__name__)
 
 QTRS = {'W': 0, 'Sp': 1, 'Su': 2, 'F': 3}
-# URL for eCampus catalog scraping
-URL = 'https://ecampus.oregonstate.edu/soc/ecatalog/ecourselist.htm?termcode=all&subject=CS'
+# URL for eCampus catalog scraping ({subject} is filled in per subject)
+URL = 'https://ecampus.oregonstate.edu/soc/ecatalog/ecourselist.htm?termcode=all&subject={subject}'
+# Subjects scraped by default (CS courses have MTH prereqs)
+SUBJECTS = ['CS', 'MTH']
+# Catalog pages fetched at once
+CONCURRENCY = 4
 # String to locate JSON within catalog HTML
-START = '[{"SubjectCode":"CS","CourseNumber":'
-# Courses that are not offered in postbac track (ignored when scraping)
+START = '[{"SubjectCode":'
+# End of the HTML comment holding the JSON
+END = '-->'
+# Bytes read/received at a time when streaming catalog pages
+CHUNK_SIZE = 64 * 1024
+# CS courses that are not offered in postbac track (ignored when scraping)
 FOUR_YEAR_ONLY = [101, 151, 165, 175, 201, 295, 461, 462, 463]
+# Where raw catalog pages (and their validators/hashes) are kept between runs
+CACHE_DIR = Path(settings.BASE_DIR) / '.scrape_cache'
+# Seconds to wait for the catalog server (connect and each read)
+TIMEOUT = 30
+# Attempts after the first, with exponential backoff between them
+RETRIES = 3
+BACKOFF_SECONDS = 2
+# Responses worth retrying (rate limiting and transient server errors)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Rows deleted per statement when applying a diff (keeps IN lists within DB limits)
+DELETE_BATCH_SIZE = 500
+
+
+class PageCache:
+    """On-disk copy of the last catalog page fetched from a URL.
+
+    Stores the raw page body alongside a JSON metadata file holding its
+    HTTP validators (ETag/Last-Modified, for conditional requests), its
+    encoding, a hash of the body, a hash of the catalog JSON extracted from
+    it, and the catalog hash most recently compared against the DB.
+    """
+    def __init__(self, cache_dir: Path, url: str):
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        self.body_path = Path(cache_dir) / (key + '.html')
+        self.meta_path = Path(cache_dir) / (key + '.json')
+        try:
+            with open(self.meta_path) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            self.meta = {}
+
+    def validators(self) -> dict:
+        """Returns conditional request headers for the cached page.
+        """
+        headers = {}
+        if not self.body_path.exists():
+            return headers
+        if self.meta.get('etag'):
+            headers['If-None-Match'] = self.meta['etag']
+        if self.meta.get('last_modified'):
+            headers['If-Modified-Since'] = self.meta['last_modified']
+        return headers
+
+    def store(self, chunks: Iterable[bytes]) -> None:
+        """Replaces the cached body with a streamed one, without holding it in memory.
+        """
+        self.body_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so an interrupted download leaves the old copy
+        partial = self.body_path.with_suffix('.part')
+        with open(partial, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(partial, self.body_path)
+
+    def save(self, **meta) -> None:
+        """Updates the cached metadata.
+        """
+        self.meta_path.parent.mkdir(parents=True, exist_ok=True)
+        self.meta.update(meta)
+        with open(self.meta_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+
+
+@define
+class CatalogPage:
+    """A catalog page saved on disk, with its cache entry.
+
+    Attributes:
+        cache: the page's PageCache entry (hashes from earlier runs)
+        path: file holding the page
+        encoding: text encoding of the file
+        validators: new 'etag'/'last_modified'/'encoding' metadata to cache
+    """
+    cache: PageCache
+    path: Path
+    encoding: str = 'utf-8'
+    validators: dict = field(factory=dict)
+
+    def chunks(self) -> Iterator[str]:
+        """Streams the page's text.
+        """
+        return _read_chunks(self.path, self.encoding)
+
+
+def _read_chunks(path: Path, encoding: str = 'utf-8') -> Iterator[str]:
+    """Yields a file's text CHUNK_SIZE characters at a time.
+    """
+    with open(path, encoding=encoding, errors='replace') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def _hash_chunks(chunks: Iterable[str]) -> str | None:
+    """Hashes streamed text, returning None if there was none.
+    """
+    digest = hashlib.sha256()
+    empty = True
+    for chunk in chunks:
+        digest.update(chunk.encode())
+        empty = empty and not chunk
+    return None if empty else digest.hexdigest()
+
+
+def iter_catalog_json(chunks: Iterable[str]) -> Iterator[str]:
+    """Extracts the course JSON embedded in a catalog page, as the page streams in.
+
+    eCampus pages carry their course data as JSON inside an HTML comment.
+    Rather than parsing the whole page, this scans for START and yields
+    the text from there up to the end of its comment, holding at most a
+    chunk (plus a few characters, in case a marker spans two chunks) at once.
+
+    Args:
+        chunks: The page's text, in pieces of any size
+
+    Returns:
+        An iterator over consecutive pieces of the JSON text; empty if the
+        page holds no course data
+    """
+    chunks = iter(chunks)
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        pos = buffer.find(START)
+        if pos != -1:
+            buffer = buffer[pos:]
+            break
+        buffer = buffer[-(len(START) - 1):]
+    else:
+        return
+
+    while True:
+        pos = buffer.find(END)
+        if pos != -1:
+            yield buffer[:pos]
+            return
+        # Hold back enough characters to spot an END split across chunks
+        keep = len(END) - 1
+        if len(buffer) > keep:
+            yield buffer[:-keep]
+            buffer = buffer[-keep:]
+        chunk = next(chunks, None)
+        if chunk is None:
+            yield buffer
+            return
+        buffer += chunk
+
+
+def iter_course_records(json_chunks: Iterable[str]) -> Iterator[dict]:
+    """Decodes course records one at a time from a streamed JSON array.
+
+    Each record is decoded with json.JSONDecoder.raw_decode() as soon as
+    enough text has arrived, so only one record (and the current chunk)
+    is held in memory rather than the whole array.
+
+    Args:
+        json_chunks: The JSON array's text, in pieces (see iter_catalog_json())
+
+    Returns:
+        An iterator over the array's course records, as dicts
+
+    Raises:
+        ValueError: if the text is not a JSON array, or ends before the array does
+    """
+    decoder = json.JSONDecoder()
+    chunks = iter(json_chunks)
+    buffer = ''
+    pos = 0
+    opened = False
+    while True:
+        # Skip whitespace, the opening bracket and separating commas
+        while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','
+                                     or (not opened and buffer[pos] == '[')):
+            opened = opened or buffer[pos] == '['
+            pos += 1
+        if pos < len(buffer):
+            if not opened:
+                raise ValueError("Course data is not a JSON array")
+            if buffer[pos] == ']':
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Most likely the record continues in the next chunk
+                pass
+            else:
+                yield record
+                continue
+
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError("Course data ended unexpectedly")
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def parse_term(term: str) -> tuple[int, int]:
+    """Converts a term description (e.g. 'Sp24' or 'F23') to (year, qtr).
+    """
+    return 2000 + int(term[-2:]), QTRS[term[:-2]]
+
+
+def offerings_digest(scraped_courses: Iterable['CourseInfo']) -> str:
+    """Hashes the offerings in a scrape, independently of course order.
+
+    Identifies CatalogRevisions, so scrapes listing the same offerings share one.
+    """
+    offerings = sorted([*course.key, *term] for course in scraped_courses
+                       for term in course.terms)
+    return hashlib.sha256(json.dumps(offerings, separators=(',', ':')).encode()).hexdigest()
+
+
+def _delete_by_id(model: type[Model], ids: list[int]) -> None:
+    """Deletes a model's rows by id, DELETE_BATCH_SIZE at a time.
+    """
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        model.objects.filter(id__in=ids[start:start + DELETE_BATCH_SIZE]).delete()
 
 
 @define
@@ -73,18 +306,29 @@ class CourseInfo:
         except ValueError:
             return int(credits[0])
 
+    subject: str = field()
     course_number: int = field(converter=int)
     title: str = field(converter=_format_title)
     credits: int = field(converter=_format_credits)
     qtrs: list[int] = field(converter=lambda x: sorted(list(set(x))))
-    prereqs: list[int] = field(converter=lambda x: sorted(list(set(x))))
+    # (subject, course number) of each prereq
+    prereqs: list[tuple[str, int]] = field(converter=lambda x: sorted(list(set(x))))
+    # (year, qtr) of each term the course is listed in
+    terms: list[tuple[int, int]] = field(factory=list, converter=lambda x: sorted(list(set(x))))
+
+    @property
+    def key(self) -> tuple[str, int]:
+        """The (subject, course number) pair identifying this course.
+        """
+        return self.subject, self.course_number
 
     @classmethod
-    def is_valid_postbac_course(cls, course_number: int) -> bool:
+    def is_valid_postbac_course(cls, course_number: int, subject: str = 'CS') -> bool:
         """Checks if course is valid for postbac track.
 
         Args:
             course_number: The course number of the course in question
+            subject: The course's subject code
 
         Returns:
             Boolean indicating valid/invalid course
@@ -98,7 +342,7 @@ class CourseInfo:
             return False
 
         # Ignore four-year degree courses
-        if course_number in FOUR_YEAR_ONLY:
+        if subject == 'CS' and course_number in FOUR_YEAR_ONLY:
             return False
         # Ignore graduate-level courses
         elif course_number > 499:
@@ -107,14 +351,15 @@ class CourseInfo:
             return True
 
     @classmethod
-    def extract_prereqs(cls, offerings: list[dict]) -> list[int]:
+    def extract_prereqs(cls, offerings: list[dict]) -> list[tuple[str, int]]:
         """Extracts valid prereqs from scraped prereq data.
 
         Attrs:
             offerings: A list of dicts, each containing course data
 
         Returns:
-            A list of valid prereq course numbers for that course
+            A list of (subject, course number) of valid prereqs for that
+            course, in any subject
 
         """
         prereqs = []
@@ -128,10 +373,12 @@ class CourseInfo:
 
                 for prq in prq_list:
                     # Check that prereq is also a valid postbac course
-                    if ('PrereqSubjectCode' in prq and prq['PrereqSubjectCode'] == 'CS' and
-                            cls.is_valid_postbac_course(prq['PrereqCourseNumber'])):
+                    if ('PrereqSubjectCode' in prq and
+                            cls.is_valid_postbac_course(prq['PrereqCourseNumber'],
+                                                        prq['PrereqSubjectCode'])):
                         # if so, append to output list
-                        prereqs.append(int(prq['PrereqCourseNumber']))
+                        prereqs.append((prq['PrereqSubjectCode'],
+                                        int(prq['PrereqCourseNumber'])))
 
         return prereqs
 
@@ -141,12 +388,14 @@ class CourseInfo:
         """Initializes a CourseInfo instance from a scraped course data record.
         """
         return CourseInfo(
+            subject=offerings[0]['SubjectCode'],
             course_number=offerings[0]['CourseNumber'],
             qtrs=[QTRS[offering['TermShortDescription'][:-2]]
                   for offering in offerings],
             title=offerings[0]['Title'],
             credits=offerings[0]['Credits'],
-            prereqs=CourseInfo.extract_prereqs(offerings)
+            prereqs=CourseInfo.extract_prereqs(offerings),
+            terms=[parse_term(offering['TermShortDescription']) for offering in offerings]
         )
 
 
@@ -155,28 +404,125 @@ class Command(BaseCommand):
 
     handle() is called via 'python manage.py scrape' from the command line, 
     and is the only public method. 
+
+    Each subject's catalog page (see SUBJECTS) is fetched concurrently,
+    and cached on disk (see PageCache) and re-requested conditionally, so
+    an unchanged catalog costs one 304 response per subject, and is
+    neither parsed nor compared against the DB again.
+
+    By default, differences from the DB are logged for review. With --apply,
+    the DB is brought in line with the catalog in one transaction, and a
+    JSON report of the changes is printed (--dry-run prints the same report
+    without changing anything). Only courses in the scraped subjects are
+    compared, added or removed. Applying also records the terms each course
+    is listed in (see Offering), under a CatalogRevision shared by every
+    scrape that lists the same offerings.
     """
+    help = "Scrape the eCampus catalog and report (or apply) differences from the DB"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=URL,
+                            help="Catalog page URL, with {subject} in place of the subject code")
+        parser.add_argument('--subjects', nargs='+', default=SUBJECTS,
+                            help="Subject codes to scrape")
+        parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                            help="Catalog pages to fetch at once")
+        parser.add_argument('--from-file', nargs='+', default=None,
+                            help="Replay saved catalog pages instead of fetching them")
+        parser.add_argument('--cache-dir', default=str(CACHE_DIR),
+                            help="Directory for cached catalog pages")
+        parser.add_argument('--timeout', type=float, default=TIMEOUT,
+                            help="Seconds to wait for the catalog server")
+        parser.add_argument('--retries', type=int, default=RETRIES,
+                            help="Retries after a failed request (with backoff)")
+        parser.add_argument('--force', action='store_true',
+                            help="Compare against the DB even if the catalog is unchanged")
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument('--apply', action='store_true',
+                          help="Update the DB to match the catalog, printing a JSON report")
+        mode.add_argument('--dry-run', action='store_true',
+                          help="Print the JSON report of changes --apply would make")
 
     def handle(self, *args, **options) -> None:
         """Method for running scrape, called via 'python manage.py scrape' 
             from the command line. 
-
-        'args'/'options' arguments are required per Django syntax, but are unused.        
         """
         # Begin logging output, with timestamp
         logger.info("SCRAPING ECAMPUS CATALOG")
 
-        # Scrape course data from JSON, load into memory
-        course_json = self._scrape_json()
-        scraped_data = json.loads(course_json)
-
-        # Build list of courses from each source
-        scraped_courses = self._build_scraped_courses(scraped_data)
-        db_courses = list(Course.objects.all().values())
+        # Load catalog pages, from files or (conditionally) from the catalog server
+        if options['from_file']:
+            pages = [CatalogPage(PageCache(options['cache_dir'], path), Path(path))
+                     for path in options['from_file']]
+            subjects = set()
+        else:
+            pages = self._fetch_all(options)
+            subjects = set(options['subjects'])
+
+        # Catalogs compared in log-only mode may still need applying; dry runs always run
+        done_key = 'applied_hash' if options['apply'] else 'processed_hash'
+        skip = not (options['force'] or options['dry_run'])
+
+        # Skip parsing entirely if these exact pages were already processed
+        body_hashes = [_hash_chunks(page.chunks()) for page in pages]
+        if skip and all(body_hash == page.cache.meta.get('body_hash')
+                        and page.cache.meta.get('catalog_hash') == page.cache.meta.get(done_key)
+                        for page, body_hash in zip(pages, body_hashes)):
+            for page in pages:
+                page.cache.save(**page.validators)
+            logger.info("CATALOG PAGE UNCHANGED. SKIPPING COMPARISON")
+            return
+
+        # Locate course JSON within pages, skipping comparison if it is unchanged
+        catalog_hashes = []
+        for page, body_hash in zip(pages, body_hashes):
+            catalog_hash = _hash_chunks(iter_catalog_json(page.chunks()))
+            if catalog_hash is None:
+                raise CommandError("Course data not found in catalog page " + str(page.path))
+            page.cache.save(body_hash=body_hash, catalog_hash=catalog_hash, **page.validators)
+            catalog_hashes.append(catalog_hash)
+        if skip and all(catalog_hash == page.cache.meta.get(done_key)
+                        for page, catalog_hash in zip(pages, catalog_hashes)):
+            logger.info("CATALOG DATA UNCHANGED. SKIPPING COMPARISON")
+            return
+
+        # Build list of courses from each source (in the same order)
+        scraped = {}
+        try:
+            for page in pages:
+                for course in self._iter_scraped_courses(
+                        iter_course_records(iter_catalog_json(page.chunks()))):
+                    scraped[course.key] = course
+        except ValueError as e:
+            raise CommandError("Malformed course data in catalog page: " + str(e))
+        scraped_courses = [scraped[key] for key in sorted(scraped)]
+        subjects |= {course.subject for course in scraped_courses}
+        all_courses = self._load_db_courses()
+        db_courses = [course for course in all_courses if course['subject'] in subjects]
+
+        if options['apply'] or options['dry_run']:
+            # Courses in other subjects are left alone, but can still be prereqs
+            known = {(course['subject'], course['course_number']) for course in all_courses
+                     if course['subject'] not in subjects}
+            diff = self._diff_catalog(scraped_courses, db_courses, self._load_db_prereqs(),
+                                      self._load_db_offerings(subjects), known)
+            change_ct = sum(len(entries) for section in diff.values()
+                            for name, entries in section.items() if name != 'unresolved')
+            report = {'applied': options['apply'], **diff}
+            if options['apply']:
+                report['revision'] = self._apply_diff(diff, scraped_courses).digest
+                for page, catalog_hash in zip(pages, catalog_hashes):
+                    page.cache.save(processed_hash=catalog_hash, applied_hash=catalog_hash)
+            self.stdout.write(json.dumps(report, indent=2))
+            logger.info(("CATALOG SYNC COMPLETED. " if options['apply'] else "DRY RUN COMPLETED. ") +
+                        str(change_ct) + " CHANGE(S)")
+            return
 
         # Compare contents and check for any issues 
         # (Individual issues are also printed to logs in _compare_course_lists)
         issue_ct = self._compare_course_lists(scraped_courses, db_courses)
+        for page, catalog_hash in zip(pages, catalog_hashes):
+            page.cache.save(processed_hash=catalog_hash)
 
         # Log scrape completion and # of issues found
         if issue_ct == 0:
@@ -185,32 +531,86 @@ class Command(BaseCommand):
             logger.warning("SCRAPING COMPLETED. " +
                            str(issue_ct) + " ISSUE(S) FOUND")
 
+    def _fetch_all(self, options: dict) -> list[CatalogPage]:
+        """Fetches each subject's catalog page, --concurrency pages at a time.
+
+        Returns:
+            list of CatalogPage, one per subject, in --subjects order
+        """
+        def fetch(subject: str) -> CatalogPage:
+            url = options['url'].format(subject=subject)
+            cache = PageCache(options['cache_dir'], url)
+            validators = self._fetch(url, cache, options['timeout'], options['retries'])
+            logger.info("Fetched " + subject + " catalog page")
+            return CatalogPage(cache, cache.body_path,
+                               validators.get('encoding') or cache.meta.get('encoding') or 'utf-8',
+                               validators)
+
+        # Requests spend nearly all their time waiting on the network, so threads suffice
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            return list(pool.map(fetch, options['subjects']))
+
     @staticmethod
-    def _scrape_json() -> str:
-        """Locates and scrapes course info JSON from Ecampus catalog. 
+    def _fetch(url: str, cache: PageCache, timeout: float, retries: int) -> dict:
+        """Fetches the catalog page into the cache, unless the cached copy is unchanged.
+
+        Sends the cached page's ETag/Last-Modified, so the server can answer
+        304 Not Modified. Connection errors, timeouts, and 429/5xx responses
+        are retried with exponential backoff. The page is streamed to disk,
+        never held in memory whole.
+
+        Returns:
+            dict of new 'etag'/'last_modified'/'encoding' metadata to cache
+            with the page; empty if the cached page was reused
+
+        Raises:
+            CommandError: if no response is received after all retries
         """
-        response = requests.get(URL)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        comments = soup.find_all(string=lambda text: isinstance(text, Comment))
-        for comment in comments:
-            if START in comment:
-                return comment
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                with requests.get(url, headers=cache.validators(), timeout=timeout,
+                                  stream=True) as response:
+                    if response.status_code in RETRY_STATUSES:
+                        logger.warning("Catalog request failed (attempt " + str(attempt + 1) +
+                                       "): " + str(response.status_code))
+                        continue
+
+                    if response.status_code == 304:
+                        logger.info("Catalog page not modified since last fetch")
+                        return {}
+                    response.raise_for_status()
+                    cache.store(response.iter_content(CHUNK_SIZE))
+                    return {'etag': response.headers.get('ETag'),
+                            'last_modified': response.headers.get('Last-Modified'),
+                            'encoding': response.encoding}
+            except (requests.ConnectionError, requests.Timeout) as e:
+                logger.warning("Catalog request failed (attempt " + str(attempt + 1) + "): " +
+                               str(e))
+
+        raise CommandError("Catalog request failed after " + str(retries + 1) + " attempts")
 
     @staticmethod
-    def _build_scraped_courses(scraped_data: list[dict]) -> list[CourseInfo]:
+    def _build_scraped_courses(scraped_data: Iterable[dict]) -> list[CourseInfo]:
         """Builds a list of CourseInfo dataclass instances from converted JSON.
 
         Args:
-            scraped_data (list): A list of dicts, each containing course data
+            scraped_data: Dicts each containing course data (a list, or
+                streamed from iter_course_records())
 
         Returns:
-            List of CourseInfo dataclass instances, one per course in scraped_data
+            List of CourseInfo dataclass instances, one per postbac course in scraped_data
         """
-        courses = []
+        return list(Command._iter_scraped_courses(scraped_data))
 
+    @staticmethod
+    def _iter_scraped_courses(scraped_data: Iterable[dict]) -> Iterator[CourseInfo]:
+        """Converts course records to CourseInfo instances as they arrive.
+        """
         # Iterate over raw JSON-loaded data, storing in dataclass
         for course in scraped_data:
-            if CourseInfo.is_valid_postbac_course(course['CourseNumber']):
+            if CourseInfo.is_valid_postbac_course(course['CourseNumber'], course['SubjectCode']):
                 # Wrap single-session courses in a list for type consistency
                 if type(course['Offerings']['CourseOffering']) is dict:
                     sessions = [course['Offerings']['CourseOffering']]
@@ -218,38 +618,222 @@ class Command(BaseCommand):
                     sessions = course['Offerings']['CourseOffering']
 
                 # Conversion/validation handled by dataclass
-                courses.append(CourseInfo.from_scraped(sessions))
+                yield CourseInfo.from_scraped(sessions)
 
-        return courses
+    @staticmethod
+    def _load_db_courses() -> list[dict]:
+        """Loads every course in the DB, in one query, sorted by subject and number.
+
+        Returns:
+            list of dicts of Course fields, with quarters offered as a
+            'qtrs' list (comparable with CourseInfo.qtrs)
+        """
+        return [dict(course, qtrs=Course.qtrs_of(course['qtr_mask']))
+                for course in Course.objects.values()]
 
     @staticmethod
-    def _build_db_prereq_list(course_number: int) -> list[int]:
-        """Builds prereq list from DB for a given course. 
+    def _load_db_prereqs() -> dict[tuple[str, int], list[tuple[str, int]]]:
+        """Loads every prereq relationship in the DB, in one query.
 
-        Args:
-            course_number: The course number whose prereqs are needed
+        Returns:
+            dict mapping (subject, course number) of courses to sorted lists
+            of their prereqs' (subject, course number) (courses without
+            prereqs are absent)
+        """
+        prereqs = {}
+        for crs_subj, crs_num, prq_subj, prq_num in Prereq.objects.values_list(
+                'course__subject', 'course__course_number',
+                'prereq__subject', 'prereq__course_number'):
+            prereqs.setdefault((crs_subj, crs_num), []).append((prq_subj, prq_num))
+        for prq_keys in prereqs.values():
+            prq_keys.sort()
+        return prereqs
+
+    @staticmethod
+    def _load_db_offerings(subjects: set[str]) -> set[tuple[str, int, int, int]]:
+        """Loads every offering of courses in the given subjects, in one query.
 
         Returns:
-            A sorted list of prereq course numbers for that course, as stored in DB. 
+            set of (subject, course number, year, qtr)
+        """
+        return set(Offering.objects.filter(course__subject__in=subjects).values_list(
+            'course__subject', 'course__course_number', 'year', 'qtr'))
+
+    @staticmethod
+    def _diff_catalog(scraped_courses: list[CourseInfo], db_courses: list[dict],
+                      db_prereqs: dict[tuple[str, int], list[tuple[str, int]]],
+                      db_offerings: set[tuple[str, int, int, int]],
+                      known: set[tuple[str, int]] = frozenset()) -> dict:
+        """Computes every change needed to bring the DB in line with a scrape.
+
+        Prereqs on courses that are neither scraped nor otherwise in the DB
+        cannot be stored (they would reference no course), so they are
+        reported as unresolved.
+
+        Offerings are only removed from terms the scrape lists (offerings
+        in past terms are history, not withdrawn), and only from courses
+        that are kept (removed courses take their offerings with them).
 
+        Args:
+            scraped_courses: List of CourseInfo objects
+            db_courses: List of dicts holding data from DB Course objects,
+                        in the subjects that were scraped
+            db_prereqs: Prereqs in the DB, as returned by _load_db_prereqs()
+            db_offerings: Offerings in the DB, as returned by _load_db_offerings()
+            known: (subject, course number) of DB courses in other subjects
+
+        Returns:
+            dict of:
+                courses: {'added': [{'subject', 'course_number', 'title', 'credits', 'qtrs'}],
+                          'removed': [{'subject', 'course_number', 'title'}],
+                          'changed': [{'subject', 'course_number', and for each
+                                       changed field, field: {'db', 'scraped'}}]}
+                prereqs: {'added': [[(subject, course number), (prereq subject, number)]],
+                          'removed': [...], 'unresolved': [...]}
+                offerings: {'added': [[subject, course number, year, qtr]],
+                            'removed': [...]}
         """
-        prereq_vals = Prereq.objects.filter(course=course_number).values_list("prereq")
-        prereq_list = sorted([prereq[0] for prereq in prereq_vals])
+        scraped = {course.key: course for course in scraped_courses}
+        db = {(course['subject'], course['course_number']): course for course in db_courses}
+
+        added = [{'subject': key[0], 'course_number': key[1], 'title': scraped[key].title,
+                  'credits': scraped[key].credits, 'qtrs': scraped[key].qtrs}
+                 for key in sorted(scraped.keys() - db.keys())]
+        removed = [{'subject': key[0], 'course_number': key[1], 'title': db[key]['title']}
+                   for key in sorted(db.keys() - scraped.keys())]
+        changed = []
+        for key in sorted(scraped.keys() & db.keys()):
+            changes = {field: {'db': db[key][field], 'scraped': getattr(scraped[key], field)}
+                       for field in ('title', 'credits', 'qtrs')
+                       if getattr(scraped[key], field) != db[key][field]}
+            if changes:
+                changed.append({'subject': key[0], 'course_number': key[1], **changes})
+
+        scraped_edges = {(key, prq_key) for key, course in scraped.items()
+                         for prq_key in course.prereqs}
+        unresolved = {edge for edge in scraped_edges
+                      if edge[1] not in scraped and edge[1] not in known}
+        db_edges = {(key, prq_key) for key, prq_keys in db_prereqs.items() if key in db
+                    for prq_key in prq_keys}
+
+        scraped_offerings = {(*key, *term) for key, course in scraped.items()
+                             for term in course.terms}
+        listed_terms = {offering[2:] for offering in scraped_offerings}
+        db_offerings = {offering for offering in db_offerings if offering[:2] in scraped}
+        return {
+            'courses': {'added': added, 'removed': removed, 'changed': changed},
+            'prereqs': {
+                'added': [list(edge) for edge in sorted(scraped_edges - unresolved - db_edges)],
+                'removed': [list(edge) for edge in sorted(db_edges - scraped_edges)],
+                'unresolved': [list(edge) for edge in sorted(unresolved)],
+            },
+            'offerings': {
+                'added': [list(offering) for offering in sorted(scraped_offerings - db_offerings)],
+                'removed': [list(offering) for offering in sorted(db_offerings - scraped_offerings)
+                            if offering[2:] in listed_terms],
+            },
+        }
+
+    @staticmethod
+    def _apply_diff(diff: dict, scraped_courses: list[CourseInfo]) -> CatalogRevision:
+        """Applies a diff from _diff_catalog() to the DB, in one transaction.
 
-        return prereq_list
+        Removed courses are deleted first, then added and changed courses
+        are upserted together and prereqs/offerings added/removed in bulk.
+        Deleting a course also deletes its placements in users' schedules,
+        whose placements documents are rebuilt (as are those of schedules
+        placing courses whose credits changed).
+
+        Returns:
+            CatalogRevision of the scraped offerings (new, or an earlier one
+            listing the same offerings)
+        """
+        courses, prereqs, offerings = diff['courses'], diff['prereqs'], diff['offerings']
+        with transaction.atomic():
+            ids = {(subject, crs_num): crs_id for crs_id, subject, crs_num
+                   in Course.objects.values_list('id', 'subject', 'course_number')}
+            if prereqs['removed']:
+                edges = {(ids[crs_key], ids[prq_key]) for crs_key, prq_key in prereqs['removed']}
+                _delete_by_id(Prereq, [
+                    prq_id for prq_id, crs_id, prereq_id
+                    in Prereq.objects.filter(course_id__in={crs_id for crs_id, _ in edges})
+                    .values_list('id', 'course_id', 'prereq_id')
+                    if (crs_id, prereq_id) in edges])
+            # Schedules placing courses whose credits changed need their placements
+            # documents rebuilt once the courses are written (those placing removed
+            # courses are rebuilt as they are deleted; see planner/signals.py)
+            stale = [ids[(course['subject'], course['course_number'])]
+                     for course in courses['changed'] if 'credits' in course]
+            affected = list(Course_Schedule.objects.filter(course_id__in=stale).values_list(
+                'schedule_id', flat=True).distinct()) if stale else []
+            if courses['removed']:
+                _delete_by_id(Course, [ids[(course['subject'], course['course_number'])]
+                                       for course in courses['removed']])
+
+            upserted = {(course['subject'], course['course_number'])
+                        for course in courses['added'] + courses['changed']}
+            upserts = [Course(subject=course.subject, course_number=course.course_number,
+                              title=course.title, credits=course.credits, qtrs=course.qtrs)
+                       for course in scraped_courses if course.key in upserted]
+            # 'required' is not scraped, so only catalog fields are overwritten
+            Course.objects.bulk_create(upserts, update_conflicts=True,
+                                       unique_fields=['subject', 'course_number'],
+                                       update_fields=['title', 'credits', 'qtr_mask'])
+
+            # Upserts do not return ids, so look up those of added courses
+            if courses['added']:
+                added = {(course['subject'], course['course_number'])
+                         for course in courses['added']}
+                ids.update({(subject, crs_num): crs_id for crs_id, subject, crs_num
+                            in Course.objects.filter(
+                                subject__in={subject for subject, _ in added},
+                                course_number__in={crs_num for _, crs_num in added})
+                            .values_list('id', 'subject', 'course_number')
+                            if (subject, crs_num) in added})
+            Prereq.objects.bulk_create([Prereq(course_id=ids[crs_key], prereq_id=ids[prq_key])
+                                        for crs_key, prq_key in prereqs['added']])
+            if affected:
+                ScheduleUtils.rebuild_placements(affected)
+
+            # Scrapes listing the same offerings share a revision
+            revision, created = CatalogRevision.objects.get_or_create(
+                digest=offerings_digest(scraped_courses),
+                defaults={'terms': sorted({year * 4 + qtr for course in scraped_courses
+                                           for year, qtr in course.terms})})
+            if not created:
+                revision.save(update_fields=['last_seen'])
+            if offerings['removed']:
+                terms = {(ids[(subject, crs_num)], year, qtr)
+                         for subject, crs_num, year, qtr in offerings['removed']}
+                _delete_by_id(Offering, [
+                    offering_id for offering_id, *term
+                    in Offering.objects.filter(course_id__in={crs_id for crs_id, _, _ in terms})
+                    .values_list('id', 'course_id', 'year', 'qtr')
+                    if tuple(term) in terms])
+            Offering.objects.bulk_create([
+                Offering(course_id=ids[(subject, crs_num)], year=year, qtr=qtr, revision=revision)
+                for subject, crs_num, year, qtr in offerings['added']])
+
+            # Bulk writes send no signals, so mark snapshots stale here
+            transaction.on_commit(CatalogUtils.bump_catalog_version)
+        return revision
 
     def _compare_course_lists(self, scraped_courses: list, db_courses: list) -> int:
         """Iterates over contents of scrape and course database, flagging errors.
 
         Args:
-            scraped_courses: List of CourseInfo objects 
-            db_courses: List of dicts holding data from DB Course objects
+            scraped_courses: List of CourseInfo objects, sorted by subject and number
+            db_courses: List of dicts holding data from DB Course objects,
+                        in the same order
         
         Returns:
             int representing the number of discrepancies found
         
         """
         
+        # Load every course's prereqs up front, rather than querying per course
+        db_prereq_lists = self._load_db_prereqs()
+
         # Initialize parameters for comparison loop
         i = j = 0
         course_ct = max(len(scraped_courses), len(db_courses))
@@ -257,20 +841,20 @@ class Command(BaseCommand):
 
         # Loop over scrape/db contents and compare
         while i < course_ct and j < course_ct:
+            db_key = (db_courses[j]['subject'], db_courses[j]['course_number'])
+            label = scraped_courses[i].subject + ' ' + str(scraped_courses[i].course_number)
             # First ensure that course numbers are same
-            if scraped_courses[i].course_number != db_courses[j]['course_number']:
+            if scraped_courses[i].key != db_key:
                 # If scraped course is not yet in DB, log and iterate past
-                if scraped_courses[i].course_number < db_courses[j]['course_number']:
-                    logger.warning("NEW COURSE: " +
-                                   str(scraped_courses[i].course_number) +
+                if scraped_courses[i].key < db_key:
+                    logger.warning("NEW COURSE: " + label +
                                    ' ' + scraped_courses[i].title + '\n\n')
                     i += 1
                     issue_ct += 1
                     continue
                 # If DB course is missing from scrape, log and iterate past
                 else:
-                    logger.warning("STALE COURSE: " +
-                                   str(db_courses[j]['course_number']) +
+                    logger.warning("STALE COURSE: " + db_key[0] + ' ' + str(db_key[1]) +
                                    ' ' + db_courses[j]['title'] + '\n\n')
                     j += 1
                     issue_ct += 1
@@ -278,17 +862,17 @@ class Command(BaseCommand):
 
             # Compare quarters/credits/titles, logging any differences
             for key in ['title', 'credits', 'qtrs']:
-                if asdict(scraped_courses[i])[key] != db_courses[j][key]:
-                    self._print_discrepancy(key, scraped_courses[i].course_number,
-                                            db_courses[j][key], asdict(scraped_courses[i])[key])
+                if getattr(scraped_courses[i], key) != db_courses[j][key]:
+                    self._print_discrepancy(key, label,
+                                            db_courses[j][key], getattr(scraped_courses[i], key))
                     issue_ct += 1
 
-            # Build prereq list for this course from DB 
-            db_prereqs = self._build_db_prereq_list(db_courses[j]['course_number'])
+            # Prereq list for this course from DB
+            db_prereqs = db_prereq_lists.get(db_key, [])
 
             # Compare prereqs, logging any differences
             if db_prereqs != scraped_courses[i].prereqs:
-                self._print_discrepancy('prereq', scraped_courses[i].course_number,
+                self._print_discrepancy('prereq', label,
                                         db_prereqs, scraped_courses[i].prereqs)
                 issue_ct += 1
 
@@ -301,13 +885,13 @@ class Command(BaseCommand):
 
 
     @staticmethod
-    def _print_discrepancy(key: str, course: int, db_val: int | str | list,
+    def _print_discrepancy(key: str, course: str, db_val: int | str | list,
                            scraped_val: int | str | list) -> None:
         """Writes details of any DB-scrape inconsistencies to stdout.
 
         Args:
             key: The field that has changed (e.g. 'title', 'credits', 'prereq')
-            course: The course number of the course that has changed
+            course: The subject and number of the course that has changed (e.g. 'CS 161')
             db_val: The value of the field in the DB
             scraped_val: The value of the field in the scraped JSON
         """
@@ -0,0 +1,123 @@
+import random
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from planner.models import Course_Schedule, Schedule, User
+from planner.utils import CatalogUtils, GeneratorUtils, ScheduleUtils
+from planner.views import MAX_USER_SCHEDULES
+
+# Rows per INSERT
+SEED_BATCH_SIZE = 10000
+# Credit caps seeded plans are generated with (part-time and full-time loads)
+SEED_TERM_CREDITS = (4, 8, 12)
+# Years seeded schedules may start in
+SEED_START_YEARS = range(2022, 2027)
+
+
+class Command(BaseCommand):
+    """Seeds users, schedules and placements for load testing.
+
+    Run via 'python manage.py seed_load'. Each seeded user gets M schedules,
+    each holding a valid generated plan from the loaded catalog (see
+    GeneratorUtils), cut off after a random number of terms, as a student
+    part-way through planning would have. Users are named '<prefix><n>'
+    and share one password, for use by 'manage.py loadtest'.
+    """
+    help = "Bulk-create users with schedules and placements for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help="Number of users to create")
+        parser.add_argument('--schedules', type=int, default=3,
+                            help="Schedules per user (at most " + str(MAX_USER_SCHEDULES) + ")")
+        parser.add_argument('--prefix', default='load_',
+                            help="Username prefix for seeded users")
+        parser.add_argument('--password', default='load-test-password',
+                            help="Password shared by all seeded users")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Random seed, for reproducible data")
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete previously seeded users (and their schedules) first")
+
+    def handle(self, *args, **options) -> None:
+        if not 0 <= options['schedules'] <= MAX_USER_SCHEDULES:
+            raise CommandError("--schedules must be between 0 and " + str(MAX_USER_SCHEDULES))
+        rnd = random.Random(options['seed'])
+        prefix = options['prefix']
+
+        # Generate one plan per (start term, credit cap) to draw placements from
+        catalog = CatalogUtils.get_catalog()
+        try:
+            plans = {(year, qtr, credits): GeneratorUtils.generate_plan(catalog, year, qtr, credits)
+                     for year in SEED_START_YEARS for qtr in range(4)
+                     for credits in SEED_TERM_CREDITS}
+        except GeneratorUtils.PlanError as e:
+            raise CommandError("Cannot seed placements from this catalog: " + str(e))
+
+        with transaction.atomic():
+            if options['clear']:
+                deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+                self.stderr.write("Deleted " + str(deleted) + " previously seeded rows")
+
+            # Hash the shared password once, rather than once per user
+            password = make_password(options['password'])
+            start = User.objects.filter(username__startswith=prefix).count()
+            users = User.objects.bulk_create(
+                [User(username=prefix + str(n), password=password)
+                 for n in range(start, start + options['users'])],
+                batch_size=SEED_BATCH_SIZE)
+
+            schedules = []
+            layouts = []
+            for user in users:
+                for n in range(options['schedules']):
+                    schedule, layout = self._random_schedule(rnd, user, plans)
+                    schedule.name = 'Load test ' + str(n + 1)
+                    ScheduleUtils.set_placement_document(
+                        schedule, ScheduleUtils.pack_placements(layout, catalog))
+                    schedules.append(schedule)
+                    layouts.append(layout)
+            Schedule.objects.bulk_create(schedules, batch_size=SEED_BATCH_SIZE)
+
+            # Insert placements in batches, to keep memory flat
+            placement_ct = 0
+            batch = []
+            for schedule, layout in zip(schedules, layouts):
+                for crs_num, (year, qtr) in layout.items():
+                    batch.append(Course_Schedule(schedule=schedule,
+                                                 course_id=catalog.by_number[crs_num].id,
+                                                 year=year, qtr=qtr))
+                if len(batch) >= SEED_BATCH_SIZE:
+                    Course_Schedule.objects.bulk_create(batch)
+                    placement_ct += len(batch)
+                    batch = []
+            Course_Schedule.objects.bulk_create(batch)
+            placement_ct += len(batch)
+
+        self.stdout.write("Seeded " + str(len(users)) + " users, " + str(len(schedules)) +
+                          " schedules, " + str(placement_ct) + " placements")
+
+    @staticmethod
+    def _random_schedule(rnd: random.Random, user: User,
+                         plans: dict) -> tuple[Schedule, dict[int, tuple[int, int]]]:
+        """Builds an unsaved schedule from a random plan, and its placements.
+
+        Returns:
+            (Schedule, dict mapping course numbers to (year, qtr) tuples)
+        """
+        start_qtr = rnd.randrange(4)
+        start_year = rnd.choice(SEED_START_YEARS)
+        plan = plans[(start_year, start_qtr, rnd.choice(SEED_TERM_CREDITS))]
+
+        # Keep a random number of the plan's terms (an empty schedule is realistic too)
+        term_ct = rnd.randint(0, len(plan.terms))
+        first_term = start_year * 4 + start_qtr
+        layout = {}
+        for offset, term in enumerate(plan.terms[:term_ct]):
+            for crs_num in term:
+                layout[crs_num] = divmod(first_term + offset, 4)
+
+        end_year, end_qtr = divmod(first_term + max(term_ct, 4) - 1, 4)
+        schedule = Schedule(user=user, start_qtr=start_qtr, start_year=start_year,
+                            end_qtr=end_qtr, end_year=end_year)
+        return schedule, layout
@@ -0,0 +1,41 @@
+# Generated by Django 4.1.3 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+def remove_duplicate_placements(apps, schema_editor):
+    """Keeps only the newest placement of each course within a schedule.
+
+    The unique constraint below was previously declared outside Meta and
+    never created, so duplicate rows may exist.
+    """
+    Course_Schedule = apps.get_model("planner", "Course_Schedule")
+    keep = (
+        Course_Schedule.objects.values("schedule", "course")
+        .annotate(keep_id=models.Max("id"))
+        .values("keep_id")
+    )
+    Course_Schedule.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0004_alter_course_options_alter_schedule_options_and_more"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_placements, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="course_schedule",
+            index=models.Index(
+                fields=["schedule", "year", "qtr"], name="course_schedule_term_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="course_schedule",
+            constraint=models.UniqueConstraint(
+                fields=("schedule", "course"), name="unique_class_instance_per_schedule"
+            ),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.1.3 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+def copy_course_numbers(apps, schema_editor):
+    """Fills in course numbers from the old key, which became the id.
+
+    Existing courses keep their numbers as ids, so placements and prereqs
+    pointing at them are unchanged; new courses get ids from a sequence.
+    """
+    Course = apps.get_model("planner", "Course")
+    Course.objects.update(course_number=models.F("id"))
+
+
+def advance_id_sequence(apps, schema_editor):
+    """Starts new ids after the existing ones (the old course numbers).
+
+    Only Postgres needs this; SQLite picks ids after the largest in use.
+    """
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "SELECT setval(pg_get_serial_sequence('planner_course', 'id'), "
+            "COALESCE(MAX(id), 0) + 1, false) FROM planner_course"
+        )
+
+
+def check_deferred_constraints(apps, schema_editor):
+    """Checks deferred FKs now, so later ALTERs have no pending trigger events."""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0005_course_schedule_unique_and_term_index"),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name="course",
+            old_name="course_number",
+            new_name="id",
+        ),
+        migrations.AlterField(
+            model_name="course",
+            name="id",
+            field=models.AutoField(primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(advance_id_sequence, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name="course",
+            name="subject",
+            field=models.CharField(default="CS", max_length=8),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="course_number",
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_course_numbers, migrations.RunPython.noop),
+        migrations.RunPython(check_deferred_constraints, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="course",
+            name="title",
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterModelOptions(
+            name="course",
+            options={"ordering": ["subject", "course_number"]},
+        ),
+        migrations.AddConstraint(
+            model_name="course",
+            constraint=models.UniqueConstraint(
+                fields=("subject", "course_number"), name="unique_course_number_per_subject"
+            ),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.3 on 2026-10-18 18:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('planner', '0006_course_subject_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('terms', models.JSONField(default=list)),
+                ('first_seen', models.DateTimeField(auto_now_add=True)),
+                ('last_seen', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['first_seen'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Offering',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('qtr', models.PositiveSmallIntegerField(choices=[(0, 'Winter'), (1, 'Spring'), (2, 'Summer'), (3, 'Fall')])),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='planner.course')),
+                ('revision', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='planner.catalogrevision')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='offering',
+            index=models.Index(fields=['year', 'qtr', 'course'], name='offering_term_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='offering',
+            constraint=models.UniqueConstraint(fields=('course', 'year', 'qtr'), name='unique_offering_per_term'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.1.3 on 2026-10-18 21:10
+
+import django.contrib.postgres.fields
+import django.core.validators
+from django.db import migrations, models
+
+
+def qtrs_to_mask(apps, schema_editor):
+    """Converts each course's list of quarters offered to a bitmask."""
+    Course = apps.get_model("planner", "Course")
+    for course in Course.objects.all():
+        course.qtr_mask = sum(1 << qtr for qtr in set(course.qtrs))
+        course.save(update_fields=["qtr_mask"])
+
+
+def mask_to_qtrs(apps, schema_editor):
+    Course = apps.get_model("planner", "Course")
+    for course in Course.objects.all():
+        course.qtrs = [qtr for qtr in range(4) if course.qtr_mask >> qtr & 1]
+        course.save(update_fields=["qtrs"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0007_offering_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="qtr_mask",
+            field=models.PositiveSmallIntegerField(
+                default=0, validators=[django.core.validators.MaxValueValidator(15)]
+            ),
+        ),
+        migrations.RunPython(qtrs_to_mask, mask_to_qtrs),
+        # A default lets a reverse migration re-add the column to existing rows
+        migrations.AlterField(
+            model_name="course",
+            name="qtrs",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.PositiveSmallIntegerField(), default=list, size=4
+            ),
+        ),
+        migrations.RemoveField(
+            model_name="course",
+            name="qtrs",
+        ),
+    ]
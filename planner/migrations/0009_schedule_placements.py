@@ -0,0 +1,38 @@
+# Generated by Django 4.1.3 on 2026-10-18 23:05
+
+from django.db import migrations, models
+
+
+def fill_placements(apps, schema_editor):
+    """Copies each schedule's Course_Schedule rows into its placements document."""
+    Schedule = apps.get_model("planner", "Schedule")
+    Course_Schedule = apps.get_model("planner", "Course_Schedule")
+    documents = {}
+    for sched_id, crs_id, year, qtr, credits in Course_Schedule.objects.values_list(
+            "schedule_id", "course_id", "year", "qtr", "course__credits"):
+        placements, total = documents.get(sched_id, ([], 0))
+        placements.append([crs_id, year * 4 + qtr])
+        documents[sched_id] = (placements, total + credits)
+    for sched_id, (placements, total) in documents.items():
+        Schedule.objects.filter(id=sched_id).update(placements=sorted(placements), credits=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0008_course_qtr_mask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedule",
+            name="credits",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="placements",
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(fill_placements, migrations.RunPython.noop),
+    ]
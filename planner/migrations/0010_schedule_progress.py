@@ -0,0 +1,46 @@
+# Generated by Django 4.1.3 on 2026-10-18 23:40
+
+from django.db import migrations, models
+
+
+def fill_progress(apps, schema_editor):
+    """Computes each schedule's aggregates from its Course_Schedule rows."""
+    Schedule = apps.get_model("planner", "Schedule")
+    Course_Schedule = apps.get_model("planner", "Course_Schedule")
+    progress = {}
+    for sched_id, year, qtr, credits, required in Course_Schedule.objects.values_list(
+            "schedule_id", "year", "qtr", "course__credits", "course__required"):
+        courses, term_credits, required_done = progress.get(sched_id, (0, {}, 0))
+        term = year * 4 + qtr
+        term_credits[term] = term_credits.get(term, 0) + credits
+        progress[sched_id] = (courses + 1, term_credits, required_done + required)
+    for sched_id, (courses, term_credits, required_done) in progress.items():
+        Schedule.objects.filter(id=sched_id).update(
+            courses=courses, required_done=required_done,
+            term_credits=sorted([term, credits] for term, credits in term_credits.items()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0009_schedule_placements"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="schedule",
+            name="courses",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="required_done",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="schedule",
+            name="term_credits",
+            field=models.JSONField(default=list),
+        ),
+        migrations.RunPython(fill_progress, migrations.RunPython.noop),
+    ]
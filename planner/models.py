@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.contrib.postgres.fields import ArrayField
+from django.db.models import F
 
 
 class User(AbstractUser):
@@ -20,39 +20,93 @@ class User(AbstractUser):
     """
     pass
 
+class CourseQuerySet(models.QuerySet):
+    """Adds catalog filters to Course querysets."""
+
+    def offered_in(self, qtr: int) -> 'CourseQuerySet':
+        """Filters to courses offered in a quarter, with a bitwise AND in the DB.
+        """
+        return self.alias(offered=F('qtr_mask').bitand(1 << qtr)).filter(offered__gt=0)
+
+
 class Course(models.Model):
     """Represents an individual course in the catalog.
+
+    Courses are identified by subject and number (e.g. CS 161, MTH 111).
+    Only CS courses are planned in schedules; courses in other subjects
+    are kept so that cross-subject prereqs can be stored.
     """
-    # Course number (CS XXX) serves as primary key
+    # Surrogate key (courses that predate subjects kept their number as id)
+    id = models.AutoField(primary_key=True)
+
+    # Subject code and course number together identify a course
     # May be worth refactoring, due to CS 406 (variable credit, repeatable)
-    course_number = models.PositiveSmallIntegerField(primary_key=True)
-    
-    # Official course title 
-    title = models.CharField(max_length=100, unique=True)
+    subject = models.CharField(max_length=8, default='CS')
+    course_number = models.PositiveSmallIntegerField()
+
+    # Official course title
+    title = models.CharField(max_length=100)
     
     # Number of credits (nearly all courses are 4, but 1-16 are possible)
     credits = models.PositiveSmallIntegerField(
         default=4,
         validators=[MaxValueValidator(16), MinValueValidator(1)]
     )
-    # Quarter(s) in which course is offered 
-    qtrs = ArrayField(models.PositiveSmallIntegerField(), size=4)
+    # Quarter(s) in which course is offered, as a bitmask (bit n set if
+    # offered in Schedule.Quarter n; e.g. 0b1001 is Winter and Fall)
+    qtr_mask = models.PositiveSmallIntegerField(
+        default=0,
+        validators=[MaxValueValidator(0b1111)]
+    )
     
     # Whether course is required or elective for CS majors
     required = models.BooleanField(default=False)
 
     class Meta:
-        ordering = ['course_number']
+        ordering = ['subject', 'course_number']
+        # Also serves as the index for lookups by subject, or subject and number
+        constraints = [
+            models.UniqueConstraint(fields=['subject', 'course_number'],
+                                    name='unique_course_number_per_subject')
+        ]
+
+    objects = CourseQuerySet.as_manager()
+
+    @property
+    def qtrs(self) -> list[int]:
+        """Quarters offered, as a sorted list (for code predating qtr_mask).
+        """
+        return Course.qtrs_of(self.qtr_mask)
+
+    @qtrs.setter
+    def qtrs(self, qtrs: list[int]) -> None:
+        self.qtr_mask = Course.mask_of(qtrs)
+
+    @staticmethod
+    def mask_of(qtrs: list[int]) -> int:
+        """Converts a list of quarters to a quarter bitmask.
+        """
+        mask = 0
+        for qtr in qtrs:
+            mask |= 1 << qtr
+        return mask
+
+    @staticmethod
+    def qtrs_of(qtr_mask: int) -> list[int]:
+        """Converts a quarter bitmask to a sorted list of quarters.
+        """
+        return [qtr for qtr in range(4) if qtr_mask >> qtr & 1]
 
     def __str__(self):
-        return "CS " + str(self.course_number) + " - " + str(self.title)
+        return self.subject + " " + str(self.course_number) + " - " + str(self.title)
 
 class Schedule(models.Model):
     """ Represents a schedule created by a user.
 
         Schedules have customizable names and start/end dates.
         Users are stored as foreign keys. 
-        Courses link to Schedules via the Course_Schedule intersection table, below.
+        Courses link to Schedules via the Course_Schedule intersection table, below,
+        which 'placements' duplicates for reads.
     """
     # IntegerChoices creates an enum-like class, restricting
     # choices for start_qtr/end_qtr to valid values.
@@ -69,6 +123,17 @@ class Schedule(models.Model):
     start_year = models.PositiveSmallIntegerField()
     end_year = models.PositiveSmallIntegerField()
 
+    # Copy of the schedule's Course_Schedule rows, so pages need only this row:
+    # [[course id, year * 4 + qtr], ...] sorted by course id, with aggregates
+    # of them for progress and list views: courses placed, their total credits,
+    # [[year * 4 + qtr, credits], ...] sorted by term, and required courses
+    # placed. Written along with the rows (see ScheduleUtils.PlacementDocument)
+    placements = models.JSONField(default=list)
+    courses = models.PositiveSmallIntegerField(default=0)
+    credits = models.PositiveSmallIntegerField(default=0)
+    term_credits = models.JSONField(default=list)
+    required_done = models.PositiveSmallIntegerField(default=0)
+
     class Meta:
         ordering = ['id']
 
@@ -88,11 +153,17 @@ class Course_Schedule(models.Model):
     year = models.PositiveSmallIntegerField()
     qtr = models.PositiveSmallIntegerField(choices=Schedule.Quarter.choices)
 
-    constraints = [
-        models.UniqueConstraint(fields=['schedule', 'course'],
-                                name='unique_class_instance_per_schedule')
-        # TODO: add check constraint for year/qtr within schedule bounds
-    ]
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'course'],
+                                    name='unique_class_instance_per_schedule')
+            # TODO: add check constraint for year/qtr within schedule bounds
+        ]
+        # Schedule pages load placements by schedule and term
+        indexes = [
+            models.Index(fields=['schedule', 'year', 'qtr'],
+                         name='course_schedule_term_idx')
+        ]
 
     def __str__(self):
         return str(self.schedule) + " - " + str(self.course.course_number) + \
@@ -114,5 +185,53 @@ class Prereq(models.Model):
         # TODO: Add uniqueness constraint on course/prereq pair
 
     def __str__(self):
-        return "CS " + str(self.course.course_number) + \
-               " :: CS " + str(self.prereq.course_number)
+        return self.course.subject + " " + str(self.course.course_number) + \
+               " :: " + self.prereq.subject + " " + str(self.prereq.course_number)
+
+
+class CatalogRevision(models.Model):
+    """ Represents one distinct version of the scraped catalog's offerings.
+
+        Scrapes are matched to revisions by a hash of the offerings they
+        list, so repeated scrapes of an unchanged catalog share a revision
+        (only updating last_seen), and each offering is stored once.
+    """
+    # SHA-256 of the revision's offerings (see scrape.offerings_digest())
+    digest = models.CharField(max_length=64, unique=True)
+    # Terms listed in the catalog at this revision, as a list of year * 4 + qtr
+    terms = models.JSONField(default=list)
+    first_seen = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['first_seen']
+
+    def __str__(self):
+        return self.digest[:12] + " (" + str(self.first_seen) + ")"
+
+
+class Offering(models.Model):
+    """ Represents a course being offered in a specific term.
+
+        Unlike Course.qtrs (the quarters a course is usually offered),
+        offerings record the actual terms a scraped catalog listed, with
+        the revision that first listed them.
+    """
+    course = models.ForeignKey('Course', on_delete=models.CASCADE)
+    year = models.PositiveSmallIntegerField()
+    qtr = models.PositiveSmallIntegerField(choices=Schedule.Quarter.choices)
+    revision = models.ForeignKey('CatalogRevision', on_delete=models.CASCADE)
+
+    class Meta:
+        # Also serves as the index for lookups by course
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'year', 'qtr'],
+                                    name='unique_offering_per_term')
+        ]
+        # "Offered in term T" lookups (covering, so answered from the index alone)
+        indexes = [
+            models.Index(fields=['year', 'qtr', 'course'], name='offering_term_idx')
+        ]
+
+    def __str__(self):
+        return str(self.course) + " (" + str(self.qtr) + " " + str(self.year) + ")"
@@ -0,0 +1,70 @@
+import logging
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from planner.models import Course, Course_Schedule, Offering, Prereq, Schedule
+from planner.utils import CatalogUtils, ScheduleUtils
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Prereq)
+@receiver(post_delete, sender=Prereq)
+@receiver(post_save, sender=Offering)
+@receiver(post_delete, sender=Offering)
+def catalog_changed(sender, **kwargs) -> None:
+    """Bumps the catalog version when a Course, Prereq or Offering row changes.
+
+    Deferred until commit, so other workers never rebuild their snapshot
+    from data that is not yet visible to them.
+    """
+    transaction.on_commit(CatalogUtils.bump_catalog_version)
+
+
+@receiver(pre_delete, sender=Course)
+def course_deleting(sender, instance, **kwargs) -> None:
+    """Notes which schedules place a course about to be deleted, before
+    the delete cascades to their Course_Schedule rows.
+    """
+    instance._placed_schedule_ids = list(
+        Course_Schedule.objects.filter(course=instance)
+        .values_list('schedule_id', flat=True).distinct())
+
+
+@receiver(post_delete, sender=Course)
+def course_deleted(sender, instance, **kwargs) -> None:
+    """Rebuilds the placements documents of schedules that placed a deleted
+    course, in the delete's transaction, so they no longer list it.
+    """
+    sched_ids = getattr(instance, '_placed_schedule_ids', None)
+    if sched_ids:
+        ScheduleUtils.rebuild_placements(sched_ids)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def schedule_changed(sender, instance, update_fields=None, **kwargs) -> None:
+    """Drops the owner's cached schedule summaries when a schedule is
+    created, deleted, or saved with fields the summaries show.
+
+    Deferred until commit, so the summaries are never refilled from the
+    old rows while the change is in progress.
+    """
+    if update_fields is not None and not ScheduleUtils.SUMMARY_FIELDS & update_fields:
+        return
+    transaction.on_commit(lambda: ScheduleUtils.invalidate_schedule_summaries([instance.user_id]))
+
+
+def catalog_migrated(sender, **kwargs) -> None:
+    """Bumps the catalog version after migrations are applied.
+
+    Data migrations use historical models, which do not trigger the
+    receivers above. Connected in PlannerConfig.ready().
+    """
+    try:
+        CatalogUtils.bump_catalog_version()
+    except DatabaseError as e:
+        # Cache table may not exist yet (e.g. before 'createcachetable')
+        logger.info("Could not bump catalog version: " + str(e))
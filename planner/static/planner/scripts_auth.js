@@ -34,6 +34,37 @@ if (create_btn !== null) { // (e.g. if max schedules not reached)
     create_btn.addEventListener('click', createSchedule);    
 }
 
+/* Copy existing schedules (with their courses) via sidebar menu. */
+function copySchedule(event) {
+    event.preventDefault();
+    const id = event.target.getAttribute('data-copy-id');
+    const request = new Request(
+        "/schedules/" + id + "/copy",
+        {headers: {'X-CSRFToken': csrftoken,
+                     'Accept': 'application/json'},
+            method: 'POST',
+            mode: 'same-origin'
+        });
+
+    fetch(request)
+        .then((response) => {
+            // raise error if response code is not 2XX
+            if (response.ok) return response.json();
+            return response.json().then(response => {throw new Error(response.msg)})})
+        .then((data) => {
+            // redirect to the copy
+            window.open("/schedules/" + data.schedule, "_self");
+        })
+        .catch((error) => {
+            console.error('Error copying schedule: ', error);
+        });
+}
+
+const copy_btns = Object.values(document.getElementsByClassName('copy-sched'));
+copy_btns.forEach(btn => {
+    btn.addEventListener('click', copySchedule);
+});
+
 function saveSchedule() {
     /* Saves any pending changes to the course schedule (dates, scheduled courses), by 
        JSON-encoding the state object and sending to server PATCH endpoint. */
@@ -97,9 +128,10 @@ function delete_schedule(event) {
                 // otherwise, remove schedule from sidebar
                 document.getElementById(id + '_parent').remove();
 
-                // if there were previously 10 schedules, show create button again
+                // if there were previously 10 schedules, show create and copy buttons again
                 if (document.getElementsByClassName('delete-sched').length == 9) {
                     document.getElementById('create-sched').hidden = false;
+                    copy_btns.forEach(btn => { btn.hidden = false; });
                 }
             }
         })
@@ -5,6 +5,26 @@ const COURSE_COLOR_NORM = '#FFFAF3';
 const TERM_COLOR_DRAG = 'lightgreen';
 const TERM_COLOR_NORM = '';
 
+// Course prereqs/quarters offered, loaded from the (browser-cached) catalog JSON
+// (quarters offered are bitmasks: bit n is set if offered in quarter n)
+let prereqs = null;
+let qtr_masks = null;
+fetch(catalog_url)
+  .then((response) => response.json())
+  .then((catalog) => {
+    prereqs = catalog.prereqs;
+    qtr_masks = catalog.qtr_masks;
+    // any course not already placed in the schedule starts out unscheduled
+    for (const id of Object.keys(prereqs)) {
+      if (!(id in crs_idx)) {
+        crs_idx[id] = -1;
+      }
+    }
+  })
+  .catch((error) => {
+    console.error('Error loading catalog: ', error);
+  });
+
 // Settings object for dragula.js library (drag-and-drop)
 var drake = dragula({
   isContainer: function (el) {
@@ -12,8 +32,8 @@ var drake = dragula({
     return el.classList.contains('course-container');
   },
   moves: function (el) {
-    // defines draggable objects (courses)
-    return (!el.classList.contains('placeholder'));
+    // defines draggable objects (courses), once catalog data has loaded
+    return (prereqs !== null && !el.classList.contains('placeholder'));
   },
   accepts: function (el, target, source, sibling) {
     /* 
@@ -34,7 +54,7 @@ var drake = dragula({
       // check that item can be dropped in this quarter - return false if it cannot
       let item_id = +el.getAttribute('data-id');
       let target_qtr = +target.parentNode.getAttribute('data-qtr');
-      if (offered_qtrs[item_id].indexOf(target_qtr) === -1) {
+      if (!(qtr_masks[item_id] >> target_qtr & 1)) {
         return false;
       }
       // find index of target qtr, pull course prereqs
@@ -130,10 +150,10 @@ function dragHighlighter(el, source) {
   // returns index of latest-placed prereq, or -1 (if prqs still unplaced) or 0 (if no prqs)
   let final_prq_idx = getFinalPrqIdx(prereqs[course_id], crs_idx);
   if (final_prq_idx > -1) { 
-  let course_qtrs = offered_qtrs[course_id];
+  let qtr_mask = qtr_masks[course_id];
     for (var i = final_prq_idx + 1; i < terms.length - 1; ++i){ // iterator avoids first/last items in the array, which are add-term buttons
       let this_qtr = terms[i].getAttribute('data-qtr');
-      if (course_qtrs.includes(+this_qtr)) {
+      if (qtr_mask >> this_qtr & 1) {
         terms[i].children[1].style.outline = "4px groove " + TERM_COLOR_DRAG; // 
       }
     }
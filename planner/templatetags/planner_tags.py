@@ -0,0 +1,12 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def offered_in(qtr_mask: int, qtr: int) -> bool:
+    """Checks a quarter bitmask (see Course.qtr_mask) for a quarter.
+
+    Usage: {% if course.qtr_mask|offered_in:0 %}
+    """
+    return bool(qtr_mask >> qtr & 1)
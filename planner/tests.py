@@ -1,11 +1,60 @@
-from django.test import LiveServerTestCase, Client
+from django.db import connection
+from django.test import LiveServerTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from bs4 import BeautifulSoup
-import requests, datetime
+import requests, datetime, io, json, os, shutil, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from planner.models import (CatalogRevision, Course, Course_Schedule, Offering, Prereq,
+                            Schedule, User)
+from planner.utils import AnalyticsUtils, CatalogUtils, GeneratorUtils, ScheduleUtils, ValidationUtils
+from planner.management.commands.bench import SCRAPE_FIXTURE
+from planner.management.commands import scrape
+from planner.management.commands.scrape import Command as ScrapeCommand
+from django.urls import path
+from planner import async_views, views
+from castor import cache as tiered_cache
+from castor.middleware import view_stats
+from castor.urls import urlpatterns as site_urlpatterns
 
 
+def _course(crs_num, subject='CS'):
+    """Looks up a course by subject and number (ids no longer match course numbers)."""
+    return Course.objects.get(subject=subject, course_number=crs_num)
+
+
+def _create_courses(nums, required=None):
+    """Creates CS courses offered every quarter (even-numbered ones required, by default)."""
+    for num in nums:
+        Course.objects.create(course_number=num, title='Course ' + str(num), qtrs=[0, 1, 2, 3],
+                              required=num % 2 == 0 if required is None else required)
+
+
+def _create_schedule(username='tester', end_year=2024, **fields):
+    """Creates a user, and a schedule for them from 2024 through end_year."""
+    user = User.objects.create_user(username=username, password='pw')
+    return user, Schedule.objects.create(user=user, start_qtr=0, end_qtr=3, start_year=2024,
+                                         end_year=end_year, **fields)
+
+
+# The site's URLs with schedule views served async, as under ASGI (see TestAsyncViews)
+urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('schedules', async_views.create, name='create'),
+    path('schedules/<int:sched_id>', async_views.sched_router, name='sched_router'),
+    *site_urlpatterns,
+]
+
 class TestStaticAssets(LiveServerTestCase):
     @classmethod
     def setUp(cls):
@@ -69,3 +118,1095 @@ class TestHomePageDemo(LiveServerTestCase):
         for qtr in demo_qtrs:
             self.assertEqual(qtr.get_attribute('data-yr'), str(datetime.datetime.now().year))
 
+
+class TestCatalogSnapshot(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        Course.objects.create(course_number=162, title='Intro II', qtrs=[0, 1, 3], required=True)
+        Course.objects.create(course_number=370, title='Security', qtrs=[1])
+        Prereq.objects.create(course=_course(162), prereq=_course(161))
+
+    # snapshot holds prereqs/quarters/required split, built in three queries
+    def test_snapshot_contents(self):
+        version = CatalogUtils.get_catalog_version()
+        with self.assertNumQueries(3):
+            catalog = CatalogUtils.CatalogSnapshot.build(version)
+        self.assertEqual(catalog.prereqs, {161: [], 162: [161], 370: []})
+        self.assertEqual(catalog.qtr_masks[162], 0b1011)
+        self.assertEqual([c.course_number for c in catalog.required], [161, 162])
+        self.assertEqual([c.course_number for c in catalog.electives], [370])
+
+    # quarters offered are stored as a bitmask, and filtered on in the DB
+    def test_qtr_mask(self):
+        course = _course(162)
+        self.assertEqual(course.qtr_mask, 0b1011)
+        self.assertEqual(course.qtrs, [0, 1, 3])
+        self.assertEqual([c.course_number for c in Course.objects.offered_in(1)], [161, 162, 370])
+        self.assertEqual([c.course_number for c in Course.objects.offered_in(2)], [161])
+
+    # snapshot is reused while the version is unchanged
+    def test_snapshot_shared(self):
+        catalog = CatalogUtils.get_catalog()
+        self.assertIs(CatalogUtils.get_catalog(), catalog)
+
+    # saving a course bumps the version and rebuilds the snapshot
+    def test_snapshot_invalidated(self):
+        catalog = CatalogUtils.get_catalog()
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.filter(course_number=370).update(title='Intro to Security')
+            Course.objects.get(course_number=370).save()
+        fresh = CatalogUtils.get_catalog()
+        self.assertNotEqual(fresh.version, catalog.version)
+        self.assertEqual(fresh.by_number[370].title, 'Intro to Security')
+
+    # demo context is built without any per-course queries
+    def test_demo_context_queries(self):
+        CatalogUtils.get_catalog()
+        with self.assertNumQueries(1):
+            context = ScheduleUtils.get_context_demo()
+        self.assertEqual(context['catalog_hash'], CatalogUtils.get_catalog().digest)
+
+
+# Max number of DB queries allowed to render a schedule page
+PAGE_QUERY_BUDGET = 5
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestSchedulePageQueries(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _create_courses(range(300, 320))
+        for num in range(301, 320):
+            Prereq.objects.create(course=_course(num), prereq=_course(num - 1))
+
+        cls.user, cls.schedule = _create_schedule(end_year=2027)
+        # one course per term, across all four years
+        for i, num in enumerate(range(300, 316)):
+            Course_Schedule.objects.create(schedule=cls.schedule, course=_course(num),
+                                           year=2024 + i // 4, qtr=i % 4)
+        ScheduleUtils.rebuild_placements([cls.schedule.id])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        # warm the catalog snapshot and schedule summaries, as a running worker would have
+        CatalogUtils.get_catalog()
+        ScheduleUtils.get_schedule_summaries(self.user)
+
+    # schedule page stays within query budget, regardless of courses placed
+    def test_display_query_budget(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/schedules/' + str(self.schedule.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), PAGE_QUERY_BUDGET,
+                             '\n'.join(q['sql'] for q in queries.captured_queries))
+        # placements are read from the schedule's row, not its Course_Schedule rows
+        self.assertFalse([q for q in queries.captured_queries
+                          if 'planner_course_schedule' in q['sql']])
+
+    # placements are bucketed into the right terms, unscheduled lists exclude them
+    def test_display_context(self):
+        response = self.client.get('/schedules/' + str(self.schedule.id))
+        sched_qtrs = response.context['sched_qtrs']
+        self.assertEqual(len(sched_qtrs), 16)
+        self.assertEqual([c.course.id for c in sched_qtrs[(2025, 2)]], [_course(306).id])
+        self.assertEqual(response.context['credits'], 64)
+        self.assertEqual([c.course_number for c in response.context['unsched_req']],
+                         [316, 318])
+        self.assertEqual([c.course_number for c in response.context['unsched_elec']],
+                         [317, 319])
+
+    # demo page also stays within query budget
+    def test_demo_query_budget(self):
+        self.client.logout()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), PAGE_QUERY_BUDGET)
+
+
+class TestUpdateSchedule(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _create_courses(range(300, 320))
+        cls.user, cls.schedule = _create_schedule()
+        Course_Schedule.objects.create(schedule=cls.schedule, course=_course(300), year=2024, qtr=0)
+        Course_Schedule.objects.create(schedule=cls.schedule, course=_course(301), year=2024, qtr=0)
+        ScheduleUtils.rebuild_placements([cls.schedule.id])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        CatalogUtils.get_catalog()
+
+    def patch(self, courses, dates=None):
+        null_term = {'year': None, 'qtr': None}
+        body = {'courses': courses, 'dates': dates or {'start': null_term, 'end': null_term}}
+        return self.client.patch('/schedules/' + str(self.schedule.id), body,
+                                 content_type='application/json')
+
+    def placements(self):
+        return sorted(Course_Schedule.objects.filter(schedule=self.schedule)
+                      .values_list('course__course_number', 'year', 'qtr'))
+
+    # adds, moves and removes are applied together, and new state is returned
+    def test_apply_changes(self):
+        response = self.patch({'300': {'year': None, 'qtr': None},
+                               '301': {'year': '2025', 'qtr': '1'},
+                               '302': {'year': 2024, 'qtr': 3}},
+                              {'start': {'year': None, 'qtr': None},
+                               'end': {'year': 2025, 'qtr': 1}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.placements(), [(301, 2025, 1), (302, 2024, 3)])
+        state = response.json()
+        self.assertEqual(state['courses'], {'301': {'year': 2025, 'qtr': 1},
+                                            '302': {'year': 2024, 'qtr': 3}})
+        self.assertEqual(state['dates']['end'], {'year': 2025, 'qtr': 1})
+        self.assertEqual(state['credits'], 8)
+        # aggregates are saved with the placements
+        self.schedule.refresh_from_db()
+        self.assertEqual((self.schedule.courses, self.schedule.credits,
+                          self.schedule.required_done), (2, 8, 1))
+        self.assertEqual(self.schedule.term_credits, [[2024 * 4 + 3, 4], [2025 * 4 + 1, 4]])
+
+    # an invalid entry rejects the whole change set
+    def test_invalid_change_set(self):
+        response = self.patch({'300': {'year': None, 'qtr': None},
+                               '999': {'year': 2024, 'qtr': 1}})
+        self.assertEqual(response.status_code, 400)
+        response = self.patch({'302': {'year': 2024, 'qtr': 7}})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.placements(), [(300, 2024, 0), (301, 2024, 0)])
+
+    # bodies that are not JSON objects, or hold non-object courses/dates, are rejected
+    def test_malformed_body(self):
+        for body in ('[]', '"x"', 'null', 'not json', '{"courses": [], "dates": {}}',
+                     '{"courses": {}, "dates": "x"}'):
+            response = self.client.patch('/schedules/' + str(self.schedule.id), body,
+                                         content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.json()['msg'], 'malformed request')
+
+    # number of queries does not grow with the number of changed courses
+    def test_bulk_queries(self):
+        courses = {str(num): {'year': 2024, 'qtr': num % 4} for num in range(300, 320)}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(courses)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.placements()), 20)
+        writes = [q for q in queries.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        # one upsert of the placements, and one update of the schedule's document
+        self.assertEqual(len(writes), 2)
+        self.schedule.refresh_from_db()
+        self.assertEqual(len(self.schedule.placements), 20)
+        self.assertEqual(self.schedule.credits, 80)
+
+    # placements documents are checked against their rows, and rebuilt from them
+    def test_check_placements(self):
+        Course_Schedule.objects.create(schedule=self.schedule, course=_course(302), year=2024, qtr=1)
+        with self.assertRaisesMessage(CommandError, str(self.schedule.id)):
+            call_command('check_placements', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('check_placements', fix=True, batch_size=1, stdout=out)
+        self.assertIn('1 mismatched (rebuilt)', out.getvalue())
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.placements[-1], [_course(302).id, 2024 * 4 + 1])
+        self.assertEqual(self.schedule.credits, 12)
+        call_command('check_placements', stdout=io.StringIO())
+        # progress is recomputed when a placed course's required flag changes
+        Course.objects.filter(course_number=301).update(required=True)
+        with self.assertRaises(CommandError):
+            call_command('check_placements', stdout=io.StringIO())
+        call_command('check_placements', fix=True, stdout=io.StringIO())
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.required_done, 3)
+
+    # moving an already-placed course updates its row in place
+    def test_upsert_keeps_row(self):
+        row_id = Course_Schedule.objects.get(schedule=self.schedule, course__course_number=300).id
+        response = self.patch({'300': {'year': 2024, 'qtr': 2}})
+        self.assertEqual(response.status_code, 200)
+        moved = Course_Schedule.objects.get(schedule=self.schedule, course__course_number=300)
+        self.assertEqual((moved.id, moved.qtr), (row_id, 2))
+
+    # schedules placing a deleted (or no longer planned) course still load and save
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_removed_course(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _course(300).delete()
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.placements, [[_course(301).id, 2024 * 4]])
+        # a subject change leaves the document listing a course the catalog drops
+        Course.objects.filter(course_number=301).update(subject='MTH')
+        CatalogUtils.bump_catalog_version()
+        self.assertEqual(self.client.get('/schedules/' + str(self.schedule.id)).status_code, 200)
+        self.assertEqual(self.patch({'302': {'year': 2024, 'qtr': 1}}).status_code, 200)
+
+
+class TestCopySchedule(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _create_courses(range(300, 320))
+        cls.user, cls.small = _create_schedule(name='Small')
+        cls.other = User.objects.create_user(username='other', password='pw')
+        cls.large = Schedule.objects.create(user=cls.user, name='Large', start_qtr=0,
+                                            end_qtr=3, start_year=2024, end_year=2028)
+        Course_Schedule.objects.create(schedule=cls.small, course=_course(300), year=2024, qtr=0)
+        for i, num in enumerate(range(300, 320)):
+            Course_Schedule.objects.create(schedule=cls.large, course=_course(num),
+                                           year=2024 + i // 4, qtr=i % 4)
+        ScheduleUtils.rebuild_placements([cls.small.id, cls.large.id])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def copy(self, schedule):
+        return self.client.post('/schedules/' + str(schedule.id) + '/copy')
+
+    def rows(self, sched_id):
+        return sorted(Course_Schedule.objects.filter(schedule_id=sched_id)
+                      .values_list('course_id', 'year', 'qtr'))
+
+    # copies hold the same placements and aggregates, under a new name
+    def test_copy(self):
+        response = self.copy(self.large)
+        self.assertEqual(response.status_code, 200)
+        copied = Schedule.objects.get(id=response.json()['schedule'])
+        self.assertEqual(copied.name, 'Copy of Large')
+        self.assertEqual(self.rows(copied.id), self.rows(self.large.id))
+        source = Schedule.objects.get(id=self.large.id)
+        self.assertEqual((copied.placements, copied.courses, copied.credits, copied.end_year),
+                         (source.placements, 20, 80, 2028))
+
+    # copying runs the same queries however many courses are placed
+    def test_copy_queries(self):
+        counts = []
+        for schedule in (self.small, self.large):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.copy(schedule).status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    # the schedule limit applies, and only the owner's schedules can be copied
+    def test_copy_limits(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self.copy(self.small).status_code, 404)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/schedules/' + str(self.small.id) + '/copy').status_code,
+                         405)
+        for _ in range(views.MAX_USER_SCHEDULES - 2):
+            self.assertEqual(self.copy(self.small).status_code, 200)
+        self.assertEqual(self.copy(self.small).status_code, 403)
+        self.assertEqual(Schedule.objects.filter(user=self.user).count(),
+                         views.MAX_USER_SCHEDULES)
+
+    # creates take the same lock on the user's row as copies, sharing one limit
+    def test_create_locks_user(self):
+        for _ in range(views.MAX_USER_SCHEDULES - 3):
+            self.assertEqual(self.copy(self.small).status_code, 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.post('/schedules').status_code, 200)
+        if connection.features.has_select_for_update:
+            self.assertTrue([q for q in queries.captured_queries
+                             if User._meta.db_table in q['sql'] and 'FOR UPDATE' in q['sql']])
+        self.assertEqual(self.client.post('/schedules').status_code, 403)
+        self.assertEqual(self.copy(self.small).status_code, 403)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestScheduleSummaries(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _create_courses(range(300, 303), required=True)
+        cls.user, cls.schedule = _create_schedule()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.path = '/schedules/' + str(self.schedule.id)
+
+    def summaries(self):
+        return ScheduleUtils.get_schedule_summaries(self.user)
+
+    # summaries are read once, then served from the cache
+    def test_summaries_cached(self):
+        with self.assertNumQueries(1):
+            self.summaries()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summaries(),
+                             [(self.schedule.id, 'My new schedule', 0, 0, 0)])
+
+    # renames, placement changes, creates and deletes refresh the summaries
+    def test_summaries_invalidated(self):
+        self.summaries()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.path, {'title': 'Renamed'})
+        self.assertEqual(self.summaries()[0].name, 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.path, {'courses': {'300': {'year': 2024, 'qtr': 1}},
+                                          'dates': {'start': {}, 'end': {}}},
+                              content_type='application/json')
+        self.assertEqual(self.summaries()[0][2:], (1, 4, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/schedules').json()['schedule']
+        self.assertEqual([summary.id for summary in self.summaries()],
+                         [self.schedule.id, created])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/schedules/' + str(created))
+        self.assertEqual(len(self.summaries()), 1)
+
+    # saves that leave summarized fields unchanged (dates, moves) keep summaries cached
+    def test_date_changes_keep_summaries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.path, {'courses': {'300': {'year': 2024, 'qtr': 1}},
+                                          'dates': {'start': {}, 'end': {}}},
+                              content_type='application/json')
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(self.path, {
+                'courses': {'300': {'year': 2024, 'qtr': 2}},
+                'dates': {'start': {}, 'end': {'year': 2025, 'qtr': 3}}},
+                content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [])
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.term_credits, [[2024 * 4 + 2, 4]])
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestCatalogDocument(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        Course.objects.create(course_number=162, title='Intro II', qtrs=[0, 1, 3], required=True)
+        Prereq.objects.create(course=_course(162), prereq=_course(161))
+
+    # page references catalog by hash instead of inlining it
+    def test_page_references_hash(self):
+        digest = CatalogUtils.get_catalog().digest
+        response = self.client.get('/')
+        self.assertContains(response, '/catalog/' + digest + '.json')
+        self.assertNotContains(response, 'qtr_masks =')
+
+    # document is served (gzipped if accepted) with immutable caching
+    def test_catalog_document(self):
+        digest = CatalogUtils.get_catalog().digest
+        response = self.client.get('/catalog/' + digest + '.json')
+        self.assertEqual(response.json(), {'prereqs': {'161': [], '162': [161]},
+                                           'qtr_masks': {'161': 0b1111, '162': 0b1011}})
+        self.assertIn('immutable', response['Cache-Control'])
+        response = self.client.get('/catalog/' + digest + '.json', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    # outdated hashes redirect to the current document
+    def test_stale_hash_redirects(self):
+        digest = CatalogUtils.get_catalog().digest
+        response = self.client.get('/catalog/0123456789abcdef0123.json')
+        self.assertRedirects(response, '/catalog/' + digest + '.json')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestDemoPageCache(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+
+    # repeat visits are served from the cached rendering
+    def test_demo_page_cached(self):
+        first = self.client.get('/')
+        with self.assertNumQueries(1):
+            second = self.client.get('/')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('Last-Modified', second)
+
+    # conditional GETs get a 304 while the catalog is unchanged
+    def test_demo_page_not_modified(self):
+        etag = self.client.get('/')['ETag']
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    # a catalog change re-renders the page under a new ETag
+    def test_demo_page_invalidated(self):
+        etag = self.client.get('/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(course_number=162, title='Intro II', qtrs=[0], required=True)
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Intro II')
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'castor.cache.TieredCache', 'LOCATION': 'shared',
+                'OPTIONS': {'MAX_ENTRIES': 2, 'SYNC_INTERVAL': 60}},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+               'LOCATION': 'tiered-test'}})
+class TestTieredCache(TestCase):
+    def setUp(self):
+        tiered_cache._local_tiers.clear()
+        caches['shared'].clear()
+
+    # reads are served locally until another process's write deletes the key's stamp
+    def test_local_reads(self):
+        cache.set('version', 1)
+        self.assertEqual(cache.get('version'), 1)
+        caches['shared'].set('version', 2)
+        self.assertEqual(cache.get('version'), 1)
+        cache._tier.synced_at = float('-inf')
+        self.assertEqual(cache.get('version'), 1)
+        caches['shared'].delete(tiered_cache.STAMP_PREFIX + cache.make_key('version'))
+        self.assertEqual(cache.get('version'), 1)
+        cache._tier.synced_at = float('-inf')
+        self.assertEqual(cache.get('version'), 2)
+        # this process's writes are seen right away
+        cache.set('version', 3)
+        self.assertEqual(cache.get('version'), 3)
+
+    # writes to one key leave other keys' local copies in place
+    def test_per_key_invalidation(self):
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get_many(['a', 'b'])
+        cache.set('b', 3)
+        caches['shared'].set('a', 'stale')
+        cache._tier.synced_at = float('-inf')
+        self.assertEqual(cache.get_many(['a', 'b']), {'a': 1, 'b': 3})
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 3)
+
+    # a key deleted between being read and its stamp being added is not kept
+    def test_delete_during_fill(self):
+        shared = caches['shared']
+        shared.set('version', 1)
+        add = shared.add
+
+        def add_after_delete(*args, **kwargs):
+            # another process deletes the key (and its stamp, which is not there yet)
+            shared.delete('version')
+            return add(*args, **kwargs)
+        with patch.object(shared, 'add', add_after_delete):
+            self.assertEqual(cache.get('version'), None)
+        self.assertFalse(cache._tier.entries)
+        self.assertIsNone(cache.get('version'))
+
+    # the local tier keeps the most recently used MAX_ENTRIES entries
+    def test_local_eviction(self):
+        cache.set_many({'a': 1, 'b': 2, 'c': 3})
+        cache.get('a')
+        cache.get('b')
+        cache.get('a')
+        cache.get('c')
+        self.assertEqual(list(cache._tier.entries), [cache.make_key('a'), cache.make_key('c')])
+        self.assertEqual(cache.get_many(['a', 'b', 'c', 'd']), {'a': 1, 'b': 2, 'c': 3})
+
+    # local copies are dropped after LOCAL_TIMEOUT seconds
+    def test_local_timeout(self):
+        cache.set('version', 1)
+        with patch.object(cache, '_local_timeout', 0):
+            cache.get('version')
+        caches['shared'].set('version', 2)
+        self.assertEqual(cache.get('version'), 2)
+
+    # discarded local copies are read again from the shared tier
+    def test_discard_local(self):
+        cache.set_many({'a': 1, 'b': 2})
+        cache.get_many(['a', 'b'])
+        caches['shared'].set_many({'a': 'shared', 'b': 'shared'})
+        cache.discard_local(['a'])
+        self.assertEqual(cache.get_many(['a', 'b']), {'a': 'shared', 'b': 2})
+
+    # inside a transaction (as in every TestCase) a DatabaseCache is read directly
+    @override_settings(CACHES=settings.CACHES)
+    def test_transaction_bypass(self):
+        cache.set('version', 1)
+        self.assertEqual(cache.get('version'), 1)
+        self.assertFalse(cache._tier.entries)
+        with self.assertNumQueries(1):
+            cache.get('version')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class TestSessionStorage(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.schedule = _create_schedule()
+
+    # cached sessions are read without touching the session table
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_sessions(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/schedules/' + str(self.schedule.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if 'django_session' in query['sql']])
+
+    # expired sessions are deleted batch by batch, and live ones kept
+    def test_prune_sessions(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key='expired' + str(i), session_data='',
+                     expire_date=now - datetime.timedelta(days=1)) for i in range(5)] +
+            [Session(session_key='live', session_data='',
+                     expire_date=now + datetime.timedelta(days=1))])
+        out = io.StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+        self.assertIn('Deleted 5 expired sessions', out.getvalue())
+
+
+class TestPlacementValidation(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        Course.objects.create(course_number=162, title='Intro II', qtrs=[0, 1, 3], required=True)
+        Course.objects.create(course_number=261, title='Data Structures', qtrs=[0, 3], required=True)
+        Prereq.objects.create(course=_course(162), prereq=_course(161))
+        Prereq.objects.create(course=_course(261), prereq=_course(161))
+        Prereq.objects.create(course=_course(261), prereq=_course(162))
+        cls.user, cls.schedule = _create_schedule()
+
+    def setUp(self):
+        self.rules = ValidationUtils.get_rules(CatalogUtils.get_catalog())
+
+    def validate(self, placements):
+        return ValidationUtils.validate_schedule(self.rules, placements, (2024, 0), (2024, 3))
+
+    # bitsets mirror the catalog's prereqs and quarters offered
+    def test_rules(self):
+        self.assertEqual(self.rules.courses_in(self.rules.prereq_masks[261]), [161, 162])
+        self.assertEqual(self.rules.qtr_masks[162], 0b1011)
+
+    # prereqs in earlier terms and offered quarters pass
+    def test_valid_schedule(self):
+        self.assertEqual(self.validate({161: (2024, 0), 162: (2024, 1), 261: (2024, 3)}), {})
+
+    # each kind of violation is reported per course
+    def test_violations(self):
+        violations = self.validate({161: (2024, 1), 162: (2024, 1), 261: (2025, 2)})
+        self.assertEqual(violations, {162: {'missing_prereqs': [161]},
+                                      261: {'not_offered': True, 'out_of_range': True}})
+
+    # PATCH rejects invalid placements, reporting why
+    def test_patch_rejected(self):
+        self.client.force_login(self.user)
+        body = {'courses': {'162': {'year': 2024, 'qtr': 2}},
+                'dates': {'start': {}, 'end': {}}}
+        response = self.client.patch('/schedules/' + str(self.schedule.id), body,
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['violations'],
+                         {'162': {'not_offered': True, 'missing_prereqs': [161]}})
+        self.assertFalse(Course_Schedule.objects.filter(schedule=self.schedule).exists())
+
+    # terms a scraped catalog listed use that year's offerings, others the usual quarters
+    def test_listed_offerings(self):
+        revision = CatalogRevision.objects.create(digest='0' * 64, terms=[2024 * 4 + 3])
+        with self.captureOnCommitCallbacks(execute=True):
+            Offering.objects.create(course=_course(161), year=2024, qtr=3, revision=revision)
+        self.rules = ValidationUtils.get_rules(CatalogUtils.get_catalog())
+        self.assertTrue(self.rules.is_offered(161, 2024, 3))
+        self.assertFalse(self.rules.is_offered(261, 2024, 3))
+        self.assertTrue(self.rules.is_offered(261, 2025, 3))
+        self.assertEqual(self.validate({161: (2024, 0), 162: (2024, 1), 261: (2024, 3)}),
+                         {261: {'not_offered': True}})
+
+
+class TestScheduleGenerator(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        Course.objects.create(course_number=162, title='Intro II', qtrs=[0, 1, 3], required=True)
+        Course.objects.create(course_number=261, title='Data Structures', qtrs=[0, 3], required=True)
+        Prereq.objects.create(course=_course(162), prereq=_course(161))
+        Prereq.objects.create(course=_course(261), prereq=_course(162))
+        for num in range(400, 412):
+            Course.objects.create(course_number=num, title='Elective ' + str(num), qtrs=[0, 1, 2, 3])
+        Prereq.objects.create(course=_course(411), prereq=_course(261))
+        cls.user, cls.schedule = _create_schedule()
+        Course_Schedule.objects.create(schedule=cls.schedule, course=_course(261), year=2024, qtr=0)
+        ScheduleUtils.rebuild_placements([cls.schedule.id])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.catalog = CatalogUtils.get_catalog()
+
+    def generate(self, body=None):
+        return self.client.post('/schedules/' + str(self.schedule.id) + '/generate', body or {},
+                                content_type='application/json')
+
+    # the plan is as short as credits and the prereq chain allow
+    def test_shortest_plan(self):
+        plan = GeneratorUtils.generate_plan(self.catalog, 2024, 0, 12)
+        self.assertTrue(plan.optimal)
+        self.assertEqual(len(plan.terms), 5)
+        self.assertEqual(plan.credits, 60)
+        self.assertIs(GeneratorUtils.generate_plan(self.catalog, 2024, 0, 12), plan)
+        # 161 -> 162 -> 261 -> 411 takes five terms (261 isn't offered in Summer)
+        # even when four terms would hold 60 credits
+        self.assertEqual(len(GeneratorUtils.generate_plan(self.catalog, 2024, 0, 16).terms), 5)
+        self.assertEqual(len(GeneratorUtils.generate_plan(self.catalog, 2024, 1, 8).terms), 8)
+
+    # terms a scraped catalog listed only take the courses offered that year
+    def test_listed_offerings(self):
+        revision = CatalogRevision.objects.create(digest='0' * 64, terms=[2024 * 4 + 3])
+        with self.captureOnCommitCallbacks(execute=True):
+            Offering.objects.create(course=_course(161), year=2024, qtr=3, revision=revision)
+        self.catalog = CatalogUtils.get_catalog()
+        # nothing else is offered in Fall 2024, so 261 waits for Winter 2025
+        plan = GeneratorUtils.generate_plan(self.catalog, 2024, 0, 12)
+        self.assertEqual(len(plan.terms), 6)
+        self.assertEqual(plan.terms[3], ())
+        self.assertIn(261, plan.terms[4])
+        # starting after the listed terms, the usual quarters apply
+        self.assertEqual(len(GeneratorUtils.generate_plan(self.catalog, 2025, 0, 12).terms), 5)
+        state = self.generate()
+        self.assertEqual(state.json()['violations'], {})
+
+    # generated plans replace the schedule's contents and pass validation
+    def test_generate_endpoint(self):
+        response = self.generate()
+        self.assertEqual(response.status_code, 200)
+        state = response.json()
+        self.assertEqual((state['credits'], state['violations'], state['optimal']), (60, {}, True))
+        self.assertEqual(state['dates']['end'], {'year': 2025, 'qtr': 0})
+        self.assertEqual(Course_Schedule.objects.filter(schedule=self.schedule).count(), 15)
+        self.assertEqual(Course_Schedule.objects.get(schedule=self.schedule, course__course_number=261).qtr, 3)
+
+    # plans start from the locked row's start term, not a stale copy's
+    def test_generate_locks_row(self):
+        stale = Schedule.objects.get(id=self.schedule.id)
+        Schedule.objects.filter(id=self.schedule.id).update(start_qtr=1)
+        with CaptureQueriesContext(connection) as queries:
+            state = ScheduleUtils.generate_schedule(stale, 12)
+        if connection.features.has_select_for_update:
+            self.assertTrue([q for q in queries.captured_queries if 'FOR UPDATE' in q['sql']])
+        self.assertEqual(state['dates']['start'], {'year': 2024, 'qtr': 1})
+        self.assertFalse(state['violations'])
+        self.schedule.refresh_from_db()
+        self.assertEqual(self.schedule.placements, stale.placements)
+
+    # impossible requests leave the schedule untouched
+    def test_generate_rejected(self):
+        self.assertEqual(self.generate({'max_credits': 40}).status_code, 400)
+        self.assertEqual(self.generate({'max_credits': 'many'}).status_code, 400)
+        Course.objects.filter(course_number__gte=404).delete()
+        CatalogUtils.bump_catalog_version()
+        response = self.generate()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['msg'], 'Catalog has too few credits to graduate')
+        self.assertEqual(list(Course_Schedule.objects.filter(schedule=self.schedule)
+                              .values_list('course__course_number', 'year', 'qtr')), [(261, 2024, 0)])
+
+
+class TestScheduleAnalytics(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        Course.objects.create(course_number=162, title='Intro II', qtrs=[0, 1, 3], required=True)
+        Course.objects.create(course_number=261, title='Data Structures', qtrs=[0, 3], required=True)
+        Course.objects.create(course_number=400, title='Summer Elective', qtrs=[2])
+        Course.objects.create(course_number=401, title='Retired Elective', qtrs=[])
+        Prereq.objects.create(course=_course(162), prereq=_course(161))
+        Prereq.objects.create(course=_course(261), prereq=_course(162))
+        Prereq.objects.create(course=_course(400), prereq=_course(261))
+        cls.user, cls.schedule = _create_schedule()
+        Course_Schedule.objects.create(schedule=cls.schedule, course=_course(161), year=2024, qtr=1)
+        ScheduleUtils.rebuild_placements([cls.schedule.id])
+
+    # order and quarter waits are precomputed with the catalog's rules
+    def test_rules(self):
+        rules = ValidationUtils.get_rules(CatalogUtils.get_catalog())
+        self.assertLess(rules.order.index(162), rules.order.index(261))
+        self.assertEqual(rules.qtr_waits[162], (0, 0, 1, 0))
+        self.assertEqual(rules.qtr_waits[401], (None, None, None, None))
+
+    # earliest terms follow placed prereqs and skip quarters not offered
+    def test_analytics_endpoint(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/schedules/' + str(self.schedule.id) + '/analytics')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['earliest'], {'162': {'year': 2024, 'qtr': 3},
+                                            '261': {'year': 2025, 'qtr': 0},
+                                            '400': {'year': 2025, 'qtr': 2},
+                                            '401': None})
+        self.assertEqual(data['completion'], {'year': 2025, 'qtr': 0})
+        self.assertEqual([(step['course'], step['placed']) for step in data['critical_path']],
+                         [(161, True), (162, False), (261, False)])
+
+    # terms a scraped catalog listed are skipped by courses not offered then
+    def test_listed_offerings(self):
+        revision = CatalogRevision.objects.create(digest='0' * 64, terms=[2024 * 4 + 3])
+        with self.captureOnCommitCallbacks(execute=True):
+            Offering.objects.create(course=_course(161), year=2024, qtr=3, revision=revision)
+        data = AnalyticsUtils.analyze_schedule(CatalogUtils.get_catalog(),
+                                               {161: (2024, 1)}, (2024, 0))
+        self.assertEqual(data['earliest'][162], {'year': 2025, 'qtr': 0})
+        self.assertEqual(data['earliest'][261], {'year': 2025, 'qtr': 3})
+        self.assertEqual(data['completion'], {'year': 2025, 'qtr': 3})
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+                   ROOT_URLCONF='planner.tests', PROFILING_SAMPLE_RATE=1.0)
+class TestAsyncViews(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        _create_courses((161, 162), required=True)
+        cls.user, cls.schedule = _create_schedule(name='Async plan')
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+        CatalogUtils.get_catalog()
+
+    # schedule pages and saves are served, and profiled, by the async views
+    async def test_display_and_patch(self):
+        path = '/schedules/' + str(self.schedule.id)
+        view_stats.clear()
+        response = await self.async_client.get(path)
+        self.assertContains(response, 'Async plan')
+        self.assertGreater(view_stats.report()['sched_router']['queries']['max'], 0)
+
+        body = {'courses': {'161': {'year': 2024, 'qtr': 1}},
+                'dates': {'start': {'year': None, 'qtr': None}, 'end': {'year': None, 'qtr': None}}}
+        response = await self.async_client.patch(path, body, content_type='application/json')
+        self.assertEqual(response.json()['courses'], {'161': {'year': 2024, 'qtr': 1}})
+        placed = await Course_Schedule.objects.filter(schedule=self.schedule).acount()
+        self.assertEqual(placed, 1)
+        response = await self.async_client.patch('/schedules/0', body,
+                                                 content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    # index redirects to the latest schedule; creation stops at the user's limit
+    async def test_index_and_create(self):
+        response = await self.async_client.get('/')
+        self.assertRedirects(response, '/schedules/' + str(self.schedule.id),
+                             fetch_redirect_response=False)
+        # the views' ORM calls (and on-commit callbacks) run in the sync thread
+        capture = self.captureOnCommitCallbacks(execute=True)
+        await sync_to_async(capture.__enter__)()
+        for _ in range(views.MAX_USER_SCHEDULES - 1):
+            response = await self.async_client.post('/schedules')
+            self.assertEqual(response.status_code, 200)
+        await sync_to_async(capture.__exit__)(None, None, None)
+        response = await self.async_client.post('/schedules')
+        self.assertEqual(response.status_code, 403)
+        latest = await Schedule.objects.filter(user=self.user).alast()
+        response = await self.async_client.get('/')
+        self.assertEqual(response['Location'], '/schedules/' + str(latest.id))
+
+    # logged-out visitors get the demo page, and are sent to log in elsewhere
+    async def test_logged_out(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get('/')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/schedules/' + str(self.schedule.id))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith('/accounts/login/'))
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+                   PROFILING_SAMPLE_RATE=1.0)
+class TestProfilingMiddleware(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Course.objects.create(course_number=161, title='Intro I', qtrs=[0, 1, 2, 3], required=True)
+        cls.user, cls.schedule = _create_schedule()
+        cls.admin, cls.admin_schedule = _create_schedule('admin')
+        cls.admin.is_staff = True
+        cls.admin.save()
+
+    def setUp(self):
+        view_stats.clear()
+
+    # sampled responses report where their time went, to staff only
+    def test_server_timing(self):
+        self.client.force_login(self.user)
+        response = self.client.get('/schedules/' + str(self.schedule.id))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(view_stats.report()['sched_router']['requests'], 1)
+        self.client.force_login(self.admin)
+        response = self.client.get('/schedules/' + str(self.admin_schedule.id))
+        timing = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timing), {'total', 'db', 'tpl', 'dup'})
+        self.assertNotEqual(timing['tpl'], 'dur=0.0')
+        self.assertRegex(timing['db'], r'desc="\d+ queries"')
+        with override_settings(PROFILING_SAMPLE_RATE=0):
+            self.assertNotIn('Server-Timing', self.client.get('/'))
+
+    # per-view statistics are only shown to staff
+    def test_profiling_report(self):
+        self.client.force_login(self.user)
+        self.client.get('/schedules/' + str(self.schedule.id))
+        self.client.get('/schedules/' + str(self.schedule.id))
+        self.assertEqual(self.client.get('/sG8muBDox7No4g/profiling').status_code, 302)
+        self.client.force_login(self.admin)
+        report = self.client.get('/sG8muBDox7No4g/profiling').json()
+        self.assertEqual(report['sched_router']['requests'], 2)
+        self.assertEqual(sum(count for _, count in report['sched_router']['histogram']), 2)
+
+
+class TestScrapeFixture(TestCase):
+    # recorded catalog JSON converts to postbac courses only
+    def test_build_scraped_courses(self):
+        with open(SCRAPE_FIXTURE) as f:
+            courses = ScrapeCommand._build_scraped_courses(json.load(f))
+        by_number = {course.course_number: course for course in courses}
+        self.assertEqual(len(courses), 29)
+        self.assertFalse({101, 151, 175, 295, 461, 519, 533} & set(by_number))
+        self.assertEqual(by_number[161].title, 'Introduction To Computer Science I')
+        self.assertEqual(by_number[406].credits, 1)
+        self.assertEqual(by_number[261].prereqs, [('CS', 162), ('CS', 225)])
+        self.assertEqual(by_number[225].prereqs, [('MTH', 111)])
+        self.assertEqual(by_number[225].key, ('CS', 225))
+        self.assertEqual(by_number[370].qtrs, [0, 2])
+        self.assertEqual(by_number[370].terms, [(2024, 0), (2024, 2)])
+
+    # course records stream out of a page however it is split into chunks
+    def test_streaming_extraction(self):
+        with open(SCRAPE_FIXTURE) as f:
+            scraped_data = json.load(f)
+        course_json = json.dumps(scraped_data, separators=(',', ':'))
+        page = '<html><!-- other --><body><!--\n' + course_json + '\n--></body></html>'
+        for size in (1, 7, 4096, len(page)):
+            chunks = [page[i:i + size] for i in range(0, len(page), size)]
+            self.assertEqual(''.join(scrape.iter_catalog_json(chunks)).strip(), course_json)
+            records = scrape.iter_course_records(scrape.iter_catalog_json(chunks))
+            self.assertEqual(list(records), scraped_data)
+
+        self.assertEqual(list(scrape.iter_catalog_json(['<html><!-- none --></html>'])), [])
+        with self.assertRaises(ValueError):
+            list(scrape.iter_course_records([course_json[:-500]]))
+
+
+def _catalog_page(records):
+    """Wraps course records in a catalog page, as eCampus serves them."""
+    return '<html><body><!--' + json.dumps(records, separators=(',', ':')) + '--></body></html>'
+
+
+def _mth_records():
+    """A one-course MTH catalog (MTH 111, a prereq of CS 225), from a fixture record."""
+    with open(SCRAPE_FIXTURE) as f:
+        record = json.load(f)[0]
+    sessions = record['Offerings']['CourseOffering']
+    sessions = [sessions] if isinstance(sessions, dict) else sessions
+    sessions = [{key: val for key, val in session.items() if key != 'Prereqs'}
+                for session in sessions]
+    for session in sessions:
+        session.update(SubjectCode='MTH', CourseNumber='111', Title='PRECALCULUS I')
+    return [dict(record, SubjectCode='MTH', CourseNumber='111', Title='PRECALCULUS I',
+                 Offerings={'CourseOffering': sessions})]
+
+
+def _create_catalog(courses, skip=()):
+    """Creates Course and Prereq rows for scraped courses, except those in skip."""
+    for course in courses:
+        if course.key not in skip:
+            Course.objects.create(subject=course.subject, course_number=course.course_number,
+                                  title=course.title, credits=course.credits, qtrs=course.qtrs)
+    for course in courses:
+        for prq_key in course.prereqs:
+            if course.key not in skip and prq_key not in skip:
+                Prereq.objects.create(course=_course(course.course_number, course.subject),
+                                      prereq=_course(prq_key[1], prq_key[0]))
+
+
+class _CatalogHandler(BaseHTTPRequestHandler):
+    """Stand-in eCampus server: serves each subject's page with an ETag, after any failures."""
+    def do_GET(self):
+        subject = self.path.rsplit('subject=', 1)[-1]
+        self.server.requests.append(dict(self.headers, subject=subject))
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = self.server.pages[subject].encode()
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@patch.object(scrape, 'BACKOFF_SECONDS', 0)
+class TestScrapeCaching(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with open(SCRAPE_FIXTURE) as f:
+            scraped_data = json.load(f)
+        cls.pages = {'CS': _catalog_page(scraped_data), 'MTH': _catalog_page(_mth_records())}
+        _create_catalog(ScrapeCommand._build_scraped_courses(_mth_records() + scraped_data))
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _CatalogHandler)
+        self.server.pages, self.server.requests, self.server.failures = self.pages, [], 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = 'http://127.0.0.1:' + str(self.server.server_port) + '/catalog?subject={subject}'
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.cache_dir)
+
+    def scrape(self, **options):
+        with self.assertLogs('planner.management.commands.scrape', 'INFO') as logs:
+            call_command('scrape', cache_dir=self.cache_dir, **options)
+        return logs.output[-1]
+
+    # an unchanged catalog is revalidated with its ETags and not reprocessed
+    def test_conditional_fetch(self):
+        self.assertIn('NO ISSUES FOUND', self.scrape(url=self.url))
+        self.assertEqual(sorted(request['subject'] for request in self.server.requests),
+                         ['CS', 'MTH'])
+        self.assertIn('PAGE UNCHANGED', self.scrape(url=self.url))
+        self.assertEqual([request.get('If-None-Match') for request in self.server.requests[2:]],
+                         ['"v1"', '"v1"'])
+        self.assertIn('NO ISSUES FOUND', self.scrape(url=self.url, force=True))
+
+    # each subject is only compared against DB courses in that subject
+    def test_subjects(self):
+        self.assertIn('NO ISSUES FOUND', self.scrape(url=self.url, subjects=['MTH']))
+        self.assertEqual([request['subject'] for request in self.server.requests], ['MTH'])
+        Course.objects.filter(subject='MTH').update(title='Precalculus (Old)')
+        self.assertIn('1 ISSUE(S) FOUND', self.scrape(url=self.url, force=True))
+
+    # transient server errors are retried
+    def test_retries(self):
+        self.server.failures = 2
+        self.assertIn('NO ISSUES FOUND', self.scrape(url=self.url, subjects=['CS']))
+        self.assertEqual(len(self.server.requests), 3)
+        self.server.failures = 5
+        with self.assertRaises(CommandError):
+            self.scrape(url=self.url, subjects=['CS'], retries=1)
+
+    # saved pages can be replayed without a server
+    def test_from_file(self):
+        paths = []
+        for subject, page in self.pages.items():
+            paths.append(os.path.join(self.cache_dir, subject + '.html'))
+            with open(paths[-1], 'w') as f:
+                f.write(page)
+        self.assertIn('NO ISSUES FOUND', self.scrape(from_file=paths))
+        self.assertIn('PAGE UNCHANGED', self.scrape(from_file=paths))
+        self.assertEqual(self.server.requests, [])
+
+
+class TestScrapeSync(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with open(SCRAPE_FIXTURE) as f:
+            scraped_data = json.load(f)
+        cls.page = _catalog_page(scraped_data)
+        # DB is the scraped catalog, with one course renamed, one missing and one stale
+        courses = ScrapeCommand._build_scraped_courses(_mth_records() + scraped_data)
+        _create_catalog(courses, skip={('CS', 492)})
+        Course.objects.filter(course_number=161).update(required=True)
+        Course.objects.filter(course_number=261).update(title='Data Structures (Old)')
+        Course.objects.create(course_number=199, title='Special Studies', credits=4, qtrs=[0])
+        Prereq.objects.filter(course=_course(261)).delete()
+        Prereq.objects.create(course=_course(261), prereq=_course(161))
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.cache_dir, 'page.html')
+        with open(self.path, 'w') as f:
+            f.write(self.page)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def scrape(self, **options):
+        out = io.StringIO()
+        with self.assertLogs('planner.management.commands.scrape', 'INFO') as logs:
+            call_command('scrape', from_file=[self.path], cache_dir=self.cache_dir,
+                         stdout=out, **options)
+        return json.loads(out.getvalue()) if out.getvalue() else logs.output[-1]
+
+    # dry runs report the full diff without writing anything
+    def test_dry_run(self):
+        report = self.scrape(dry_run=True)
+        self.assertFalse(report['applied'])
+        self.assertEqual([course['course_number'] for course in report['courses']['added']],
+                         [492])
+        self.assertEqual(report['courses']['removed'],
+                         [{'subject': 'CS', 'course_number': 199, 'title': 'Special Studies'}])
+        self.assertEqual(report['courses']['changed'], [{
+            'subject': 'CS', 'course_number': 261,
+            'title': {'db': 'Data Structures (Old)', 'scraped': 'Data Structures'}}])
+        self.assertEqual(report['prereqs']['added'],
+                         [[['CS', 261], ['CS', 162]], [['CS', 261], ['CS', 225]],
+                          [['CS', 492], ['CS', 344]], [['CS', 496], ['CS', 492]]])
+        self.assertEqual(report['prereqs']['removed'], [[['CS', 261], ['CS', 161]]])
+        self.assertEqual(report['prereqs']['unresolved'], [])
+        self.assertTrue(Course.objects.filter(course_number=199).exists())
+        self.assertIsInstance(self.scrape(dry_run=True), dict)
+
+    # prereqs in unscraped subjects are kept if the DB has them, and reported if not
+    def test_other_subjects(self):
+        _course(111, 'MTH').delete()
+        report = self.scrape(dry_run=True)
+        self.assertEqual(report['prereqs']['unresolved'], [[['CS', 225], ['MTH', 111]]])
+        self.assertNotIn('MTH', {course['subject'] for course in report['courses']['removed']})
+
+    # applying brings the DB in line with the catalog, in few queries
+    def test_apply(self):
+        version = CatalogUtils.get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(24):
+            report = self.scrape(apply=True)
+        self.assertTrue(report['applied'])
+        self.assertNotEqual(CatalogUtils.get_catalog_version(), version)
+        self.assertFalse(Course.objects.filter(course_number=199).exists())
+        self.assertEqual(Course.objects.get(course_number=261).title, 'Data Structures')
+        self.assertTrue(Course.objects.get(course_number=161).required)
+        self.assertEqual(ScrapeCommand._load_db_prereqs()[('CS', 261)],
+                         [('CS', 162), ('CS', 225)])
+        self.assertTrue(Prereq.objects.filter(course=_course(225),
+                                              prereq=_course(111, 'MTH')).exists())
+        self.assertIn('PAGE UNCHANGED', self.scrape(apply=True))
+
+        report = self.scrape(apply=True, force=True)
+        self.assertFalse(any(report['courses'].values()))
+        self.assertEqual(report['prereqs']['added'] + report['prereqs']['removed'], [])
+        self.assertEqual(report['offerings'], {'added': [], 'removed': []})
+
+    # schedules placing removed courses get their placements documents rebuilt
+    def test_apply_placements(self):
+        user, schedule = _create_schedule()
+        for num, qtr in ((199, 0), (261, 1)):
+            Course_Schedule.objects.create(schedule=schedule, course=_course(num), year=2024, qtr=qtr)
+        ScheduleUtils.rebuild_placements([schedule.id])
+        self.scrape(apply=True)
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.placements, [[_course(261).id, 2024 * 4 + 1]])
+        self.assertEqual(schedule.credits, 4)
+
+    # offerings are stored per term, once, under revisions shared by identical scrapes
+    def test_offering_history(self):
+        report = self.scrape(apply=True)
+        revision = CatalogRevision.objects.get()
+        self.assertEqual(report['revision'], revision.digest)
+        self.assertEqual(revision.terms, [2023 * 4 + 3, 2024 * 4, 2024 * 4 + 1, 2024 * 4 + 2])
+        self.assertEqual(sorted(Offering.objects.filter(course=_course(370))
+                                .values_list('year', 'qtr')), [(2024, 0), (2024, 2)])
+
+        # Withdrawn offerings are removed from listed terms, but kept in past ones
+        Offering.objects.create(course=_course(370), year=2024, qtr=1, revision=revision)
+        Offering.objects.create(course=_course(370), year=2022, qtr=1, revision=revision)
+        report = self.scrape(apply=True, force=True)
+        self.assertEqual(report['offerings'], {'added': [], 'removed': [['CS', 370, 2024, 1]]})
+        self.assertEqual(report['revision'], revision.digest)
+        self.assertEqual(CatalogRevision.objects.count(), 1)
+        self.assertEqual(sorted(Offering.objects.filter(course=_course(370))
+                                .values_list('year', 'qtr')), [(2022, 1), (2024, 0), (2024, 2)])
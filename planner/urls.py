@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Under ASGI, the schedule views are served by their async versions (see castor/asgi.py)
+schedule_views = async_views if settings.ASYNC_VIEWS else views
 
 urlpatterns = [
-    path('', views.index, name='index'),
-    path('schedules', views.create, name='create'),
-    path('schedules/<int:sched_id>', views.sched_router, name='sched_router'),
+    path('', schedule_views.index, name='index'),
+    path('schedules', schedule_views.create, name='create'),
+    path('schedules/<int:sched_id>', schedule_views.sched_router, name='sched_router'),
+    path('schedules/<int:sched_id>/copy', views.copy, name='copy'),
+    path('schedules/<int:sched_id>/generate', views.generate, name='generate'),
+    path('schedules/<int:sched_id>/analytics', views.analytics, name='analytics'),
+    path('catalog/<str:catalog_hash>.json', views.catalog, name='catalog'),
 ]
@@ -0,0 +1,85 @@
+from planner.utils import CatalogUtils, ValidationUtils
+
+
+def _to_term(term: int) -> dict:
+    """Converts an absolute term number (year * 4 + qtr) into a {'year', 'qtr'} dict.
+    """
+    year, qtr = divmod(term, 4)
+    return {'year': year, 'qtr': qtr}
+
+
+def analyze_schedule(catalog: CatalogUtils.CatalogSnapshot,
+                     placements: dict[int, tuple[int, int]], start: tuple[int, int]) -> dict:
+    """Finds the earliest legal term for each unscheduled course, and the
+    critical path to finishing every required course.
+
+    Courses are visited once, in the catalog's topological order (see
+    ValidationUtils.PlacementRules), so each unscheduled course's earliest
+    term is the latest of its prereqs' terms (placed, or earliest possible)
+    plus one, moved forward to the next term it is offered (see
+    ValidationUtils.PlacementRules.next_offered()). Credit limits
+    are ignored, so these are lower bounds.
+
+    Args:
+        catalog: current catalog snapshot
+        placements: dict mapping placed course numbers to (year, qtr) tuples
+        start: (year, qtr) of the schedule's first term
+
+    Returns:
+        dict of:
+            earliest: {course_number: {'year': int, 'qtr': int}, or None
+                       if the course can never be placed}, for unscheduled courses
+            completion: {'year': int, 'qtr': int} of the earliest term all
+                        required courses could be finished, or None
+            critical_path: [{'course': int, 'year': int, 'qtr': int, 'placed': bool}],
+                           the chain of prereqs that sets the completion term,
+                           ending at the last required course
+    """
+    rules = ValidationUtils.get_rules(catalog)
+    terms = {crs_num: year * 4 + qtr for crs_num, (year, qtr) in placements.items()}
+    start_term = start[0] * 4 + start[1]
+
+    # Earliest term per course, and the prereq that forced it that late
+    earliest = {}
+    binding = {}
+    for crs_num in rules.order:
+        if crs_num in terms:
+            continue
+        first = start_term
+        limiting = None
+        for prq_num in rules.prereqs[crs_num]:
+            prq_term = terms.get(prq_num, earliest.get(prq_num))
+            if prq_term is None:
+                first = None
+                break
+            if prq_term + 1 > first:
+                first, limiting = prq_term + 1, prq_num
+        offered = None if first is None else rules.next_offered(crs_num, first)
+        if offered is None:
+            continue
+        earliest[crs_num] = offered
+        binding[crs_num] = limiting
+
+    # The last required course to finish ends the critical path
+    finish = {course.course_number: terms.get(course.course_number,
+                                              earliest.get(course.course_number))
+              for course in catalog.required}
+    critical_path = []
+    completion = None
+    if finish and None not in finish.values():
+        crs_num = max(finish, key=lambda crs_num: (finish[crs_num], crs_num))
+        completion = _to_term(finish[crs_num])
+        # Walk back through limiting prereqs until reaching a placed course
+        while crs_num is not None:
+            placed = crs_num in terms
+            critical_path.append({'course': crs_num, 'placed': placed,
+                                  **_to_term(terms[crs_num] if placed else earliest[crs_num])})
+            crs_num = None if placed else binding[crs_num]
+        critical_path.reverse()
+
+    return {
+        'earliest': {crs_num: _to_term(earliest[crs_num]) if crs_num in earliest else None
+                     for crs_num in rules.numbers if crs_num not in terms},
+        'completion': completion,
+        'critical_path': critical_path,
+    }
@@ -0,0 +1,164 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from attrs import frozen
+from django.core.cache import cache
+from planner.models import Course, Offering, Prereq
+
+logger = logging.getLogger(__name__)
+
+# Cache key holding the current catalog version (shared by all workers)
+CATALOG_VERSION_KEY = 'planner:catalog_version'
+# Subject whose courses are planned in schedules (others are only prereqs)
+PLANNED_SUBJECT = 'CS'
+
+
+@frozen
+class CatalogSnapshot:
+    """Immutable in-memory copy of the course catalog.
+
+    Built from three queries (courses, prereq pairs and offerings), then
+    shared by every request served by this worker until the catalog
+    version changes.
+    Contents must be treated as read-only by callers.
+
+    Holds PLANNED_SUBJECT courses only, keyed by course number. Prereqs in
+    other subjects are assumed complete before a schedule starts, so they
+    are left out. Course ids (for writing placements) are on each Course.
+
+    The prereq/quarter data needed by client-side JS is also serialized
+    once per snapshot (plain and gzipped), and named by a hash of its
+    contents so browsers can cache it indefinitely.
+
+    Attributes:
+        version: catalog version this snapshot was built from
+        courses: tuple of all Course objects, in catalog order
+        by_number: dict mapping course numbers to Course objects
+        by_id: dict mapping Course ids to Course objects
+        prereqs: dict mapping course numbers to lists of prereq course numbers
+        qtr_masks: dict mapping course numbers to bitmasks of quarters offered
+        offered_terms: dict mapping course numbers to frozensets of the terms
+                       (year * 4 + qtr) scraped catalogs listed them in
+        listed_terms: frozenset of every term any scraped catalog listed
+        required: tuple of required Course objects
+        electives: tuple of elective Course objects
+        payload: JSON document of prereqs/qtr_masks, as bytes
+        payload_gz: gzip-compressed copy of payload
+        digest: content hash of payload, used in its URL
+    """
+    version: int
+    courses: tuple
+    by_number: dict
+    by_id: dict
+    prereqs: dict
+    qtr_masks: dict
+    offered_terms: dict
+    listed_terms: frozenset
+    required: tuple
+    electives: tuple
+    payload: bytes
+    payload_gz: bytes
+    digest: str
+
+    @classmethod
+    def build(cls, version: int) -> 'CatalogSnapshot':
+        """Loads the catalog from the DB and returns a new snapshot.
+
+        Args:
+            version: catalog version to stamp the snapshot with
+
+        Returns:
+            CatalogSnapshot holding current Course/Prereq contents
+        """
+        courses = tuple(Course.objects.filter(subject=PLANNED_SUBJECT))
+        by_number = {course.course_number: course for course in courses}
+        by_id = {course.id: course for course in courses}
+
+        # Prereqs in other subjects are not planned, so are dropped (without a join)
+        prereqs = {crs_num: [] for crs_num in by_number}
+        for crs_id, prq_id in Prereq.objects.values_list('course_id', 'prereq_id'):
+            if crs_id in by_id and prq_id in by_id:
+                prereqs[by_id[crs_id].course_number].append(by_id[prq_id].course_number)
+        for prq_nums in prereqs.values():
+            prq_nums.sort()
+        qtr_masks = {course.course_number: course.qtr_mask for course in courses}
+
+        offered_terms = {crs_num: set() for crs_num in by_number}
+        listed_terms = set()
+        for crs_id, year, qtr in Offering.objects.values_list('course_id', 'year', 'qtr'):
+            listed_terms.add(year * 4 + qtr)
+            if crs_id in by_id:
+                offered_terms[by_id[crs_id].course_number].add(year * 4 + qtr)
+
+        # Serialize client-side data once, compactly and deterministically
+        # (so unchanged catalogs keep the same hash across rebuilds)
+        payload = json.dumps({'prereqs': prereqs, 'qtr_masks': qtr_masks},
+                             separators=(',', ':'), sort_keys=True).encode()
+
+        return cls(
+            version=version,
+            courses=courses,
+            by_number=by_number,
+            by_id=by_id,
+            prereqs=prereqs,
+            qtr_masks=qtr_masks,
+            offered_terms={crs_num: frozenset(terms) for crs_num, terms in offered_terms.items()},
+            listed_terms=frozenset(listed_terms),
+            required=tuple(course for course in courses if course.required),
+            electives=tuple(course for course in courses if not course.required),
+            payload=payload,
+            payload_gz=gzip.compress(payload, mtime=0),
+            digest=hashlib.sha256(payload).hexdigest()[:20],
+        )
+
+
+# Snapshot shared by all requests in this worker process
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog_version() -> int:
+    """Returns the current catalog version, initializing it if unset.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # add() keeps the first value if several workers race here
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version() -> int:
+    """Marks every worker's catalog snapshot as stale.
+
+    Called whenever Course/Prereq rows change (see planner/signals.py).
+    Versions are nanosecond timestamps, so a bump never collides with an
+    older version even if the cache entry was evicted in between.
+
+    Returns:
+        the new catalog version
+    """
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    logger.info("Catalog version bumped to " + str(version))
+    return version
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Returns this worker's catalog snapshot, rebuilding it if stale.
+    """
+    global _snapshot
+    version = get_catalog_version()
+
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version:
+        with _snapshot_lock:
+            # Another thread may have rebuilt while we waited on the lock
+            if _snapshot is None or _snapshot.version != version:
+                _snapshot = CatalogSnapshot.build(version)
+            snapshot = _snapshot
+
+    return snapshot
@@ -0,0 +1,353 @@
+import logging
+import math
+import threading
+import time
+from attrs import frozen
+from planner.utils import CatalogUtils, ValidationUtils
+
+logger = logging.getLogger(__name__)
+
+# Credits needed to graduate from the postbac program
+GRADUATION_CREDITS = 60
+# Default and largest credit caps per term
+DEFAULT_TERM_CREDITS = 12
+MAX_TERM_CREDITS = 16
+# Longest plan (in terms) the generator will consider
+MAX_PLAN_TERMS = 32
+# Seconds spent improving on the greedy plan before returning the best found
+SEARCH_TIME_LIMIT = 0.05
+# Course sets tried per term, in priority order
+MAX_BRANCHES = 8
+# Number of generated plans kept per worker
+PLAN_CACHE_SIZE = 64
+
+
+class PlanError(ValueError):
+    """Raised when no plan can satisfy the catalog's rules."""
+    pass
+
+
+@frozen
+class Plan:
+    """A generated plan, relative to its starting term.
+
+    Attributes:
+        terms: tuple of course-number tuples, one per term from the start
+        credits: total credits in the plan
+        optimal: False if the search was cut short before proving
+                 that no plan with fewer terms exists
+    """
+    terms: tuple
+    credits: int
+    optimal: bool
+
+
+class _Search:
+    """Branch-and-bound search for the shortest plan from one starting term.
+
+    Terms are filled one at a time. Each term takes a maximal set of "key"
+    courses (unfinished required courses and their prereqs) that are
+    available and fit under the credit cap, then tops up with electives
+    only while more credits are needed. Taking an available course never
+    makes later terms harder, so non-maximal sets are never tried.
+
+    A greedy pass (highest-priority set every term) gives the first plan;
+    depth-first search then looks for shorter ones, pruning states whose
+    lower bound (see _lower_bound()) can't beat the best plan so far, and
+    (courses done, term) states already shown to need more terms.
+
+    Courses are only taken in terms they are offered (see
+    ValidationUtils.PlacementRules.is_offered()), so plans pass validation.
+    """
+
+    def __init__(self, catalog: CatalogUtils.CatalogSnapshot, start_term: int, max_credits: int):
+        self.rules = rules = ValidationUtils.get_rules(catalog)
+        self.start_term = start_term
+        self.max_credits = max_credits
+
+        self.credits = {crs_num: catalog.by_number[crs_num].credits for crs_num in rules.numbers}
+        self.prereqs = rules.prereqs
+        self.required = 0
+        for course in catalog.required:
+            self.required |= rules.bits[course.course_number]
+        self.required_courses = rules.courses_in(self.required)
+
+        # Transitive prereqs of each course, as bitsets
+        self.ancestors = {}
+        for crs_num in rules.order:
+            mask = rules.prereq_masks[crs_num]
+            for prq_num in self.prereqs[crs_num]:
+                mask |= self.ancestors[prq_num]
+            self.ancestors[crs_num] = mask
+
+        # Courses that could ever be placed (offered, fit the cap, prereqs placeable)
+        self.placeable = 0
+        for crs_num in rules.order:
+            if rules.next_offered(crs_num, start_term) is not None \
+                    and self.credits[crs_num] <= max_credits \
+                    and not rules.prereq_masks[crs_num] & ~self.placeable:
+                self.placeable |= rules.bits[crs_num]
+        self.order = [crs_num for crs_num in rules.order if rules.bits[crs_num] & self.placeable]
+
+        # Longest chain of courses depending on each course (itself included)
+        self.tail = {}
+        for crs_num in reversed(self.order):
+            self.tail[crs_num] = 1 + max(
+                (self.tail[dep_num] for dep_num in self.order
+                 if rules.prereq_masks[dep_num] & rules.bits[crs_num]), default=0)
+
+        # Key courses go in order of longest chain, then fewest quarters usually
+        # offered; electives only fill credits, so rarely-offered ones go first
+        offered_ct = {crs_num: bin(rules.qtr_masks[crs_num]).count('1') for crs_num in self.order}
+        self.priority = sorted(self.order, key=lambda crs_num:
+                               (-self.tail[crs_num], offered_ct[crs_num], crs_num))
+        self.fillers = sorted(self.order, key=lambda crs_num: (offered_ct[crs_num], crs_num))
+
+        self.failed = {}
+        self.exhaustive = True
+        self.deadline = None
+
+    def run(self) -> Plan:
+        """Finds the plan with the fewest terms (or the best found in time).
+        """
+        unplaceable = self.required & ~self.placeable
+        if unplaceable:
+            raise PlanError('Required courses cannot be scheduled: ' +
+                            ', '.join(str(crs_num) for crs_num in self.rules.courses_in(unplaceable)))
+        if sum(self.credits[crs_num] for crs_num in self.order) < GRADUATION_CREDITS:
+            raise PlanError('Catalog has too few credits to graduate')
+
+        best = self._greedy()
+        if best is None:
+            raise PlanError('No plan found within ' + str(MAX_PLAN_TERMS) + ' terms')
+
+        # Look for ever-shorter plans until none exists (or time runs out)
+        self.exhaustive = True
+        self.deadline = time.perf_counter() + SEARCH_TIME_LIMIT
+        while len(best) > self._lower_bound(0, 0, 0):
+            try:
+                terms = self._search(0, 0, 0, len(best) - 1)
+            except TimeoutError:
+                logger.info("Plan search timed out with a " + str(len(best)) + "-term plan")
+                return self._plan(best, False)
+            if terms is None:
+                break
+            best = terms
+
+        return self._plan(best, self.exhaustive)
+
+    def _plan(self, terms: list[int], optimal: bool) -> Plan:
+        """Converts a list of per-term bitsets into a Plan.
+        """
+        courses = tuple(tuple(self.rules.courses_in(mask)) for mask in terms)
+        credits = sum(self.credits[crs_num] for term in courses for crs_num in term)
+        return Plan(terms=courses, credits=credits, optimal=optimal)
+
+    def _key_mask(self, done: int) -> int:
+        """Bitset of unfinished required courses and the unfinished courses they depend on.
+        """
+        mask = 0
+        for crs_num in self.required_courses:
+            if not self.rules.bits[crs_num] & done:
+                mask |= self.rules.bits[crs_num] | self.ancestors[crs_num]
+        return mask & ~done
+
+    def _lower_bound(self, term: int, done: int, credits: int) -> int:
+        """Minimum number of terms (counted from the start) to finish, from a state.
+
+        Finds the earliest term each unfinished required course could be
+        taken (after its prereqs, in a quarter it is offered), then takes
+        the largest of: that term + 1 for any course; any such term plus
+        the terms needed to fit all courses that can't start before it;
+        and the terms needed to fit all remaining credits.
+        """
+        rules = self.rules
+        bits = rules.bits
+        key = self._key_mask(done)
+        remaining = self.required & ~done
+        if not remaining:
+            return term + math.ceil(max(0, GRADUATION_CREDITS - credits) / self.max_credits)
+
+        earliest = {}
+        starts = []
+        required_credits = 0
+        for crs_num in self.order:
+            if not bits[crs_num] & key:
+                continue
+            first = term
+            for prq_num in self.prereqs[crs_num]:
+                if not bits[prq_num] & done:
+                    first = max(first, earliest[prq_num] + 1)
+            # Step forward to the next term the course is offered
+            offered = rules.next_offered(crs_num, self.start_term + first)
+            if offered is None:
+                return MAX_PLAN_TERMS + 1
+            first = offered - self.start_term
+            earliest[crs_num] = first
+            if bits[crs_num] & remaining:
+                starts.append((first, self.credits[crs_num]))
+                required_credits += self.credits[crs_num]
+
+        bound = term + math.ceil(max(GRADUATION_CREDITS - credits, required_credits)
+                                 / self.max_credits)
+        later_credits = 0
+        for first, crs_credits in sorted(starts, reverse=True):
+            later_credits += crs_credits
+            bound = max(bound, first + math.ceil(later_credits / self.max_credits))
+
+        return bound
+
+    def _options(self, term: int, done: int, credits: int) -> list[tuple[int, int]]:
+        """Candidate sets of courses to take in a given term, best first.
+
+        Returns:
+            list of (course bitset, credits) tuples
+        """
+        rules = self.rules
+        bits = rules.bits
+        year, qtr = divmod(self.start_term + term, 4)
+        key = self._key_mask(done)
+
+        available = [crs_num for crs_num in self.priority
+                     if not bits[crs_num] & done
+                     and rules.is_offered(crs_num, year, qtr)
+                     and not rules.prereq_masks[crs_num] & ~done]
+        key_courses = [crs_num for crs_num in available if bits[crs_num] & key]
+
+        # Maximal sets of key courses that fit under the cap, higher priorities first
+        key_sets = []
+
+        def extend(i: int, mask: int, set_credits: int):
+            if len(key_sets) >= MAX_BRANCHES:
+                self.exhaustive = False
+                return
+            if i == len(key_courses):
+                room = self.max_credits - set_credits
+                if not any(self.credits[crs_num] <= room and not bits[crs_num] & mask
+                           for crs_num in key_courses):
+                    key_sets.append((mask, set_credits))
+                return
+            crs_num = key_courses[i]
+            if set_credits + self.credits[crs_num] <= self.max_credits:
+                extend(i + 1, mask | bits[crs_num], set_credits + self.credits[crs_num])
+            extend(i + 1, mask, set_credits)
+
+        extend(0, 0, 0)
+
+        # Top up each set with electives, only while more credits are needed
+        required_left = sum(self.credits[crs_num] for crs_num in self.required_courses
+                            if not bits[crs_num] & done)
+        options = []
+        for mask, set_credits in key_sets:
+            spare = GRADUATION_CREDITS - credits - required_left - \
+                sum(self.credits[crs_num] for crs_num in key_courses
+                    if bits[crs_num] & mask & ~self.required)
+            for crs_num in self.fillers:
+                if spare <= 0:
+                    break
+                if crs_num in available and not bits[crs_num] & (key | mask) \
+                        and set_credits + self.credits[crs_num] <= self.max_credits:
+                    mask |= bits[crs_num]
+                    set_credits += self.credits[crs_num]
+                    spare -= self.credits[crs_num]
+            if mask:
+                options.append((mask, set_credits))
+
+        return options
+
+    def _search(self, term: int, done: int, credits: int, limit: int) -> list[int] | None:
+        """Depth-first search for a plan finishing within 'limit' terms.
+
+        Returns:
+            list of per-term course bitsets, or None if no such plan exists
+
+        Raises:
+            TimeoutError: if SEARCH_TIME_LIMIT has passed
+        """
+        if not self.required & ~done and credits >= GRADUATION_CREDITS:
+            return []
+        if self._lower_bound(term, done, credits) > limit:
+            return None
+        state = (done, self._season(term))
+        if self.failed.get(state, -1) >= limit - term:
+            return None
+        if time.perf_counter() > self.deadline:
+            raise TimeoutError
+
+        options = self._options(term, done, credits)
+        for mask, set_credits in options:
+            rest = self._search(term + 1, done | mask, credits + set_credits, limit)
+            if rest is not None:
+                return [mask] + rest
+
+        # Nothing can be taken this quarter, so wait a term
+        if not options:
+            rest = self._search(term + 1, done, credits, limit)
+            if rest is not None:
+                return [0] + rest
+
+        self.failed[state] = max(self.failed.get(state, -1), limit - term)
+        return None
+
+    def _season(self, term: int) -> int:
+        """Identifies terms whose offerings (and all later ones') are the same.
+
+        Terms up to the last one a scraped catalog listed each have their own
+        offerings; after it, terms in the same quarter are alike.
+        """
+        term += self.start_term
+        return term if term <= self.rules.last_listed else -1 - term % 4
+
+    def _greedy(self) -> list[int] | None:
+        """Takes the highest-priority set of courses every term.
+        """
+        terms = []
+        done = credits = 0
+        while self.required & ~done or credits < GRADUATION_CREDITS:
+            if len(terms) >= MAX_PLAN_TERMS:
+                return None
+            options = self._options(len(terms), done, credits)
+            mask, set_credits = options[0] if options else (0, 0)
+            terms.append(mask)
+            done |= mask
+            credits += set_credits
+        return terms
+
+
+# Generated plans, keyed by (catalog version, start year, start quarter, credit cap)
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+def generate_plan(catalog: CatalogUtils.CatalogSnapshot, start_year: int, start_qtr: int,
+                  max_credits: int) -> Plan:
+    """Returns the shortest plan to graduation starting in a given term.
+
+    Plans depend only on the catalog, the starting term (whose year matters
+    where a scraped catalog listed offerings) and the credit cap, so they
+    are memoized per catalog version.
+
+    Args:
+        catalog: current catalog snapshot
+        start_year: year of the first term
+        start_qtr: quarter of the first term (Schedule.Quarter value)
+        max_credits: maximum credits per term
+
+    Returns:
+        Plan covering all required courses and GRADUATION_CREDITS credits
+
+    Raises:
+        PlanError: if the catalog's rules cannot be satisfied
+    """
+    key = (catalog.version, start_year, start_qtr, max_credits)
+    plan = _plans.get(key)
+    if plan is None:
+        plan = _Search(catalog, start_year * 4 + start_qtr, max_credits).run()
+        with _plans_lock:
+            # Drop plans for older catalog versions (and keep the cache bounded)
+            for old_key in [k for k in _plans if k[0] != catalog.version]:
+                del _plans[old_key]
+            if len(_plans) >= PLAN_CACHE_SIZE:
+                _plans.clear()
+            _plans[key] = plan
+    return plan
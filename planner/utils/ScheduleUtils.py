@@ -1,37 +1,48 @@
 
-from planner.models import Course, User, Schedule, Course_Schedule, Prereq
+from django.core.cache import cache
+from django.db import connection, transaction
+from planner.models import Course, User, Schedule, Course_Schedule
 from planner.forms import TitleForm
+from planner.utils import AnalyticsUtils, CatalogUtils, GeneratorUtils, ValidationUtils
 from datetime import datetime
-
-
-def _data_context_builder() -> tuple[dict, dict, dict]:
-    """ Used by new() and existing() to build context for rendering page.
-
-    Pulls live DB snapshot of course prereqs and quarters offered, for use 
-    by client-side JS. Also initializes an "indices" dict for tracking
-    where courses are placed in the schedule.
-
-    Returns:
-        prereqs:  dict mapping course numbers to lists of prereq course numbers
-        offered_qtrs: dict mapping course numbers to lists of quarters offered
-        indices:  dict mapping course numbers to where they are placed in schedule 
-                (initialized to -1, indicating unscheduled)
-
+from typing import NamedTuple
+
+# Schedules rebuilt per bulk UPDATE by rebuild_placements()
+REBUILD_BATCH_SIZE = 500
+# Cache key of a user's schedule summaries, by user ID (see get_schedule_summaries());
+# versioned, as cached rows from a different layout cannot be read
+SUMMARIES_KEY = 'schedule_summaries:v2:{}'
+# Seconds summaries stay cached for users who stop visiting
+SUMMARIES_TIMEOUT = 24 * 60 * 60
+# Schedule fields shown in summaries; saves of other fields keep them cached
+SUMMARY_FIELDS = frozenset(('name', 'courses', 'credits', 'required_done'))
+
+
+class Placement(NamedTuple):
+    """A course placed in a schedule term, as listed on schedule pages."""
+    course: Course
+    year: int
+    qtr: int
+
+
+class ScheduleSummary(NamedTuple):
+    """A user's schedule as listed in the sidebar."""
+    id: int
+    name: str
+    courses: int
+    credits: int
+    required_done: int
+
+
+class PlacementDocument(NamedTuple):
+    """A schedule's placements document and its aggregates, as stored in
+    the Schedule columns of the same names (see planner/models.py).
     """
-
-    # TODO: Combine into single dict
-    prereqs = {}
-    offered_qtrs = {}
-    indices = {}
-    for course in Course.objects.all():
-        crs_num = course.course_number
-
-        prereqs[crs_num] = [prereq.prereq.course_number for
-                            prereq in Prereq.objects.filter(course=course)]
-        offered_qtrs[crs_num] = course.qtrs
-        indices[crs_num] = -1
-
-    return prereqs, offered_qtrs, indices
+    placements: list[list[int]]
+    courses: int
+    credits: int
+    term_credits: list[list[int]]
+    required_done: int
 
 
 def get_context_demo() -> dict:
@@ -45,26 +56,26 @@ def get_context_demo() -> dict:
 
     Returns:
         dict containing all data needed to render course-planner HTML template,
-        including courses/prereqs and a default span of four quarters.
+        including courses and a default span of four quarters. Prereqs and
+    quarters offered are fetched by client-side JS from the catalog JSON
+    document named by "catalog_hash".
 
     """
     year = datetime.now().year
-    prereqs, offered_qtrs, indices = _data_context_builder()
+    catalog = CatalogUtils.get_catalog()
 
     context = {
         "sched_id": -1,
         "sched_name": "Demo Schedule",
-        "unsched_req": Course.objects.filter(required=True),
-        "unsched_elec": Course.objects.filter(required=False),
+        "unsched_req": catalog.required,
+        "unsched_elec": catalog.electives,
         "sched_qtrs": {
             (year, 0): [],
             (year, 1): [],
             (year, 2): [],
             (year, 3): []
         },
-        "prereqs": prereqs,
-        "offered_qtrs": offered_qtrs,
-        "indices": indices,
+        "catalog_hash": catalog.digest,
         "credits": 0
     }
 
@@ -76,33 +87,35 @@ def get_context_demo() -> dict:
 def get_context_existing(schedule: Schedule, user: User, sched_list: any) -> dict:
     """Loads an existing schedule from DB, along with rendering context.
 
-    Called by planner/views.py/display().
+    Called by planner/views.py/display(). Runs no queries: placements are
+    read from the schedule's row, and courses from the catalog snapshot.
 
     Args:
         schedule: DB Schedule object to be loaded
         user: DB User object who owns the schedule
-        sched_list: DB QuerySet of schedules owned by the user
+        sched_list: summaries of the user's schedules (see get_schedule_summaries())
 
     Returns:
         dict containing schedule's current state and all context
         needed to render course-planner HTML template.
 
     """
-    # Pull all courses, separated into scheduled and unscheduled
-    # (Only scheduled courses are associated with the schedule in the DB)
-    sched_courses = Course_Schedule.objects.filter(
-        schedule=schedule).order_by('course__course_number')
-    unsched_courses = Course.objects.all().exclude(
-        course_number__in=sched_courses.values('course'))
-
-    # Obtain dicts of course prereqs/quarters offered, initialize
-    # dict of course indices (for tracking where courses are placed)
-    prereqs, offered_qtrs, indices = _data_context_builder()
+    catalog = CatalogUtils.get_catalog()
+
+    # Bucket the schedule's placements (read from its row) by term, in course
+    # number order; tuple of (year, qtr) is used as key for each term.
+    # Courses no longer in the catalog are skipped (see _load_placements()).
+    placed_by_term = {}
+    placed_courses = set()
+    for placement in sorted((Placement(catalog.by_id[crs_id], *divmod(term, 4))
+                             for crs_id, term in schedule.placements if crs_id in catalog.by_id),
+                            key=lambda placement: placement.course.course_number):
+        placed_by_term.setdefault((placement.year, placement.qtr), []).append(placement)
+        placed_courses.add(placement.course.course_number)
 
     # Iterate over quarters of schedule from start to finish,
-    # appending courses which have been scheduled in each.
+    # collecting the courses which have been scheduled in each.
     sched_qtrs = {}
-    credits = 0
     qtr = schedule.start_qtr
     year = schedule.start_year
 
@@ -110,41 +123,65 @@ def get_context_existing(schedule: Schedule, user: User, sched_list: any) -> dic
         if year == schedule.end_year and qtr > schedule.end_qtr:
             break
 
-        # tuple of year_qtr is used as key for each term in schedule; value is an array
-        # of the scheduled courses. (Probably could stand a refactor, it's a bit much.)
-        sched_qtrs[(year, qtr)] = []
-        for course in sched_courses.filter(year=year, qtr=qtr):
-            credits += course.course.credits
-            sched_qtrs[(year, qtr)].append(course)
+        sched_qtrs[(year, qtr)] = placed_by_term.get((year, qtr), [])
 
         qtr = qtr + 1 if qtr < 3 else 0
         if qtr == 0:
             year += 1
 
+    # Credits shown are those placed within the schedule's dates
+    first_term = schedule.start_year * 4 + schedule.start_qtr
+    last_term = schedule.end_year * 4 + schedule.end_qtr
+    credits = sum(term_credits for term, term_credits in schedule.term_credits
+                  if first_term <= term <= last_term)
+
     # Create context dict and return
     context = {
         "user": user,
         "sched_list": sched_list,
         "sched_id": schedule.id,
         "sched_name": schedule.name,
-        "unsched_req": unsched_courses.filter(required=True),
-        "unsched_elec": unsched_courses.filter(required=False),
+        "unsched_req": [course for course in catalog.required
+                        if course.course_number not in placed_courses],
+        "unsched_elec": [course for course in catalog.electives
+                         if course.course_number not in placed_courses],
         "sched_qtrs": sched_qtrs,
-        "prereqs": prereqs,
-        "offered_qtrs": offered_qtrs,
-        "indices": indices,
+        "catalog_hash": catalog.digest,
         "credits": credits,
+        "required_total": len(catalog.required),
         "form": TitleForm(initial={'title': schedule.name})
     }
 
     return context
 
 
+def get_schedule_summaries(user: User) -> list[ScheduleSummary]:
+    """Returns summaries of a user's schedules, oldest first.
+
+    Read from the cache when possible, and otherwise with one query. Kept
+    until one of the user's schedules is created, deleted, renamed or has
+    its placements changed (see planner/signals.py).
+    """
+    key = SUMMARIES_KEY.format(user.id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Schedule.objects.filter(user=user).order_by('id').values_list(
+            'id', 'name', 'courses', 'credits', 'required_done'))
+        cache.set(key, rows, SUMMARIES_TIMEOUT)
+    return [ScheduleSummary(*row) for row in rows]
+
+
+def invalidate_schedule_summaries(user_ids: list[int]) -> None:
+    """Drops users' cached schedule summaries. Call once their changes are committed.
+    """
+    cache.delete_many([SUMMARIES_KEY.format(user_id) for user_id in user_ids])
+
+
 def new_schedule(user: User) -> Schedule:
     """Builds new schedule object owned by the provided User.
 
-    Called by planner/views.py/create(). Does not save schedule to DB;
-    this is handled in parent view.
+    Called by create_schedule() and planner/views.py/index(). Does not
+    save schedule to DB; this is handled by the caller.
 
     Args:
         user: a DB User object
@@ -166,62 +203,430 @@ def new_schedule(user: User) -> Schedule:
     return schedule
 
 
-def update_schedule(schedule: Schedule, courses: list[int], dates: dict[dict]) -> None:
+class ScheduleLimitError(Exception):
+    """Raised when a user already has as many schedules as allowed."""
+    pass
+
+
+def _check_schedule_limit(user: User, max_schedules: int) -> None:
+    """Locks the user's row and checks they have room for another schedule.
+
+    Must run inside a transaction; creates and copies each take the lock,
+    so concurrent ones cannot together pass the limit.
+
+    Raises:
+        ScheduleLimitError: if the user already has max_schedules schedules
+    """
+    list(User.objects.select_for_update().filter(id=user.id).values_list('id'))
+    if Schedule.objects.filter(user=user).count() >= max_schedules:
+        raise ScheduleLimitError('Maximum schedules reached')
+
+
+def create_schedule(user: User, max_schedules: int) -> Schedule:
+    """Saves a new, empty schedule (see new_schedule()) for a user.
+
+    Called by planner/views.py/create().
+
+    Args:
+        user: DB User object to own the schedule
+        max_schedules: most schedules the user may have, counting the new one
+
+    Returns:
+        the saved Schedule object
+
+    Raises:
+        ScheduleLimitError: if the user already has max_schedules schedules
+    """
+    with transaction.atomic():
+        _check_schedule_limit(user, max_schedules)
+        schedule = new_schedule(user)
+        schedule.save()
+    return schedule
+
+
+def copy_schedule(user: User, sched_id: int, max_schedules: int) -> Schedule:
+    """Copies one of a user's schedules, with all its placements.
+
+    Called by planner/views.py/copy(). Runs in one transaction, with the
+    same number of queries however many courses are placed: the Schedule
+    row (its placements document only holds course IDs and terms, so is
+    copied as is) is inserted from the source's, then its Course_Schedule
+    rows with a single INSERT ... SELECT.
+
+    Args:
+        user: DB User object owning the schedule
+        sched_id: ID of the schedule to copy
+        max_schedules: most schedules the user may have, counting the copy
+
+    Returns:
+        the new Schedule object, named after the source
+
+    Raises:
+        Schedule.DoesNotExist: if the user has no schedule with that ID
+        ScheduleLimitError: if the user already has max_schedules schedules
+    """
+    with transaction.atomic():
+        _check_schedule_limit(user, max_schedules)
+
+        # Lock the source too, so its rows match its document while they are copied
+        schedule = Schedule.objects.select_for_update().filter(user=user).get(id=sched_id)
+        source_id = schedule.id
+        schedule.pk = None
+        schedule._state.adding = True
+        schedule.name = ('Copy of ' + schedule.name)[:Schedule._meta.get_field('name').max_length]
+        schedule.save()
+
+        # Copy the placements in one statement (the ORM has no INSERT ... SELECT)
+        quote = connection.ops.quote_name
+        table = quote(Course_Schedule._meta.db_table)
+        schedule_col, *columns = [quote(Course_Schedule._meta.get_field(field).column)
+                                  for field in ('schedule', 'course', 'year', 'qtr')]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO ' + table + ' (' + ', '.join([schedule_col, *columns]) + ') ' +
+                'SELECT %s, ' + ', '.join(columns) + ' FROM ' + table +
+                ' WHERE ' + schedule_col + ' = %s', [schedule.id, source_id])
+
+    return schedule
+
+
+class ScheduleUpdateError(ValueError):
+    """Raised when a requested schedule update is malformed or refers to
+    courses/terms that do not exist. Nothing is written when raised.
+    """
+    pass
+
+
+def _parse_term(term: dict) -> tuple[int, int] | None:
+    """Converts a {'year', 'qtr'} dict from a PATCH request into a tuple.
+
+    Args:
+        term: dict with 'year' and 'qtr' values (ints, numeric strings, or null)
+
+    Returns:
+        (year, qtr) tuple of ints, or None if the term is unset
+
+    Raises:
+        ScheduleUpdateError: if the term is present but invalid
+    """
+    if not isinstance(term, dict):
+        raise ScheduleUpdateError('Invalid term: ' + str(term))
+    year, qtr = term.get('year'), term.get('qtr')
+    if year in (None, '', 'null') or qtr in (None, '', 'null'):
+        return None
+
+    try:
+        year, qtr = int(year), int(qtr)
+    except (TypeError, ValueError):
+        raise ScheduleUpdateError('Invalid term: ' + str(term))
+    if qtr not in Schedule.Quarter.values or not 0 < year < 10000:
+        raise ScheduleUpdateError('Invalid term: ' + str(term))
+
+    return year, qtr
+
+
+class ScheduleValidationError(ScheduleUpdateError):
+    """Raised when a requested update would place courses where catalog
+    rules do not allow them. Carries the offending courses' violations.
+    """
+    def __init__(self, violations: dict[int, dict]):
+        super().__init__('Invalid course placements: ' +
+                         ', '.join(str(crs_num) for crs_num in violations))
+        self.violations = violations
+
+
+def _load_placements(schedule: Schedule,
+                     catalog: CatalogUtils.CatalogSnapshot) -> dict[int, tuple[int, int]]:
+    """Returns a dict mapping each placed course number to its (year, qtr),
+    read from the schedule's placements document.
+
+    Courses the catalog snapshot does not hold (e.g. deleted, or moved out
+    of PLANNED_SUBJECT, before the document was rebuilt) are skipped.
+    """
+    return {catalog.by_id[crs_id].course_number: divmod(term, 4)
+            for crs_id, term in schedule.placements if crs_id in catalog.by_id}
+
+
+def _build_document(placed: list[tuple[int, int, int, bool]]) -> PlacementDocument:
+    """Builds a placements document from (course id, term, credits, required)
+    tuples, where term is year * 4 + qtr.
+    """
+    term_credits = {}
+    for _, term, credits, _ in placed:
+        term_credits[term] = term_credits.get(term, 0) + credits
+    return PlacementDocument(
+        placements=sorted([crs_id, term] for crs_id, term, _, _ in placed),
+        courses=len(placed),
+        credits=sum(term_credits.values()),
+        term_credits=sorted([term, credits] for term, credits in term_credits.items()),
+        required_done=sum(1 for *_, required in placed if required))
+
+
+def pack_placements(placements: dict[int, tuple[int, int]],
+                    catalog: CatalogUtils.CatalogSnapshot) -> PlacementDocument:
+    """Converts placements to a schedule's placements document.
+
+    Args:
+        placements: dict mapping course numbers to (year, qtr) tuples
+        catalog: catalog snapshot the course numbers are looked up in
+
+    Returns:
+        the document, with [[course id, year * 4 + qtr], ...] sorted by
+        course id as its placements
+    """
+    courses = [catalog.by_number[crs_num] for crs_num in placements]
+    return _build_document([(course.id, year * 4 + qtr, course.credits, course.required)
+                            for course, (year, qtr) in zip(courses, placements.values())])
+
+
+def set_placement_document(schedule: Schedule, document: PlacementDocument) -> None:
+    """Copies a placements document onto a Schedule object (without saving it).
+    """
+    for field, value in document._asdict().items():
+        setattr(schedule, field, value)
+
+
+def load_placement_documents(schedule_ids: list[int]) -> dict[int, PlacementDocument]:
+    """Builds schedules' placements documents from their Course_Schedule rows.
+
+    Called by rebuild_placements() and the check_placements command. Course
+    credits and required flags are read from the DB, not the catalog
+    snapshot, so documents reflect catalog changes not yet committed.
+
+    Args:
+        schedule_ids: IDs of the schedules to build documents for
+
+    Returns:
+        dict mapping each schedule ID to its document, as returned by
+        pack_placements(); schedules with no rows get an empty one
+    """
+    placed = {sched_id: [] for sched_id in schedule_ids}
+    for sched_id, crs_id, year, qtr, credits, required in Course_Schedule.objects.filter(
+            schedule_id__in=schedule_ids).values_list(
+                'schedule_id', 'course_id', 'year', 'qtr', 'course__credits', 'course__required'):
+        placed[sched_id].append((crs_id, year * 4 + qtr, credits, required))
+    return {sched_id: _build_document(rows) for sched_id, rows in placed.items()}
+
+
+def rebuild_placements(schedule_ids: list[int]) -> None:
+    """Rewrites schedules' placements documents from their Course_Schedule rows.
+
+    For code that writes Course_Schedule rows in bulk, or changes placed
+    courses (e.g. the scraper, when courses are deleted or their credits
+    change); ScheduleUtils' own writes keep documents up to date as they go.
+    """
+    save_placement_documents(load_placement_documents(schedule_ids))
+
+
+def save_placement_documents(documents: dict[int, PlacementDocument]) -> None:
+    """Writes placements documents (from load_placement_documents()) with bulk updates.
+    """
+    if not documents:
+        return
+    Schedule.objects.bulk_update(
+        [Schedule(id=sched_id, **document._asdict()) for sched_id, document in documents.items()],
+        list(PlacementDocument._fields), batch_size=REBUILD_BATCH_SIZE)
+    # Bulk updates send no signals, so drop the owners' summaries here
+    user_ids = list(Schedule.objects.filter(id__in=list(documents))
+                    .values_list('user_id', flat=True).distinct())
+    transaction.on_commit(lambda: invalidate_schedule_summaries(user_ids))
+
+
+def get_schedule_state(schedule: Schedule, placements: dict[int, tuple[int, int]] = None) -> dict:
+    """Returns the saved state of a schedule, for JSON responses.
+
+    Args:
+        schedule: Schedule object to be described
+        placements: the schedule's placements, if already loaded
+                    (dict mapping course numbers to (year, qtr) tuples)
+
+    Returns:
+        dict with schedule dates, placed courses, total credits and any
+        rule violations (see ValidationUtils.validate_schedule()):
+            {dates: {start: {'year': int, 'qtr': int}, end: {...}},
+             courses: {course_number: {'year': int, 'qtr': int}},
+             credits: int,
+             violations: {course_number: {...}}}
+    """
+    catalog = CatalogUtils.get_catalog()
+    if placements is None:
+        placements = _load_placements(schedule, catalog)
+
+    violations = ValidationUtils.validate_schedule(
+        ValidationUtils.get_rules(catalog), placements,
+        (schedule.start_year, schedule.start_qtr), (schedule.end_year, schedule.end_qtr))
+
+    return {
+        'dates': {'start': {'year': schedule.start_year, 'qtr': schedule.start_qtr},
+                  'end': {'year': schedule.end_year, 'qtr': schedule.end_qtr}},
+        'courses': {crs_num: {'year': year, 'qtr': qtr}
+                    for crs_num, (year, qtr) in placements.items()},
+        'credits': sum(catalog.by_number[crs_num].credits for crs_num in placements),
+        'violations': violations
+    }
+
+
+def get_schedule_analytics(schedule: Schedule) -> dict:
+    """Returns earliest legal terms for a schedule's unscheduled courses, and
+    its critical path to completing all required courses.
+
+    See AnalyticsUtils.analyze_schedule() for the returned structure.
+    """
+    catalog = CatalogUtils.get_catalog()
+    return AnalyticsUtils.analyze_schedule(catalog, _load_placements(schedule, catalog),
+                                           (schedule.start_year, schedule.start_qtr))
+
+
+def update_schedule(schedule: Schedule, courses: dict[str, dict], dates: dict[dict]) -> dict:
     """ Updates a schedule's contents in the database.
 
-    Called by planner/views.py/update_schedule(). Parses JSON data from
-    XHR PATCH request and modifies Course/Course_Schedule objects accordingly.
+    Called by planner/views.py/update_schedule(). Validates the full set of
+    changes from the XHR PATCH request, then applies them in one transaction:
+    a bulk delete of removed placements, a bulk upsert of added/moved ones,
+    and a single update of the schedule's dates and the parts of its
+    placements document (and aggregates) that changed.
     Only changes to previously saved schedule are included in request.
 
+    Added/moved courses must be validly placed (offered that quarter, after
+    their prereqs, within the schedule's dates). Other violations, e.g. a
+    course left behind when its prereq is unscheduled, are only reported.
+
     Args:
         schedule: Schedule object to be updated
-        courses: list of courses to be updated
+        courses: dict mapping course numbers to their new terms
+                 (a null year/qtr means the course is unscheduled)
         dates: dict representing schedule start/end dates
 
         dates structure:
             {start: {'year': int,'qtr': int },
                 end:   {'year': int,'qtr': int }}
-    """
 
-    # Update schedule start dates (if modified)
-    if dates['start']['year'] is not None and dates['start']['qtr'] is not None:
-        print(dates)
-        schedule.start_year = dates['start']['year']
-        schedule.start_qtr = dates['start']['qtr']
-
-    # Update schedule end dates (if modified)
-    if dates['end']['year'] is not None and dates['end']['qtr'] is not None:
-        print(dates)
-        schedule.end_year = dates['end']['year']
-        schedule.end_qtr = dates['end']['qtr']
-
-    # Save date changes to Schedule object in DB
-    schedule.save()
+    Returns:
+        the schedule's new state, as returned by get_schedule_state()
 
-    # Iterate over items in courses list, updating Course_Schedule objects
+    Raises:
+        ScheduleUpdateError: if any part of the change set is malformed
+        ScheduleValidationError: if an added/moved course is placed invalidly
+    """
+    catalog = CatalogUtils.get_catalog()
+
+    # Validate schedule start/end dates (either may be unmodified)
+    start = _parse_term(dates.get('start', {}))
+    end = _parse_term(dates.get('end', {}))
+    if start is not None:
+        schedule.start_year, schedule.start_qtr = start
+    if end is not None:
+        schedule.end_year, schedule.end_qtr = end
+    if (schedule.start_year, schedule.start_qtr) > (schedule.end_year, schedule.end_qtr):
+        raise ScheduleUpdateError('Schedule starts after it ends')
+
+    # Validate course changes, collecting removals and new placements
+    removed = []
+    placed = {}
     for crs_num, term in courses.items():
-        course = Course.objects.get(course_number=int(crs_num))
-
-        # If course is to be deleted
-        if not term['year'] or term['year'] == 'null':
-            # Pull existing course-schedule relationship and delete
-            try:
-                crs_sch = Course_Schedule.objects.get(
-                    schedule=schedule, course=course)
-                crs_sch.delete()
-            # If not yet saved, no problem; move on
-            except Course_Schedule.DoesNotExist:
-                continue
-
-        # Otherwise, course is to be added/moved
+        try:
+            crs_num = int(crs_num)
+        except ValueError:
+            raise ScheduleUpdateError('Invalid course: ' + str(crs_num))
+        if crs_num not in catalog.by_number:
+            raise ScheduleUpdateError('Unknown course: ' + str(crs_num))
+
+        new_term = _parse_term(term)
+        if new_term is None:
+            removed.append(crs_num)
         else:
-            try:
-                crs_sch = Course_Schedule.objects.get(
-                    schedule=schedule, course=course)
-            except Course_Schedule.DoesNotExist:
-                crs_sch = Course_Schedule(schedule=schedule, course=course)
-
-            # Update year/qtr as specified
-            crs_sch.year = term['year']
-            crs_sch.qtr = term['qtr']
-            crs_sch.save()
+            placed[crs_num] = new_term
+
+    # Apply all changes at once; any failure leaves the schedule untouched
+    with transaction.atomic():
+        # Lock the schedule's row, so concurrent saves each start from the other's result
+        saved = PlacementDocument(*Schedule.objects.select_for_update().values_list(
+            *PlacementDocument._fields).get(id=schedule.id))
+        set_placement_document(schedule, saved)
+
+        # Check the resulting schedule against catalog rules before writing
+        placements = _load_placements(schedule, catalog)
+        for crs_num in removed:
+            placements.pop(crs_num, None)
+        placements.update(placed)
+        state = get_schedule_state(schedule, placements)
+        rejected = {crs_num: errors for crs_num, errors in state['violations'].items()
+                    if crs_num in placed}
+        if rejected:
+            raise ScheduleValidationError(rejected)
+
+        if removed:
+            Course_Schedule.objects.filter(
+                schedule=schedule,
+                course_id__in=[catalog.by_number[crs_num].id for crs_num in removed]).delete()
+        if placed:
+            # Added and moved courses share one INSERT ... ON CONFLICT upsert
+            # (conflict target given by column, as Django 4.1 mis-resolves FK names)
+            Course_Schedule.objects.bulk_create(
+                [Course_Schedule(schedule=schedule, course_id=catalog.by_number[crs_num].id,
+                                 year=year, qtr=qtr)
+                 for crs_num, (year, qtr) in placed.items()],
+                update_conflicts=True,
+                unique_fields=['schedule_id', 'course_id'], update_fields=['year', 'qtr'])
+        # Only write the fields that changed (e.g. moves leave the course count
+        # and total credits as they were), so other saves keep summaries cached
+        document = pack_placements(placements, catalog)
+        set_placement_document(schedule, document)
+        schedule.save(update_fields=['start_year', 'start_qtr', 'end_year', 'end_qtr',
+                                     *(field for field, value in document._asdict().items()
+                                       if value != getattr(saved, field))])
+
+    return state
+
+
+def generate_schedule(schedule: Schedule, max_credits: int) -> dict:
+    """ Replaces a schedule's contents with a generated plan to graduation.
+
+    Called by planner/views.py/generate(). The plan starts in the schedule's
+    start term, takes all required courses and enough electives to
+    graduate, and uses as few terms as possible (see GeneratorUtils).
+    Existing placements are replaced in one transaction, holding a lock on
+    the schedule's row (as update_schedule() does): a bulk delete, a bulk
+    insert, and an update of the schedule's end date and placements.
+
+    Args:
+        schedule: Schedule object to be filled
+        max_credits: maximum credits to place in any one term
+
+    Returns:
+        the schedule's new state, as returned by get_schedule_state(),
+        plus whether the plan is known to be the shortest possible
+
+    Raises:
+        ScheduleUpdateError: if max_credits is out of range
+        GeneratorUtils.PlanError: if no plan satisfies the catalog's rules
+    """
+    if not 1 <= max_credits <= GeneratorUtils.MAX_TERM_CREDITS:
+        raise ScheduleUpdateError('Invalid credits per term: ' + str(max_credits))
+    catalog = CatalogUtils.get_catalog()
+
+    with transaction.atomic():
+        # Lock the schedule's row, so concurrent saves and generates apply one after
+        # the other, and plan from the start term as locked
+        schedule.start_year, schedule.start_qtr = Schedule.objects.select_for_update() \
+            .values_list('start_year', 'start_qtr').get(id=schedule.id)
+        plan = GeneratorUtils.generate_plan(catalog, schedule.start_year, schedule.start_qtr,
+                                            max_credits)
+
+        # Convert the plan's term offsets to years/quarters from the schedule's start
+        placements = {}
+        first_term = schedule.start_year * 4 + schedule.start_qtr
+        for offset, term in enumerate(plan.terms):
+            for crs_num in term:
+                placements[crs_num] = divmod(first_term + offset, 4)
+        schedule.end_year, schedule.end_qtr = divmod(first_term + len(plan.terms) - 1, 4)
+        set_placement_document(schedule, pack_placements(placements, catalog))
+
+        Course_Schedule.objects.filter(schedule=schedule).delete()
+        Course_Schedule.objects.bulk_create(
+            [Course_Schedule(schedule=schedule, course_id=catalog.by_number[crs_num].id,
+                             year=year, qtr=qtr)
+             for crs_num, (year, qtr) in placements.items()])
+        schedule.save(update_fields=['end_year', 'end_qtr', *PlacementDocument._fields])
+
+    return {**get_schedule_state(schedule, placements), 'optimal': plan.optimal}
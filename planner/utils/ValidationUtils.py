@@ -0,0 +1,194 @@
+import threading
+from attrs import frozen
+from planner.utils import CatalogUtils
+
+
+@frozen
+class PlacementRules:
+    """Prereq and quarter-offered rules for one catalog version, as bitsets.
+
+    Each course is assigned one bit; a course's prereqs are then a single
+    int mask, and the courses completed before a term are another, so
+    checking prereqs is one AND per course. Quarters offered are a 4-bit
+    mask (bit n set if offered in Schedule.Quarter n).
+
+    Terms that a scraped catalog listed are checked against the offerings
+    actually listed for that year (see is_offered()); the quarter masks
+    cover every other term.
+
+    Also holds what term-by-term walks over the prereq graph need: a
+    topological order, and how many terms each course is from being offered.
+
+    Attributes:
+        version: catalog version these rules were built from
+        numbers: tuple of course numbers, indexed by bit position
+        bits: dict mapping course numbers to their single-bit masks
+        prereq_masks: dict mapping course numbers to masks of their prereqs
+        qtr_masks: dict mapping course numbers to masks of quarters offered
+        offered_terms: dict mapping course numbers to frozensets of the terms
+                       (year * 4 + qtr) they were listed in
+        listed_terms: frozenset of every term a scraped catalog listed
+        last_listed: latest of listed_terms (-1 if none); offerings repeat
+                     the quarter masks every year after it
+        prereqs: dict mapping course numbers to tuples of prereq course numbers
+        order: tuple of course numbers, each after all of its prereqs
+               (courses in prereq cycles are left out)
+        qtr_waits: dict mapping course numbers to 4-tuples giving, for each
+                   quarter, the number of terms until the course is next
+                   offered (0 if offered that quarter, None if never offered)
+    """
+    version: int
+    numbers: tuple
+    bits: dict
+    prereq_masks: dict
+    qtr_masks: dict
+    offered_terms: dict
+    listed_terms: frozenset
+    last_listed: int
+    prereqs: dict
+    order: tuple
+    qtr_waits: dict
+
+    @classmethod
+    def from_catalog(cls, catalog: CatalogUtils.CatalogSnapshot) -> 'PlacementRules':
+        """Precomputes bitsets for every course in a catalog snapshot.
+        """
+        numbers = tuple(catalog.by_number)
+        bits = {crs_num: 1 << i for i, crs_num in enumerate(numbers)}
+
+        prereq_masks = {}
+        for crs_num in numbers:
+            mask = 0
+            for prq_num in catalog.prereqs[crs_num]:
+                mask |= bits[prq_num]
+            prereq_masks[crs_num] = mask
+        # Quarters offered are stored as masks already (see Course.qtr_mask)
+        qtr_masks = catalog.qtr_masks
+
+        # Topological order: repeatedly take courses whose prereqs are all taken
+        order = []
+        ordered = 0
+        pending = list(numbers)
+        while pending:
+            ready = [crs_num for crs_num in pending if not prereq_masks[crs_num] & ~ordered]
+            if not ready:
+                break
+            order.extend(ready)
+            for crs_num in ready:
+                ordered |= bits[crs_num]
+            pending = [crs_num for crs_num in pending if not bits[crs_num] & ordered]
+
+        qtr_waits = {}
+        for crs_num in numbers:
+            qtr_waits[crs_num] = tuple(
+                next((wait for wait in range(4) if qtr_masks[crs_num] >> ((qtr + wait) % 4) & 1),
+                     None)
+                for qtr in range(4))
+
+        return cls(version=catalog.version, numbers=numbers, bits=bits,
+                   prereq_masks=prereq_masks, qtr_masks=qtr_masks,
+                   offered_terms=catalog.offered_terms, listed_terms=catalog.listed_terms,
+                   last_listed=max(catalog.listed_terms, default=-1),
+                   prereqs={crs_num: tuple(catalog.prereqs[crs_num]) for crs_num in numbers},
+                   order=tuple(order), qtr_waits=qtr_waits)
+
+    def is_offered(self, crs_num: int, year: int, qtr: int) -> bool:
+        """Checks if a course is offered in a given term.
+
+        Uses the term's listed offerings if a scraped catalog listed it,
+        otherwise the quarters the course is usually offered in.
+        """
+        term = year * 4 + qtr
+        if term in self.listed_terms:
+            return term in self.offered_terms[crs_num]
+        return bool(self.qtr_masks[crs_num] >> qtr & 1)
+
+    def next_offered(self, crs_num: int, term: int) -> int | None:
+        """Finds the first term (year * 4 + qtr), from a given one on, in which
+        a course is offered (see is_offered()), or None if it never is again.
+        """
+        # Step through listed terms; after them, the quarter masks apply every year
+        while term <= self.last_listed:
+            if self.is_offered(crs_num, *divmod(term, 4)):
+                return term
+            term += 1
+        wait = self.qtr_waits[crs_num][term % 4]
+        return None if wait is None else term + wait
+
+    def courses_in(self, mask: int) -> list[int]:
+        """Converts a bitset back into a sorted list of course numbers.
+        """
+        courses = []
+        while mask:
+            low_bit = mask & -mask
+            courses.append(self.numbers[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return sorted(courses)
+
+
+# Rules for the current catalog version, shared by all requests in this worker
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def get_rules(catalog: CatalogUtils.CatalogSnapshot) -> PlacementRules:
+    """Returns placement rules for a catalog snapshot, building them once per version.
+    """
+    global _rules
+    rules = _rules
+    if rules is None or rules.version != catalog.version:
+        with _rules_lock:
+            if _rules is None or _rules.version != catalog.version:
+                _rules = PlacementRules.from_catalog(catalog)
+            rules = _rules
+    return rules
+
+
+def validate_schedule(rules: PlacementRules, placements: dict[int, tuple[int, int]],
+                      start: tuple[int, int], end: tuple[int, int]) -> dict[int, dict]:
+    """Checks every placement in a schedule against catalog rules.
+
+    A course is validly placed if it is offered in its term, all of its
+    prereqs are placed in earlier terms, and its term lies within the
+    schedule's start/end dates (the rules enforced by scripts_base.js,
+    except that it only knows the quarters each course is usually offered).
+
+    Args:
+        rules: PlacementRules for the current catalog
+        placements: dict mapping course numbers to (year, qtr) tuples
+        start: (year, qtr) of the schedule's first term
+        end: (year, qtr) of the schedule's last term
+
+    Returns:
+        dict mapping each invalidly placed course number to its violations:
+            {'not_offered': True,
+             'missing_prereqs': [course numbers not placed before it],
+             'out_of_range': True}
+        (only keys that apply are included; an empty dict means valid)
+    """
+    violations = {}
+    done_mask = 0
+    term_mask = 0
+    term = None
+
+    # Walk placements in term order, accumulating completed courses
+    for crs_num, (year, qtr) in sorted(placements.items(), key=lambda item: item[1]):
+        # Courses only count as completed for later terms, not their own
+        if (year, qtr) != term:
+            done_mask |= term_mask
+            term_mask = 0
+            term = (year, qtr)
+        term_mask |= rules.bits[crs_num]
+
+        errors = {}
+        if not rules.is_offered(crs_num, year, qtr):
+            errors['not_offered'] = True
+        missing = rules.prereq_masks[crs_num] & ~done_mask
+        if missing:
+            errors['missing_prereqs'] = rules.courses_in(missing)
+        if not start <= (year, qtr) <= end:
+            errors['out_of_range'] = True
+        if errors:
+            violations[crs_num] = errors
+
+    return violations
@@ -1,36 +1,108 @@
 import json
+import hashlib
 import logging
+from datetime import datetime, timezone
+from typing import NamedTuple
 from planner.utils import ScheduleUtils
 from django.shortcuts import HttpResponse, render, redirect
 from django.http import HttpRequest, JsonResponse, HttpResponseBadRequest,\
     HttpResponseServerError, HttpResponseNotAllowed
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods, require_safe
+from django.views.decorators.http import require_http_methods, require_safe, condition
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from planner.models import Schedule
 from planner.forms import TitleForm
+from planner.utils import CatalogUtils, GeneratorUtils
 
 MAX_USER_SCHEDULES = 10
+# Catalog documents are named by content hash, so can be cached forever
+CATALOG_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 logger = logging.getLogger(__name__)
 
 
+class _DemoPage(NamedTuple):
+    """Demo page rendered for logged-out users, for a given (catalog version, year)."""
+    key: tuple[int, int]
+    html: str
+    etag: str
+    last_modified: datetime
+
+
+# Shared by all anonymous requests in this worker
+_demo_page = None
+
+
+def _get_demo_page(request: HttpRequest) -> _DemoPage:
+    """Returns the cached demo page, re-rendering it if the catalog version
+    or calendar year has changed since it was last rendered.
+
+    Result is also kept on the request, as the conditional-GET checks
+    and the view itself each need it.
+    """
+    global _demo_page
+    if hasattr(request, '_demo_page'):
+        return request._demo_page
+    key = (CatalogUtils.get_catalog().version, datetime.now().year)
+
+    page = _demo_page
+    if page is None or page.key != key:
+        html = render_to_string('planner/index.html', ScheduleUtils.get_context_demo(), request)
+        # ETag is derived from content, so it agrees across workers
+        etag = '"' + hashlib.sha256(html.encode()).hexdigest()[:20] + '"'
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        page = _demo_page = _DemoPage(key, html, etag, last_modified)
+
+    request._demo_page = page
+    return page
+
+
+def _demo_etag(request: HttpRequest) -> str | None:
+    """ETag for conditional GETs of the demo page (None for logged-in users).
+    """
+    if request.user.is_authenticated:
+        return None
+    return _get_demo_page(request).etag
+
+
+def _demo_last_modified(request: HttpRequest) -> datetime | None:
+    """Last-Modified for conditional GETs of the demo page (None for logged-in users).
+    """
+    if request.user.is_authenticated:
+        return None
+    return _get_demo_page(request).last_modified
+
+
 @require_safe
+@condition(etag_func=_demo_etag, last_modified_func=_demo_last_modified)
 def index(request: HttpRequest) -> HttpResponse:
     """Handles requests to the index page ("/").
 
     If user is logged in, displays their most recently created 
     schedule (or creates one if they have none). 
-    If user is logged out, displays a demo schedule.
+    If user is logged out, displays a (cached) demo schedule; repeat
+    visitors get a 304 via ETag/Last-Modified.
     """
 
     # If user is logged out, show 'demo' schedule
     if not request.user.is_authenticated:
-        return render(request, 'planner/index.html', ScheduleUtils.get_context_demo())
+        response = HttpResponse(_get_demo_page(request).html)
+        # Browsers must revalidate, since logging in changes this URL's response
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return _redirect_to_latest(request)
+
 
-    # Check for existing schedules for this user
-    sched_list = Schedule.objects.filter(user=request.user)
+def _redirect_to_latest(request: HttpRequest) -> HttpResponse:
+    """Redirects a logged-in user to their most recently created schedule,
+    creating one if they have none (shared with planner/async_views.py).
+    """
+    # Check for existing schedules for this user (usually cached)
+    sched_list = ScheduleUtils.get_schedule_summaries(request.user)
     # Load most recently created, if possible...
-    if sched_list.exists():
-        schedule = sched_list.last()
+    if sched_list:
+        sched_id = sched_list[-1].id
     # ...or if they have no schedules, create new one
     else:
         try:
@@ -39,9 +111,32 @@ def index(request: HttpRequest) -> HttpResponse:
         except Exception as e:
             logger.error(e)
             return HttpResponseServerError('Error creating new schedule')
+        sched_id = schedule.id
 
     # Display the schedule in question
-    return redirect('sched_router', schedule.id)
+    return redirect('sched_router', sched_id)
+
+
+@require_safe
+def catalog(request: HttpRequest, catalog_hash: str) -> HttpResponse:
+    """Serves the catalog's prereq/quarter data as JSON ("/catalog/<hash>.json").
+
+    Pages reference the document by its content hash, so responses are
+    immutable; requests for an outdated hash are redirected to the current one.
+    The gzipped copy is served to clients that accept it.
+    """
+    catalog = CatalogUtils.get_catalog()
+    if catalog_hash != catalog.digest:
+        return redirect('catalog', catalog.digest)
+
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(catalog.payload_gz, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(catalog.payload, content_type='application/json')
+    response['Cache-Control'] = CATALOG_CACHE_CONTROL
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 
 @login_required
@@ -64,15 +159,19 @@ def create(request: HttpRequest) -> JsonResponse:
     if request.method == 'GET':
         return redirect('/')
 
-    # Check if user already has max number of schedules
-    sched_list = Schedule.objects.filter(user=request.user)
-    if len(sched_list) >= MAX_USER_SCHEDULES:
-        return JsonResponse({'msg': 'Maximum schedules reached'}, status=403)
+    return _create_schedule(request)
+
 
-    # Create new schedule, save to DB, and return error/success message
+def _create_schedule(request: HttpRequest) -> JsonResponse:
+    """Creates a new schedule for the user, if under their limit
+    (shared with planner/async_views.py).
+    """
+    # Create new schedule (if user is under their limit, counted in the DB as
+    # cached summaries may lag a create in another worker), and return error/success message
     try:
-        schedule = ScheduleUtils.new_schedule(request.user)
-        schedule.save()
+        schedule = ScheduleUtils.create_schedule(request.user, MAX_USER_SCHEDULES)
+    except ScheduleUtils.ScheduleLimitError:
+        return JsonResponse({'msg': 'Maximum schedules reached'}, status=403)
     except Exception as e:
         logger.error(e)
         return JsonResponse({'msg': 'Error creating schedule'}, status=500)
@@ -80,6 +179,32 @@ def create(request: HttpRequest) -> JsonResponse:
     return JsonResponse({'msg': 'Schedule created', 'schedule': schedule.id}, status=200)
 
 
+@login_required
+@require_http_methods(["POST"])
+def copy(request: HttpRequest, sched_id: int) -> JsonResponse:
+    """Handles requests to copy a schedule ("/schedules/:id/copy").
+
+    Args:
+        request: XHR POST request from index page JS
+                 (No content is needed in POST body.)
+        sched_id: ID of schedule to copy, with all its courses
+
+    Returns:
+        JSON response with the copy's ID or error message
+    """
+    try:
+        schedule = ScheduleUtils.copy_schedule(request.user, sched_id, MAX_USER_SCHEDULES)
+    except Schedule.DoesNotExist:
+        return JsonResponse({'msg': 'not found', 'schedule': sched_id}, status=404)
+    except ScheduleUtils.ScheduleLimitError:
+        return JsonResponse({'msg': 'Maximum schedules reached'}, status=403)
+    except Exception as e:
+        logger.error(e)
+        return JsonResponse({'msg': 'Error copying schedule'}, status=500)
+
+    return JsonResponse({'msg': 'Schedule copied', 'schedule': schedule.id}, status=200)
+
+
 @login_required
 def sched_router(request: HttpRequest, sched_id: int) -> HttpResponse:
     """Handles requests to a specific schedule ("/schedules/:id").
@@ -109,42 +234,134 @@ def display(request: HttpRequest, sched_id: int) -> HttpResponse:
     """Displays schedule viewer/editor page for a given schedule,
        upon GET request.
     """
-    # Obtain all schedules for this user (to pass to template)
-    sched_list = Schedule.objects.filter(user=request.user)
-
-    # Pull requested schedule using ID and user
     try:
-        schedule = sched_list.get(id=sched_id)
+        schedule = Schedule.objects.filter(user=request.user).get(id=sched_id)
     except Schedule.DoesNotExist:
         return HttpResponseBadRequest('Schedule not found')
 
-    # Load context and render template
+    return _render_schedule(request, schedule)
+
+
+def _render_schedule(request: HttpRequest, schedule: Schedule) -> HttpResponse:
+    """Renders the page for a schedule (shared with planner/async_views.py).
+    """
+    # Load context (with the user's cached schedule list) and render template
     context = ScheduleUtils.get_context_existing(
-        schedule, request.user, sched_list)
+        schedule, request.user, ScheduleUtils.get_schedule_summaries(request.user))
     return render(request, 'planner/index.html', context)
 
 
 def update_schedule(request: HttpRequest, sched_id: int) -> JsonResponse:
     """ Handles requests to update a schedule's contents.
 
-        Updates are passed via JSON in body of PATCH request.
+        Updates are passed via JSON in body of PATCH request, and applied
+        all-or-nothing. Responds with the schedule's new saved state, or
+        with per-course violations if courses were placed invalidly.
     """
     # Load update data and confirm schedule exists
-    data = json.loads(request.body)
+    update = _parse_update(request, sched_id)
+    if isinstance(update, JsonResponse):
+        return update
+    try:
+        schedule = Schedule.objects.filter(user=request.user).get(id=sched_id)
+    except Schedule.DoesNotExist:
+        return _schedule_not_found(sched_id)
+
+    return _apply_update(schedule, *update)
+
+
+def _parse_update(request: HttpRequest, sched_id: int) -> tuple[dict, dict] | JsonResponse:
+    """Reads the courses and dates from a schedule update's JSON body.
+
+    Returns:
+        (courses, dates), or a 400 response if the body is malformed
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        data = None
+    # The body and its courses/dates must all be JSON objects
+    if not isinstance(data, dict) or not isinstance(data.get('courses'), dict) \
+            or not isinstance(data.get('dates'), dict):
+        return JsonResponse({'msg': 'malformed request', 'schedule': sched_id}, status=400)
+    return data['courses'], data['dates']
+
+
+def _schedule_not_found(sched_id: int) -> JsonResponse:
+    """404 response for a schedule update (shared with planner/async_views.py)."""
+    return JsonResponse({'msg': 'not found', 'schedule': sched_id}, status=404)
+
+
+def _apply_update(schedule: Schedule, courses: dict, dates: dict) -> JsonResponse:
+    """Applies a parsed update to a schedule, responding with its saved state
+    or what was wrong (shared with planner/async_views.py).
+    """
+    # Validate and apply requested updates
+    try:
+        state = ScheduleUtils.update_schedule(schedule, courses, dates)
+    except ScheduleUtils.ScheduleValidationError as e:
+        return JsonResponse({'msg': str(e), 'schedule': schedule.id,
+                             'violations': e.violations}, status=400)
+    except ScheduleUtils.ScheduleUpdateError as e:
+        return JsonResponse({'msg': str(e), 'schedule': schedule.id}, status=400)
+    except Exception as e:
+        logger.error(e)
+        return JsonResponse({'msg': 'failed', 'schedule': schedule.id}, status=500)
+
+    # Confirm success, returning the saved state
+    return JsonResponse({'msg': 'saved', 'schedule': schedule.id, **state}, status=200)
+
+
+@login_required
+@require_safe
+def analytics(request: HttpRequest, sched_id: int) -> JsonResponse:
+    """Returns earliest possible terms and the critical path for a schedule
+       ("/schedules/:id/analytics"), upon GET request.
+    """
+    try:
+        schedule = Schedule.objects.filter(user=request.user).get(id=sched_id)
+    except Schedule.DoesNotExist:
+        return JsonResponse({'msg': 'not found', 'schedule': sched_id}, status=404)
+
+    return JsonResponse({'schedule': schedule.id,
+                         **ScheduleUtils.get_schedule_analytics(schedule)}, status=200)
+
+
+@login_required
+@require_http_methods(["POST"])
+def generate(request: HttpRequest, sched_id: int) -> JsonResponse:
+    """Fills a schedule with a generated plan to graduation
+       ("/schedules/:id/generate").
+
+    Args:
+        request: XHR POST request; JSON body may set 'max_credits'
+                 (credits per term, default GeneratorUtils.DEFAULT_TERM_CREDITS)
+        sched_id: ID of schedule to fill (existing courses are replaced)
+
+    Returns:
+        JSON response with the schedule's new state, or error message
+    """
+    # Load options and confirm schedule exists
+    try:
+        data = json.loads(request.body or '{}')
+        max_credits = int(data.get('max_credits', GeneratorUtils.DEFAULT_TERM_CREDITS))
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'msg': 'malformed request', 'schedule': sched_id}, status=400)
     try:
         schedule = Schedule.objects.filter(user=request.user).get(id=sched_id)
     except Schedule.DoesNotExist:
-        return JsonResponse({'msg': 'not found', 'schedule': schedule.id}, status=404)
+        return JsonResponse({'msg': 'not found', 'schedule': sched_id}, status=404)
 
-    # Apply/save requested updates
+    # Generate and save the plan
     try:
-        ScheduleUtils.update_schedule(schedule, data['courses'], data['dates'])
+        state = ScheduleUtils.generate_schedule(schedule, max_credits)
+    except (ScheduleUtils.ScheduleUpdateError, GeneratorUtils.PlanError) as e:
+        return JsonResponse({'msg': str(e), 'schedule': schedule.id}, status=400)
     except Exception as e:
         logger.error(e)
         return JsonResponse({'msg': 'failed', 'schedule': schedule.id}, status=500)
 
-    # Confirm success
-    return JsonResponse({'msg': 'saved', 'schedule': schedule.id}, status=200)
+    return JsonResponse({'msg': 'generated', 'schedule': schedule.id, **state}, status=200)
 
 
 def delete(request: HttpRequest, sched_id: int) -> HttpResponse: